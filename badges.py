@@ -0,0 +1,57 @@
+"""
+Rule-driven badges.
+
+Each rule watches one counter of chat_user_stats (tasks_completed,
+total_points, current_streak) and fires when a completion moves that counter
+across its threshold. Only the before/after delta of the completion is
+inspected, so evaluating badges never needs the user's history.
+"""
+
+from collections import namedtuple
+
+BadgeRule = namedtuple("BadgeRule", "key label metric threshold tier")
+
+# Order matters for tiers: later tier rules outrank earlier ones.
+# schema.sql backfills the counter rules for existing users: keep it in sync.
+RULES = (
+    BadgeRule("task_runner", "🏃 Task Runner", "tasks_completed", 5, True),
+    BadgeRule("task_warrior", "⭐ Task Warrior", "tasks_completed", 10, True),
+    BadgeRule("task_expert", "🌟 Task Expert", "tasks_completed", 25, True),
+    BadgeRule("task_master", "🏆 Task Master", "tasks_completed", 50, True),
+    BadgeRule("first_task", "🎯 Prima Task", "tasks_completed", 1, False),
+    BadgeRule("centurion", "💯 Centurione", "total_points", 100, False),
+    BadgeRule("points_500", "💎 500 Punti", "total_points", 500, False),
+    BadgeRule("streak_3", "🔥 Tre Giorni di Fila", "current_streak", 3, False),
+    BadgeRule("streak_7", "📅 Settimana Perfetta", "current_streak", 7, False),
+    BadgeRule("streak_30", "👑 Mese Perfetto", "current_streak", 30, False),
+)
+
+RULES_BY_KEY = {rule.key: rule for rule in RULES}
+
+# Shown when no tier badge has been earned yet
+DEFAULT_TIER = "🌱 Task Beginner"
+# /start welcomes anyone who completed at least one task as a runner
+WELCOME_TIER = "🏃 Task Runner"
+
+
+def evaluate(before, after):
+    """Rules whose threshold was crossed going from ``before`` to ``after``"""
+    return [
+        rule for rule in RULES
+        if before.get(rule.metric, 0) < rule.threshold <= after.get(rule.metric, 0)
+    ]
+
+
+def tier(keys, default=DEFAULT_TIER):
+    """Label of the highest tier among the earned badge keys (``default`` if none)"""
+    earned = set(keys)
+    label = default
+    for rule in RULES:
+        if rule.tier and rule.key in earned:
+            label = rule.label
+    return label
+
+
+def labels(keys):
+    """Display labels of the earned badges, skipping unknown (retired) keys"""
+    return [RULES_BY_KEY[key].label for key in keys if key in RULES_BY_KEY]
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Offline load generator and benchmark for FamilyTaskBot.
+
+Simulates N families x M members sending a realistic mix of commands and
+button taps through a real telegram Application, with the Bot API replaced
+by fake_telegram.FakeBotAPI and the database in fallback (in-memory) mode.
+Nothing touches the network.
+
+    python benchmark.py --families 20 --members 4 --updates 2000
+"""
+
+import os
+import sys
+import time
+import random
+import asyncio
+import logging
+import argparse
+from collections import defaultdict
+
+# Mix of user actions, weighted roughly like production traffic
+WORKLOAD = (
+    ("start", 3),
+    ("tasks", 10),
+    ("cat_", 14),
+    ("assign_", 12),
+    ("doassign_", 10),
+    ("mytasks", 10),
+    ("complete_", 8),
+    ("confirm_complete_", 8),
+    ("stats", 6),
+    ("leaderboard", 6),
+    ("tasks_menu", 5),
+    ("help", 2),
+    ("chatter", 6),
+)
+
+CHATTER = ("ciao a tutti", "chi fa la spesa oggi?", "stasera pizza", "ok 👍", "arrivo tra 10 minuti")
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class Family:
+    def __init__(self, chat_id, members):
+        self.chat_id = chat_id
+        self.members = members
+        self.assigned = defaultdict(set)
+
+
+class LoadGenerator:
+    """Produces (label, Update) pairs following WORKLOAD"""
+
+    def __init__(self, bot, families, members, task_ids, categories, seed=1):
+        from fake_telegram import callback_update, command_update, text_update
+        import callbacks
+        self._encode = callbacks.encode
+        self._callback = callback_update
+        self._command = command_update
+        self._text = text_update
+        self.bot = bot
+        self.random = random.Random(seed)
+        self.task_ids = list(task_ids)
+        self.categories = list(categories)
+        self.families = [
+            Family(-1000000 - f, [(10000 * (f + 1) + m, f"Membro{f}_{m}") for m in range(members)])
+            for f in range(families)
+        ]
+        self._actions = [action for action, _ in WORKLOAD]
+        self._weights = [weight for _, weight in WORKLOAD]
+
+    def registration_updates(self):
+        for family in self.families:
+            for user_id, name in family.members:
+                yield self._command(self.bot, family.chat_id, user_id, name, "start")
+
+    def next_update(self):
+        family = self.random.choice(self.families)
+        user_id, name = self.random.choice(family.members)
+        action = self.random.choices(self._actions, self._weights)[0]
+        chat_id = family.chat_id
+
+        if action in ("start", "tasks", "mytasks", "stats", "leaderboard", "help"):
+            return action, self._command(self.bot, chat_id, user_id, name, action)
+        if action == "chatter":
+            return action, self._text(self.bot, chat_id, user_id, name, self.random.choice(CHATTER))
+        if action == "tasks_menu":
+            return action, self._callback(self.bot, chat_id, user_id, name, "tasks_menu")
+        if action == "cat_":
+            return action, self._callback(self.bot, chat_id, user_id, name, self._encode("category", self.random.choice(self.categories)))
+        if action == "assign_":
+            return action, self._callback(self.bot, chat_id, user_id, name, self._encode("assign", self.random.choice(self.task_ids)))
+        if action == "doassign_":
+            target, _ = self.random.choice(family.members)
+            task_id = self.random.choice(self.task_ids)
+            family.assigned[target].add(task_id)
+            return action, self._callback(self.bot, chat_id, user_id, name, self._encode("doassign", target, task_id))
+
+        # complete_/confirm_complete_ only make sense on the user's own assignments
+        own = family.assigned[user_id]
+        if not own:
+            return "mytasks", self._command(self.bot, chat_id, user_id, name, "mytasks")
+        task_id = self.random.choice(sorted(own))
+        if action == "confirm_complete_":
+            own.discard(task_id)
+        return action, self._callback(self.bot, chat_id, user_id, name, self._encode(action.rstrip("_"), task_id))
+
+
+async def run_benchmark(families=10, members=4, updates=1000, seed=1, api_latency=0.0):
+    """Run the workload and return a result dict (see format_report)"""
+    # Never talk to a real database from the benchmark
+    os.environ.pop("DATABASE_URL", None)
+
+    from db import track_queries
+    from bot_handlers import FamilyTaskBot
+    from fake_telegram import FakeBotAPI, build_application
+
+    family_bot = FamilyTaskBot()
+    application, api = build_application(family_bot, FakeBotAPI(latency=api_latency, record=False))
+    bot = application.bot
+
+    errors = []
+
+    async def on_error(update, context):
+        errors.append(context.error)
+
+    application.add_error_handler(on_error)
+    await application.initialize()
+
+    db = family_bot.get_db()
+    generator = LoadGenerator(
+        bot, families, members,
+        # Buttons carry short ids, like the real keyboards
+        task_ids=[t['short_id'] for t in db.get_all_tasks()],
+        categories=[cat.lower() for cat, _, _ in FamilyTaskBot.CATEGORIES],
+        seed=seed,
+    )
+    for update in generator.registration_updates():
+        await application.process_update(update)
+
+    latencies = defaultdict(list)
+    db_calls = defaultdict(list)
+    api_calls = defaultdict(list)
+    started = time.perf_counter()
+    for _ in range(updates):
+        label, update = generator.next_update()
+        api_before = sum(api.calls.values())
+        t0 = time.perf_counter()
+        with track_queries() as queries:
+            await application.process_update(update)
+        latencies[label].append(time.perf_counter() - t0)
+        db_calls[label].append(queries.calls)
+        api_calls[label].append(sum(api.calls.values()) - api_before)
+    elapsed = time.perf_counter() - started
+
+    await application.shutdown()
+
+    return {
+        "families": families,
+        "members": members,
+        "updates": updates,
+        "elapsed": elapsed,
+        "errors": len(errors),
+        "latencies": dict(latencies),
+        "db_calls": dict(db_calls),
+        "api_calls": dict(api_calls),
+    }
+
+
+def _summary(values_ms):
+    values_ms = sorted(values_ms)
+    return percentile(values_ms, 50), percentile(values_ms, 95), percentile(values_ms, 99)
+
+
+def format_report(result):
+    all_latencies = [v * 1000 for values in result["latencies"].values() for v in values]
+    all_db = [v for values in result["db_calls"].values() for v in values]
+    all_api = [v for values in result["api_calls"].values() for v in values]
+    p50, p95, p99 = _summary(all_latencies)
+    lines = [
+        "=" * 78,
+        f"📊 Benchmark FamilyTaskBot — {result['families']} famiglie × {result['members']} membri, "
+        f"{result['updates']} update",
+        "=" * 78,
+        f"Throughput: {result['updates'] / max(result['elapsed'], 1e-9):.1f} update/s "
+        f"({result['elapsed']:.2f}s, {result['errors']} errori)",
+        f"Latenza (ms): p50={p50:.2f} p95={p95:.2f} p99={p99:.2f}",
+        f"DB round trip/update: media={sum(all_db) / max(len(all_db), 1):.2f} max={max(all_db, default=0)}",
+        f"Chiamate Bot API/update: media={sum(all_api) / max(len(all_api), 1):.2f}",
+        "",
+        f"{'azione':<20}{'n':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'db/upd':>9}{'api/upd':>9}",
+    ]
+    for label in sorted(result["latencies"], key=lambda k: -len(result["latencies"][k])):
+        values = [v * 1000 for v in result["latencies"][label]]
+        p50, p95, p99 = _summary(values)
+        db = result["db_calls"][label]
+        api = result["api_calls"][label]
+        lines.append(
+            f"{label:<20}{len(values):>6}{p50:>10.2f}{p95:>10.2f}{p99:>10.2f}"
+            f"{sum(db) / len(db):>9.1f}{sum(api) / len(api):>9.1f}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark offline di FamilyTaskBot")
+    parser.add_argument("--families", type=int, default=10)
+    parser.add_argument("--members", type=int, default=4)
+    parser.add_argument("--updates", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--api-latency", type=float, default=0.0,
+                        help="Latenza simulata per ogni chiamata Bot API (secondi)")
+    parser.add_argument("--output", help="Salva il report anche su file (es. bench_output.txt)")
+    parser.add_argument("--max-p95-ms", type=float,
+                        help="Fallisce (exit 1) se la latenza p95 complessiva supera questa soglia")
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.INFO)
+    result = asyncio.run(run_benchmark(args.families, args.members, args.updates, args.seed, args.api_latency))
+    report = format_report(result)
+    print(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(report + "\n")
+    if result["errors"]:
+        return 1
+    if args.max_p95_ms is not None:
+        p95 = _summary([v * 1000 for values in result["latencies"].values() for v in values])[1]
+        if p95 > args.max_p95_ms:
+            print(f"❌ p95 {p95:.2f}ms oltre la soglia di {args.max_p95_ms:.2f}ms")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,15 +1,119 @@
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMarkup, KeyboardButton
-from telegram.constants import ParseMode
+from telegram.constants import ParseMode, ChatType
+from telegram.helpers import escape_markdown
 from telegram.ext import ContextTypes
+import os
+import re
 import logging
-from db import FamilyTaskDB
-from utils import send_and_track_message
+import time
+import asyncio
+import functools
+import contextlib
+import contextvars
+from db import FamilyTaskDB, track_queries
+from utils import send_and_track_message, edit_message
+import metrics
+import tracing
+import profiler
+import badges
+import scheduler
+import keyboards
+import callbacks
+import router
+import reports
+import export
+import catalog_import
+from datetime import datetime, timedelta
 
 logger = logging.getLogger(__name__)
 
+
+# True while an update is being instrumented: handlers it delegates to are not counted again
+_instrumenting = contextvars.ContextVar("handler_instrumenting", default=False)
+
+
+@contextlib.contextmanager
+def _instrumentation(kind, label):
+    """Record latency, DB round trips and unhandled errors of one update.
+
+    Only the outermost level counts (the route or the registered handler), so
+    a callback delegating to a command handler is one sample, not two.
+    """
+    if _instrumenting.get():
+        yield
+        return
+    token = _instrumenting.set(True)
+    start = time.perf_counter()
+    try:
+        with track_queries() as queries:
+            try:
+                with tracing.span(f"{kind}.{label}"):
+                    yield
+            except Exception:
+                metrics.HANDLER_ERRORS.inc(kind=kind, name=label)
+                raise
+            finally:
+                metrics.HANDLER_LATENCY.observe(time.perf_counter() - start, kind=kind, name=label)
+                metrics.HANDLER_DB_CALLS.observe(queries.calls, kind=kind, name=label)
+                logger.debug(
+                    f"{kind}.{label}: {queries.calls} chiamate DB, {queries.connections} connessioni, "
+                    f"{queries.statements} statement {dict(queries.methods)}"
+                )
+    finally:
+        _instrumenting.reset(token)
+
+
+def _instrumented_handler(kind, name=None):
+    """Instrument a handler (see _instrumentation); ``name`` defaults to the handler name"""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(self, update, context):
+            with _instrumentation(kind, name or func.__name__):
+                return await func(self, update, context)
+        return wrapper
+    return decorator
+
+
+def _instrumented_route(call, route):
+    """Router middleware: instrument each callback under its route label"""
+    @functools.wraps(call)
+    async def wrapper(query, *args):
+        with _instrumentation("callback", route.label):
+            return await call(query, *args)
+    return wrapper
+
+
+def _decode_callback(data):
+    """(action, (page, *args)) of callback_data, see keyboards and callbacks"""
+    # pg_<n>_<callback>: same view as <callback>, at page n
+    page, data = keyboards.parse_page_callback(data)
+    action, args = callbacks.decode(data)
+    return action, (page,) + args
+
+
 class FamilyTaskBot:
-    def __init__(self):
-        self.db = None
+    def __init__(self, db=None):
+        # main.py passes its FamilyTaskDB so the catalog is loaded only once
+        self.db = db
+        # Telegram user ids allowed to run admin commands (e.g. /profile)
+        self.admin_ids = {
+            int(uid) for uid in os.environ.get("ADMIN_USER_IDS", "").replace(" ", "").split(",")
+            if uid.lstrip("-").isdigit()
+        }
+        self.profile_dir = os.environ.get("PROFILE_DIR", "profiles")
+        self._profile_task = None
+        # Chats with an /export being written, one at a time per chat
+        self._exports = set()
+        # scheduler.RecurringScheduler, attached by main.py once the JobQueue exists
+        self.scheduler = None
+        # Catalog-derived pages (categorization, assign menu), keyed by db.catalog_key
+        self._page_cache = keyboards.PageCache("keyboard_pages")
+        # Rendered (text, markup) of per-chat views, see _cached_view
+        self._render_cache = keyboards.PageCache("rendered_views", maxsize=512)
+        self.router = self._build_router()
+
+    def is_admin(self, user_id):
+        return user_id in self.admin_ids
         
     def get_db(self):
         """Lazy initialization of database connection"""
@@ -53,6 +157,7 @@ class FamilyTaskBot:
         "casa": lambda n: "riordinare" in n or "organizzare" in n or "fare i letti" in n or "spazzatura" in n or "buttare" in n or "cambiare i filtri" in n or "rifiuti" in n,
         "altro": lambda n: self._is_uncategorized_task(n)
     }
+    @_instrumented_handler("command", "start")
     async def start(self, update, context):
         user = update.effective_user
         chat_id = update.effective_chat.id
@@ -63,19 +168,11 @@ class FamilyTaskBot:
             # Continue execution even if adding member fails
         
         # Get user stats to personalize welcome message
-        stats = self.get_db().get_user_stats(user.id)
+        stats = self.get_db().get_user_stats(user.id, chat_id)
         
         if stats and stats['tasks_completed'] > 0:
-            # Determine achievement level for personalized welcome
-            if stats['tasks_completed'] >= 50:
-                achievement = "🏆 Task Master"
-            elif stats['tasks_completed'] >= 25:
-                achievement = "🌟 Task Expert"
-            elif stats['tasks_completed'] >= 10:
-                achievement = "⭐ Task Warrior"
-            else:
-                achievement = "🏃 Task Runner"
-                
+            # Tier from the earned badges; below the first tier /start keeps saying "Task Runner"
+            achievement = badges.tier(stats['badges'], default=badges.WELCOME_TIER)
             text = (
                 f"🎉 Bentornato, {user.first_name}!\n\n"
                 f"🏅 **{achievement}**\n\n"
@@ -112,6 +209,7 @@ class FamilyTaskBot:
         elif update.callback_query:
             await send_and_track_message(update.callback_query.message.reply_text, text, reply_markup=reply_markup, parse_mode=ParseMode.MARKDOWN)
 
+    @_instrumented_handler("command", "help")
     async def help_command(self, update, context):
         text = (
             "📚 **Guida Family Task Manager**\n\n"
@@ -121,6 +219,11 @@ class FamilyTaskBot:
             "• `/mytasks` - Le tue task personali\n"
             "• `/leaderboard` - Classifica della famiglia\n"
             "• `/stats` - Le tue statistiche dettagliate\n"
+            "• `/history` - Storico completamenti della famiglia\n"
+            "• `/export` - Scarica i dati della famiglia (CSV o JSONL)\n"
+            "• `/recurring` - Task ricorrenti della famiglia\n"
+            "• `/customtask` - Task personalizzate della famiglia\n"
+            "• `/timezone` - Fuso orario per le streak\n"
             "• `/help` - Mostra questa guida\n\n"
             "🎮 **Come iniziare (passo dopo passo):**\n"
             "1️⃣ **Esplora:** Tocca '📋 Tutte le Task'\n"
@@ -141,148 +244,166 @@ class FamilyTaskBot:
         )
         await send_and_track_message(update.message.reply_text, text, parse_mode=ParseMode.MARKDOWN)
 
+    # Leaderboard periods: (period, button label, title suffix)
+    LEADERBOARD_PERIODS = [
+        ("week", "📅 Settimana", "di questa settimana"),
+        ("month", "🗓️ Mese", "di questo mese"),
+        ("all", "🏆 Sempre", "di sempre"),
+    ]
+    # Accepted /leaderboard arguments
+    LEADERBOARD_ALIASES = {
+        "settimana": "week", "week": "week",
+        "mese": "month", "month": "month",
+        "sempre": "all", "all": "all",
+    }
+
+    @_instrumented_handler("command", "leaderboard")
     async def leaderboard(self, update, context):
         chat_id = update.effective_chat.id
-        leaderboard = self.get_db().get_leaderboard(chat_id)
+        period = "all"
+        if context and context.args:
+            period = self.LEADERBOARD_ALIASES.get(context.args[0].lower(), "all")
+        text, reply_markup = self._build_leaderboard(chat_id, period)
+        await send_and_track_message(update.message.reply_text, text, parse_mode=ParseMode.MARKDOWN, reply_markup=reply_markup)
+
+    def _build_leaderboard(self, chat_id, period="all"):
+        """Text and period switcher keyboard of the family leaderboard"""
+        leaderboard = self.get_db().get_leaderboard(chat_id, period)
+        title = next(suffix for key, _, suffix in self.LEADERBOARD_PERIODS if key == period)
+        text = reports.render(reports.leaderboard_text, leaderboard, period, title)
         if not leaderboard:
-            text = (
-                "🏆 **Classifica Famiglia**\n\n"
-                "🌟 **La competizione non è ancora iniziata!**\n\n"
-                "🚀 **Come entrare in classifica:**\n"
-                "1️⃣ Vai su '📋 Tutte le Task'\n"
-                "2️⃣ Scegli una categoria interessante\n"
-                "3️⃣ Assegnati una task facile per iniziare\n"
-                "4️⃣ Completala per guadagnare i primi punti\n"
-                "5️⃣ Apparirà il tuo nome in classifica! 🎉\n\n"
-                "💡 **Task consigliate per iniziare:**\n"
-                "• 🏠 Fare i letti (4 pt)\n"
-                "• 🍽️ Preparare la tavola (4 pt)\n"
-                "• 🌱 Innaffiare le piante (3 pt)\n\n"
-                "🎯 **Chi farà il primo passo e aprirà la competizione?**"
-            )
-            await send_and_track_message(update.message.reply_text, text, parse_mode=ParseMode.MARKDOWN)
-            return
-            
-        text = "🏆 **Classifica Famiglia**\n\n"
-        for i, entry in enumerate(leaderboard, 1):
-            if i == 1:
-                pos = "🥇"
-                badge = "👑"
-            elif i == 2:
-                pos = "🥈"
-                badge = "🌟"
-            elif i == 3:
-                pos = "🥉"
-                badge = "⭐"
-            else:
-                pos = f"{i}°"
-                badge = "🏃"
-                
-            # Calculate progress to next level
-            current_level_points = (entry['level'] - 1) * 50
-            next_level_points = entry['level'] * 50
-            progress = entry['total_points'] - current_level_points
-            needed = next_level_points - entry['total_points']
-            
-            text += (
-                f"{pos} {badge} **{entry['first_name']}**\n"
-                f"    ⭐ {entry['total_points']} punti • 🏅 Livello {entry['level']}\n"
-                f"    ✅ {entry['tasks_completed']} task completate\n"
-                f"    📈 {progress}/50 punti al prossimo livello\n\n"
-            )
-            
-        text += "💡 Completa più task per scalare la classifica!"
-        await send_and_track_message(update.message.reply_text, text, parse_mode=ParseMode.MARKDOWN)
+            return text, None
+
+        keyboard = [[
+            InlineKeyboardButton(f"• {label} •" if key == period else label, callback_data=callbacks.encode("leaderboard", key))
+            for key, label, _ in self.LEADERBOARD_PERIODS
+        ]]
+        return text, InlineKeyboardMarkup(keyboard)
 
+    @_instrumented_handler("command", "stats")
     async def stats(self, update, context):
         user = update.effective_user
-        stats = self.get_db().get_user_stats(user.id)
-        task_completion_stats = self.get_db().get_user_task_completion_stats(user.id)
-        
-        if not stats:
-            text = (
-                f"📊 **Statistiche di {user.first_name}**\n\n"
-                "🆕 **Benvenuto nel Family Task Manager!**\n\n"
-                "📈 **I tuoi progressi:**\n"
-                "⭐ Punti: 0\n"
-                "✅ Task completate: 0\n"
-                "🏅 Livello: 1\n"
-                "🔥 Streak: 0\n\n"
-                "🎯 **Prossimo obiettivo:**\n"
-                "Completa la tua prima task per guadagnare punti!\n\n"
-                "💡 Vai su 📋 Tutte le Task per iniziare!"
-            )
-            await send_and_track_message(update.message.reply_text, text, parse_mode=ParseMode.MARKDOWN)
-            return
-            
-        # Calculate progress to next level
-        current_level_points = (stats['level'] - 1) * 50
-        next_level_points = stats['level'] * 50
-        progress = stats['total_points'] - current_level_points
-        needed = next_level_points - stats['total_points']
-        progress_bar = "▓" * (progress // 5) + "░" * ((50 - progress) // 5)
-        
-        # Performance badge based on tasks completed
-        if stats['tasks_completed'] >= 50:
-            badge = "🏆 Task Master"
-        elif stats['tasks_completed'] >= 25:
-            badge = "🌟 Task Expert"
-        elif stats['tasks_completed'] >= 10:
-            badge = "⭐ Task Warrior"
-        elif stats['tasks_completed'] >= 5:
-            badge = "🏃 Task Runner"
-        else:
-            badge = "🌱 Task Beginner"
-            
-        text = (
-            f"📊 **Statistiche di {user.first_name}**\n\n"
-            f"🏅 **{badge}**\n\n"
-            f"📈 **I tuoi progressi:**\n"
-            f"⭐ **Punti totali:** {stats['total_points']}\n"
-            f"✅ **Task completate:** {stats['tasks_completed']}\n"
-            f"🏅 **Livello:** {stats['level']}\n"
-            f"🔥 **Streak:** {stats['streak']}\n\n"
-            f"📊 **Progresso livello:**\n"
-            f"{progress_bar}\n"
-            f"🎯 {progress}/50 punti • {needed} punti al livello {stats['level'] + 1}\n\n"
-            f"💡 **Media punti per task:** {stats['total_points'] // max(stats['tasks_completed'], 1)}"
-        )
-        
-        # Add individual task completion statistics
-        if task_completion_stats:
-            text += "\n\n🎯 **Task completate per tipo:**\n"
-            for task_stat in task_completion_stats:
-                count_text = "volta" if task_stat['completion_count'] == 1 else "volte"
-                text += f"• **{task_stat['task_name']}**: completata {task_stat['completion_count']} {count_text}\n"
-        
+        chat_id = update.effective_chat.id
+        stats = self.get_db().get_user_stats(user.id, chat_id)
+        task_completion_stats = self.get_db().get_user_task_completion_stats(user.id, chat_id)
+        text = reports.render(reports.stats_text, user.first_name, stats, task_completion_stats, self.STATS_TASK_TYPES)
         await send_and_track_message(update.message.reply_text, text, parse_mode=ParseMode.MARKDOWN)
 
+    # Task types listed in /stats, the full record is in /history
+    STATS_TASK_TYPES = 10
+    HISTORY_PAGE_SIZE = 10
+    # Telegram rejects messages longer than 4096 characters
+    MAX_MESSAGE_LENGTH = 4096
+    _EPOCH = datetime(1970, 1, 1)
+
+    @classmethod
+    def _encode_history_cursor(cls, row):
+        """Keyset cursor of a history row as callback_data"""
+        micros = (row['completed_date'] - cls._EPOCH) // timedelta(microseconds=1)
+        return callbacks.encode("history", micros, row['id'])
+
+    @classmethod
+    def _history_cursor(cls, micros, row_id):
+        return cls._EPOCH + timedelta(microseconds=micros), row_id
+
+    @classmethod
+    def _decode_history_cursor(cls, data):
+        action, args = callbacks.decode(data)
+        if action == "history_top":
+            return None
+        if action != "history":
+            raise ValueError(f"Cursore storico non valido: {data}")
+        return cls._history_cursor(*args)
+
+    def _build_history_page(self, chat_id, before=None):
+        """One page of the family history and its navigation keyboard"""
+        # One extra row tells whether an older page exists
+        rows = self.get_db().get_completion_history(chat_id, limit=self.HISTORY_PAGE_SIZE + 1, before=before)
+        has_more = len(rows) > self.HISTORY_PAGE_SIZE
+        rows = rows[:self.HISTORY_PAGE_SIZE]
+
+        text = reports.render(reports.history_text, rows, self.MAX_MESSAGE_LENGTH)
+        if not rows:
+            return text, None
+
+        buttons = []
+        if before is not None:
+            buttons.append(InlineKeyboardButton("⏮️ Più recenti", callback_data="hist_top"))
+        if has_more:
+            buttons.append(InlineKeyboardButton("Più vecchie ➡️", callback_data=self._encode_history_cursor(rows[-1])))
+        return text, InlineKeyboardMarkup([buttons]) if buttons else None
+
+    @_instrumented_handler("command", "history")
+    async def history(self, update, context):
+        text, reply_markup = self._build_history_page(update.effective_chat.id)
+        await send_and_track_message(update.message.reply_text, text, parse_mode=ParseMode.MARKDOWN, reply_markup=reply_markup)
+
+    @_instrumented_handler("command", "export")
+    async def export_command(self, update, context):
+        """Send the family's members, assignments and completions as a gzip CSV/JSONL document"""
+        chat_id = update.effective_chat.id
+        fmt = context.args[0].lower() if context and context.args else "csv"
+        fmt = {"json": "jsonl"}.get(fmt, fmt)
+        if fmt not in export.FORMATS:
+            await send_and_track_message(update.message.reply_text, "❌ Formato non valido. Usa `/export csv` oppure `/export json`.",
+                                         parse_mode=ParseMode.MARKDOWN)
+            return
+        if chat_id in self._exports:
+            await send_and_track_message(update.message.reply_text, "⏳ Un export è già in corso per questa famiglia, attendi il file.")
+            return
+
+        self._exports.add(chat_id)
+        path = None
+        try:
+            # Cursore lato server + gzip in un thread: l'event loop resta libero
+            path, records = await asyncio.to_thread(export.write_export, self.get_db(), chat_id, fmt)
+            if os.path.getsize(path) > export.MAX_DOCUMENT_SIZE:
+                await send_and_track_message(update.message.reply_text, "❌ L'export supera i 50 MB consentiti da Telegram.")
+                return
+            # Non tracciato: il file resta in chat, la pulizia automatica non lo cancella
+            with open(path, "rb") as document:
+                await update.message.reply_document(
+                    document,
+                    filename=f"famiglia_{abs(chat_id)}_{datetime.now():%Y%m%d}.{fmt}.gz",
+                    caption=f"📦 Export della famiglia: {records} record ({fmt.upper()} compresso)",
+                )
+        except Exception as e:
+            logger.error(f"Errore durante l'export della chat {chat_id}: {e}")
+            await send_and_track_message(update.message.reply_text, "❌ Export non riuscito. Riprova tra poco.")
+        finally:
+            self._exports.discard(chat_id)
+            if path:
+                os.unlink(path)
+
+    @_instrumented_handler("command", "tasks")
     async def show_tasks(self, update, context):
         chat_id = update.effective_chat.id
-        total_tasks = len(self.get_db().get_all_tasks())
-        assigned_tasks = len(self.get_db().get_assigned_tasks_for_chat(chat_id))
-        
+        text, reply_markup = self._cached_view("categories", chat_id, lambda: self._build_categories_menu(chat_id))
+        await send_and_track_message(update.message.reply_text, text, parse_mode=ParseMode.MARKDOWN, reply_markup=reply_markup)
+
+    def _build_categories_menu(self, chat_id):
+        """Text and keyboard of the categories menu, with one fetch of tasks and assignments"""
+        assigned = self.get_db().get_assigned_tasks_for_chat(chat_id)
+        categorized_tasks = self._categorized_catalog(chat_id)
+        total_tasks = sum(len(cat_tasks) for cat_tasks in categorized_tasks.values())
+
         text = (
             "📋 **Scegli una categoria di task:**\n\n"
             f"📊 **Stato attuale:**\n"
             f"• 📦 Task totali: {total_tasks}\n"
-            f"• ✅ Assegnazioni totali: {assigned_tasks}\n"
+            f"• ✅ Assegnazioni totali: {len(assigned)}\n"
             f"• 🆓 Tutte le task sono sempre disponibili per nuove assegnazioni\n\n"
             "👇 Seleziona una categoria per vedere le task disponibili:"
         )
-        
-        # Get data once for efficiency
-        tasks = self.get_db().get_all_tasks()
-        assigned = self.get_db().get_assigned_tasks_for_chat(chat_id)
-        categorized_tasks = self._categorize_tasks_efficiently(tasks)
-        
+
         keyboard = []
         for cat, emoji, description in self.CATEGORIES:
             cat_key = cat.lower()
             cat_tasks = categorized_tasks.get(cat_key, [])
+            cat_task_ids = {t['id'] for t in cat_tasks}
             
             # Count assignments in this category
-            assigned_in_cat = len([a for a in assigned if any(t['id'] == a['task_id'] for t in cat_tasks)])
+            assigned_in_cat = sum(1 for a in assigned if a['task_id'] in cat_task_ids)
             total_in_cat = len(cat_tasks)
             
             if total_in_cat > 0:
@@ -295,12 +416,102 @@ class FamilyTaskBot:
                 
             keyboard.append([InlineKeyboardButton(
                 f"{emoji} {cat} {status}", 
-                callback_data=f"cat_{cat.lower()}"
+                callback_data=callbacks.encode("category", cat_key)
             )])
         
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        await send_and_track_message(update.message.reply_text, text, parse_mode=ParseMode.MARKDOWN, reply_markup=reply_markup)
+        return text, InlineKeyboardMarkup(keyboard)
+        
+    def _build_category_view(self, chat_id, cat, page=0):
+        """Text and paginated keyboard of one category, with assignment counts"""
+        assigned = self.get_db().get_assigned_tasks_for_chat(chat_id)
+        cat_name, cat_emoji, cat_description = next(c for c in self.CATEGORIES if c[0].lower() == cat)
+        
+        # Priority-based categorization (no overlaps), already sorted and cached
+        filtered = self._categorized_catalog(chat_id).get(cat, [])
+        
+        if not filtered:
+            text = (
+                f"{cat_emoji} **{cat_name}**\n\n"
+                f"📝 {cat_description}\n\n"
+                f"🚫 Nessuna task disponibile in questa categoria.\n\n"
+                "💡 Potrebbero essere tutte già assegnate!"
+            )
+            keyboard = [[InlineKeyboardButton("🔙 Tutte le Categorie", callback_data="tasks_menu")]]
+            return text, InlineKeyboardMarkup(keyboard)
+        
+        # Calculate statistics
+        assignment_counts = {}
+        for a in assigned:
+            assignment_counts[a['task_id']] = assignment_counts.get(a['task_id'], 0) + 1
+        total_assignments_in_cat = sum(assignment_counts.get(t['id'], 0) for t in filtered)
+        total_points = sum(t['points'] for t in filtered)
+        avg_time = sum(t['time_minutes'] for t in filtered) // max(len(filtered), 1)
+        
+        text = (
+            f"{cat_emoji} **{cat_name}**\n\n"
+            f"📝 {cat_description}\n\n"
+            f"📊 **Statistiche categoria:**\n"
+            f"• 📦 Task totali: {len(filtered)}\n"
+            f"• ✅ Assegnazioni attive: {total_assignments_in_cat}\n"
+            f"• ⭐ Punti totali disponibili: {total_points}\n"
+            f"• ⏱️ Tempo medio: ~{avg_time} min\n\n"
+            "👇 **Scegli una task da assegnare:**\n"
+            "💡 *Ogni task può essere assegnata a più persone*\n"
+        )
         
+        def task_button(t):
+            # Add difficulty indicator
+            if t['time_minutes'] <= 10:
+                difficulty = "🟢"  # Easy
+            elif t['time_minutes'] <= 25:
+                difficulty = "🟡"  # Medium
+            else:
+                difficulty = "🔴"  # Hard
+            
+            # Show assignment count instead of blocking assignment
+            assignment_count = assignment_counts.get(t['id'], 0)
+            if assignment_count > 0:
+                status = f"({assignment_count} assegnaz.)"
+            else:
+                status = ""
+            
+            # Always allow assignment - tasks can be assigned to multiple users
+            return InlineKeyboardButton(
+                f"{difficulty} {t['name'][:20]}{'...' if len(t['name']) > 20 else ''} ({t['points']}pt) {status}", 
+                callback_data=self._task_callback("assign", t['id'])
+            )
+        
+        reply_markup = keyboards.paged_keyboard(
+            filtered, task_button, callbacks.encode("category", cat), page,
+            footer=[[InlineKeyboardButton("🔙 Tutte le Categorie", callback_data="tasks_menu")]]
+        )
+        return text, reply_markup
+
+    def _cached_view(self, view, chat_id, build, *extra):
+        """(text, markup) of a view, rebuilt only when the catalog or the chat's assignments change.
+
+        The key embeds both data versions, so a bump makes old entries
+        unreachable and the LRU bound evicts them.
+        """
+        db = self.get_db()
+        key = (view, chat_id, db.catalog_key(chat_id), db.assignment_version(chat_id)) + extra
+        return self._render_cache.get_or_build(key, build)
+
+    def _categorized_catalog(self, chat_id):
+        """Family catalog split by category, each sorted by points then time.
+
+        Cached per catalog key: families without custom tasks share one entry.
+        """
+        db = self.get_db()
+
+        def build():
+            categorized = self._categorize_tasks_efficiently(db.get_all_tasks(chat_id))
+            return {
+                cat: sorted(tasks, key=lambda x: (-x['points'], x['time_minutes']))
+                for cat, tasks in categorized.items()
+            }
+        return self._page_cache.get_or_build(("categories", db.catalog_key(chat_id)), build)
+
     def _categorize_tasks_efficiently(self, tasks):
         """Categorize all tasks at once to avoid repeated processing"""
         # Create dict with full category names in lowercase
@@ -326,10 +537,17 @@ class FamilyTaskBot:
                 
         return categorized
 
+    @_instrumented_handler("command", "mytasks")
     async def my_tasks(self, update, context):
-        user = update.effective_user
-        chat_id = update.effective_chat.id
-        tasks = self.get_db().get_user_assigned_tasks(chat_id, user.id)
+        text, reply_markup = self._build_my_tasks(update.effective_chat.id, update.effective_user.id)
+        if update.callback_query:
+            await edit_message(update.callback_query, text, parse_mode=ParseMode.MARKDOWN, reply_markup=reply_markup)
+        else:
+            await send_and_track_message(update.message.reply_text, text, parse_mode=ParseMode.MARKDOWN, reply_markup=reply_markup)
+
+    def _build_my_tasks(self, chat_id, user_id, page=0):
+        """Text and paginated keyboard of the user's open tasks"""
+        tasks = self.get_db().get_user_assigned_tasks(chat_id, user_id)
         
         if not tasks:
             text = (
@@ -346,8 +564,7 @@ class FamilyTaskBot:
                 "• ⚡ Task veloci: 'Fare i letti', 'Preparare tavola'\n\n"
                 "🎯 **Ogni task completata = punti + progresso nella classifica!**"
             )
-            await send_and_track_message(update.message.reply_text, text, parse_mode=ParseMode.MARKDOWN)
-            return
+            return text, None
             
         total_points = sum(task['points'] for task in tasks)
         total_time = sum(task['time_minutes'] for task in tasks)
@@ -361,8 +578,9 @@ class FamilyTaskBot:
             "👇 **Clicca per completare:**\n"
         )
         
-        keyboard = []
-        for i, task in enumerate(tasks, 1):
+        # Only the tasks of the current page are listed, like their buttons
+        visible, page, _ = keyboards.paginate(tasks, page)
+        for i, task in enumerate(visible, page * keyboards.PAGE_SIZE + 1):
             # Add difficulty indicator based on time
             if task['time_minutes'] <= 10:
                 difficulty = "🟢"  # Easy
@@ -373,525 +591,814 @@ class FamilyTaskBot:
                 
             text += f"{i}. {difficulty} **{task['name']}**\n"
             text += f"   ⭐ {task['points']} pt • ⏱️ ~{task['time_minutes']} min\n\n"
-            
-            keyboard.append([
-                InlineKeyboardButton(
-                    f"✅ Completa: {task['name'][:25]}{'...' if len(task['name']) > 25 else ''}", 
-                    callback_data=f"complete_{task['task_id']}"
-                )
-            ])
-        
-        keyboard.append([
-            InlineKeyboardButton("🔙 Menu Principale", callback_data="main_menu")
-        ])
         
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        await send_and_track_message(update.message.reply_text, text, parse_mode=ParseMode.MARKDOWN, reply_markup=reply_markup)
+        reply_markup = keyboards.paged_keyboard(
+            tasks,
+            lambda task: InlineKeyboardButton(
+                f"✅ Completa: {task['name'][:25]}{'...' if len(task['name']) > 25 else ''}", 
+                callback_data=self._task_callback("complete", task['task_id'])
+            ),
+            "show_my_tasks", page,
+            footer=[[InlineKeyboardButton("🔙 Menu Principale", callback_data="main_menu")]]
+        )
+        return text, reply_markup
 
+    @_instrumented_handler("command", "assign_menu")
     async def assign_task_menu(self, update, context):
         chat_id = update.effective_chat.id
         user = update.effective_user
         self.get_db().add_family_member(chat_id, user.id, user.username, user.first_name)
-        tasks = self.get_db().get_all_tasks()
-        keyboard = []
-        for task in tasks:
-            keyboard.append([
-                InlineKeyboardButton(f"{task['name']} ({task['points']}pt)", callback_data=f"assign_{task['id']}")
-            ])
-        keyboard.append([InlineKeyboardButton("🔙 Indietro", callback_data="main_menu")])
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        reply_markup = self._build_assign_menu(chat_id)
         if update.message:
             await update.message.reply_text("*Scegli una task da assegnare:*", parse_mode=ParseMode.MARKDOWN, reply_markup=reply_markup)
         else:
-            await update.callback_query.edit_message_text("*Scegli una task da assegnare:*", parse_mode=ParseMode.MARKDOWN, reply_markup=reply_markup)
+            await edit_message(update.callback_query, "*Scegli una task da assegnare:*", parse_mode=ParseMode.MARKDOWN, reply_markup=reply_markup)
+
+    def _build_assign_menu(self, chat_id, page=0):
+        """One page of the family catalog; pages are cached per catalog key"""
+        db = self.get_db()
+        return self._page_cache.get_or_build(
+            ("assign_menu", db.catalog_key(chat_id), page),
+            lambda: keyboards.paged_keyboard(
+                db.get_all_tasks(chat_id),
+                lambda task: InlineKeyboardButton(f"{task['name']} ({task['points']}pt)", callback_data=self._task_callback("assign", task['id'])),
+                "assign_menu", page,
+                footer=[[InlineKeyboardButton("🔙 Indietro", callback_data="main_menu")]]
+            )
+        )
+
+    def _task_callback(self, action, task_id, *args):
+        """Compact callback_data of a task button (legacy form if the task has no short_id yet)"""
+        short_id = self.get_db().task_short_id(task_id)
+        if short_id is None:
+            return callbacks.legacy(action, *args, task_id)
+        return callbacks.encode(action, *args, short_id)
+
+    def _task_from_ref(self, ref, chat_id):
+        """Task of a callback argument in the family catalog: short_id (compact data) or text id (legacy data)"""
+        if isinstance(ref, int):
+            return self.get_db().get_task_by_short_id(ref, chat_id)
+        return self.get_db().get_task_by_id(ref, chat_id)
+
+    # Write actions a single user can trigger at most once per second (bursts of 3)
+    RATE_LIMITED_ACTIONS = ("doassign", "confirm_complete", "recdel", "customdel")
+
+    def _build_router(self):
+        """Callback router: one route per callbacks action, each handler(query, page, *args)"""
+        routes = router.Router(
+            _decode_callback,
+            middleware=(
+                router.answer_first,
+                router.catch_errors("❌ Si è verificato un errore. Riprova tra poco."),
+                _instrumented_route,
+            ),
+            fallback=self._on_none,
+        )
+        handlers = {
+            "main_menu": self._on_main_menu,
+            "tasks_menu": self._on_tasks_menu,
+            "assign_menu": self._on_assign_menu,
+            "show_my_tasks": self._on_show_my_tasks,
+            "show_stats": self._on_show_stats,
+            "show_leaderboard": self._on_show_leaderboard,
+            "cancel_complete": self._on_cancel_complete,
+            "history_top": self._on_history,
+            "none": self._on_none,
+            "assign": self._on_assign,
+            "doassign": self._on_doassign,
+            "complete": self._on_complete,
+            "confirm_complete": self._on_confirm_complete,
+            "category": self._on_category,
+            "leaderboard": self._on_leaderboard,
+            "history": self._on_history,
+            "recdel": self._on_recdel,
+            "customdel": self._on_customdel,
+        }
+        throttle = router.rate_limited(1, 3, "⏳ Un attimo, stai andando troppo veloce!")
+        for action, handler in handlers.items():
+            routes.add(
+                action, handler,
+                # Metrics keep the old callback prefixes as labels
+                label=callbacks.ACTIONS_BY_NAME[action].legacy,
+                middleware=(throttle,) if action in self.RATE_LIMITED_ACTIONS else (),
+            )
+        return routes
 
     async def button_handler(self, update, context):
+        """Dispatch a button press through the callback router (see _build_router)"""
         query = update.callback_query
-        data = query.data
+        await self.router.dispatch(query, query.data)
+
+    async def _on_main_menu(self, query, page):
+        await edit_message(query, "Menu principale. Usa i comandi o il menu.")
+
+    async def _on_assign(self, query, page, task_ref):
+        chat_id = query.message.chat.id
+        members = self.get_db().get_family_members(chat_id)
+        if not members:
+            text = (
+                "👥 **Nessun membro famiglia trovato!**\n\n"
+                "🚀 **Per aggiungere membri:**\n"
+                "1️⃣ Ogni persona deve usare /start nel gruppo\n"
+                "2️⃣ Il bot aggiungerà automaticamente tutti\n\n"
+                "💡 Solo i membri registrati possono ricevere task!"
+            )
+            keyboard = [[InlineKeyboardButton("🔙 Indietro", callback_data="tasks_menu")]]
+            reply_markup = InlineKeyboardMarkup(keyboard)
+            await edit_message(query, text, parse_mode=ParseMode.MARKDOWN, reply_markup=reply_markup)
+            return
+
+        # Get task details
+        task = self._task_from_ref(task_ref, chat_id)
+        if not task:
+            await edit_message(query, "❌ Task non trovata!")
+            return
+        task_id = task['id']
+
+        # Check who already has this task assigned (for information display only)
+        assigned_tasks = self.get_db().get_assigned_tasks_for_chat(chat_id)
+        already_assigned_users = [a['assigned_to'] for a in assigned_tasks if a['task_id'] == task_id]
+
+        # Add difficulty indicator
+        if task['time_minutes'] <= 10:
+            difficulty = "🟢 Facile"
+        elif task['time_minutes'] <= 25:
+            difficulty = "🟡 Medio"
+        else:
+            difficulty = "🔴 Difficile"
+
+        # Show current assignments for information
+        assigned_names = []
+        for user_id in already_assigned_users:
+            member = next((m for m in members if m['user_id'] == user_id), None)
+            if member:
+                assigned_names.append(member['first_name'])
+            else:
+                assigned_names.append(f"Utente {user_id}")
+
+        assignment_info = ""
+        if assigned_names:
+            assignment_info = f"\n👥 **Già assegnata a:** {', '.join(assigned_names)}\n"
+
+        text = (
+            f"🎯 **Assegna Task**\n\n"
+            f"📋 **{task['name']}**\n"
+            f"⭐ **Punti:** {task['points']}\n"
+            f"⏱️ **Tempo stimato:** ~{task['time_minutes']} minuti\n"
+            f"📊 **Difficoltà:** {difficulty}{assignment_info}\n"
+            f"👥 **Scegli a chi assegnare questa task:**\n"
+            f"💡 *Le task possono essere assegnate a più persone contemporaneamente*\n"
+        )
+
+        current_user = query.from_user.id
+
+        # Always show self-assignment option
+        if current_user not in already_assigned_users:
+            self_row = [InlineKeyboardButton(
+                "🫵 Assegna a me stesso",
+                callback_data=self._task_callback("doassign", task_id, current_user)
+            )]
+        else:
+            self_row = [InlineKeyboardButton(
+                "🫵 Già assegnata a me",
+                callback_data="none"
+            )]
+
+        # Add other family members - always allow assignment
+        def member_button(m):
+            if m['user_id'] in already_assigned_users:
+                return InlineKeyboardButton(f"✅ {m['first_name']} (già assegnata)", callback_data="none")
+            return InlineKeyboardButton(
+                f"👤 Assegna a {m['first_name']}", callback_data=self._task_callback("doassign", task_id, m['user_id'])
+            )
+
+        reply_markup = keyboards.paged_keyboard(
+            [m for m in members if m['user_id'] != current_user],
+            member_button, self._task_callback("assign", task_id), page,
+            header=[self_row],
+            footer=[[InlineKeyboardButton("🔙 Indietro", callback_data="assign_menu")]]
+        )
+
+        await edit_message(query, text, parse_mode=ParseMode.MARKDOWN, reply_markup=reply_markup)
+
+    async def _on_doassign(self, query, page, assigned_to, task_ref):
         chat_id = query.message.chat.id
         user_id = query.from_user.id
-        
-        # Always answer the callback query first to acknowledge button press
-        await query.answer()
-        
-        if data == "main_menu":
-            await query.edit_message_text("Menu principale. Usa i comandi o il menu.")
-        elif data.startswith("assign_"):
-            task_id = data.replace("assign_", "")
-            members = self.get_db().get_family_members(chat_id)
-            if not members:
-                text = (
-                    "👥 **Nessun membro famiglia trovato!**\n\n"
-                    "🚀 **Per aggiungere membri:**\n"
-                    "1️⃣ Ogni persona deve usare /start nel gruppo\n"
-                    "2️⃣ Il bot aggiungerà automaticamente tutti\n\n"
-                    "💡 Solo i membri registrati possono ricevere task!"
-                )
-                keyboard = [[InlineKeyboardButton("🔙 Indietro", callback_data="tasks_menu")]]
-                reply_markup = InlineKeyboardMarkup(keyboard)
-                await query.edit_message_text(text, parse_mode=ParseMode.MARKDOWN, reply_markup=reply_markup)
-                return
-                
-            # Get task details
-            task = self.get_db().get_task_by_id(task_id)
+        try:
+            # Get task and assignee details
+            task = self._task_from_ref(task_ref, chat_id)
             if not task:
-                await query.edit_message_text("❌ Task non trovata!")
+                await edit_message(query, "❌ Task non trovata!")
                 return
-            
-            # Check who already has this task assigned (for information display only)
-            assigned_tasks = self.get_db().get_assigned_tasks_for_chat(chat_id)
-            already_assigned_users = [a['assigned_to'] for a in assigned_tasks if a['task_id'] == task_id]
-            
-            # Add difficulty indicator
-            if task['time_minutes'] <= 10:
-                difficulty = "🟢 Facile"
-            elif task['time_minutes'] <= 25:
-                difficulty = "🟡 Medio"
+            task_id = task['id']
+            members = self.get_db().get_family_members(chat_id)
+            assignee = next((m for m in members if m['user_id'] == assigned_to), None)
+
+            # Assign the task
+            self.get_db().assign_task(chat_id, task_id, assigned_to, user_id)
+
+            # Create success message with enhanced feedback
+            if assigned_to == user_id:
+                assignee_name = "te stesso"
+                celebration = "💪"
             else:
-                difficulty = "🔴 Difficile"
-                
-            # Show current assignments for information
-            assigned_names = []
-            for user_id in already_assigned_users:
-                member = next((m for m in members if m['user_id'] == user_id), None)
-                if member:
-                    assigned_names.append(member['first_name'])
-                else:
-                    assigned_names.append(f"Utente {user_id}")
-            
-            assignment_info = ""
-            if assigned_names:
-                assignment_info = f"\n👥 **Già assegnata a:** {', '.join(assigned_names)}\n"
-                
-            text = (
-                f"🎯 **Assegna Task**\n\n"
+                assignee_name = assignee['first_name'] if assignee else f"Utente {assigned_to}"
+                celebration = "👏"
+
+            keyboard = [
+                [InlineKeyboardButton("📝 Vedi Tutte le Mie Task", callback_data="show_my_tasks")],
+                [InlineKeyboardButton("🎯 Assegna Altra Task", callback_data="tasks_menu")],
+                [InlineKeyboardButton("🏆 Vedi Classifica", callback_data="show_leaderboard")]
+            ]
+            reply_markup = InlineKeyboardMarkup(keyboard)
+
+            success_message = (
+                f"{celebration} **Task Assegnata con Successo!**\n\n"
                 f"📋 **{task['name']}**\n"
-                f"⭐ **Punti:** {task['points']}\n"
-                f"⏱️ **Tempo stimato:** ~{task['time_minutes']} minuti\n"
-                f"📊 **Difficoltà:** {difficulty}{assignment_info}\n"
-                f"👥 **Scegli a chi assegnare questa task:**\n"
-                f"💡 *Le task possono essere assegnate a più persone contemporaneamente*\n"
+                f"👤 **Assegnata a:** {assignee_name}\n"
+                f"⭐ **Punti in palio:** {task['points']}\n"
+                f"⏱️ **Tempo stimato:** ~{task['time_minutes']} minuti\n\n"
+                f"💡 **Prossimi passi:**\n"
+                f"• La task appare ora nelle attività di {assignee_name}\n"
+                f"• Completa entro 3 giorni per ottimizzare il punteggio\n"
+                f"• La stessa task può essere assegnata anche ad altri membri famiglia\n"
+                f"• Usa 📝 Le Mie Task per vedere tutte le tue attività"
             )
-            
-            keyboard = []
-            current_user = query.from_user.id
-            
-            # Always show self-assignment option
-            if current_user not in already_assigned_users:
-                keyboard.append([InlineKeyboardButton(
-                    "🫵 Assegna a me stesso", 
-                    callback_data=f"doassign_{current_user}_{task_id}"
-                )])
-            else:
-                keyboard.append([InlineKeyboardButton(
-                    "🫵 Già assegnata a me", 
-                    callback_data="none"
-                )])
-            
-            # Add other family members - always allow assignment
-            for m in members:
-                if m['user_id'] != current_user:
-                    if m['user_id'] in already_assigned_users:
-                        keyboard.append([InlineKeyboardButton(
-                            f"✅ {m['first_name']} (già assegnata)", 
-                            callback_data="none"
-                        )])
-                    else:
-                        keyboard.append([InlineKeyboardButton(
-                            f"👤 Assegna a {m['first_name']}", 
-                            callback_data=f"doassign_{m['user_id']}_{task_id}"
-                        )])
-            
-            keyboard.append([InlineKeyboardButton("🔙 Indietro", callback_data="assign_menu")])
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            
-            await query.edit_message_text(text, parse_mode=ParseMode.MARKDOWN, reply_markup=reply_markup)
-        elif data.startswith("doassign_"):
-            try:
-                _, assigned_to, task_id = data.split("_", 2)
-                # Validazione robusta: assigned_to deve essere int
-                if not assigned_to.isdigit():
-                    await query.edit_message_text(f"❌ Errore: ID utente non valido ({assigned_to})")
-                    return
-                
-                # Get task and assignee details
-                task = self.get_db().get_task_by_id(task_id)
-                members = self.get_db().get_family_members(chat_id)
-                assignee = next((m for m in members if m['user_id'] == int(assigned_to)), None)
-                
-                # Assign the task
-                self.get_db().assign_task(chat_id, task_id, int(assigned_to), user_id)
-                
-                # Create success message with enhanced feedback
-                if int(assigned_to) == user_id:
+
+            await edit_message(
+                query,
+                success_message,
+                parse_mode=ParseMode.MARKDOWN,
+                reply_markup=reply_markup
+            )
+        except ValueError as exc:
+            if "già assegnata" in str(exc):
+                if assigned_to == user_id:
                     assignee_name = "te stesso"
-                    celebration = "💪"
                 else:
                     assignee_name = assignee['first_name'] if assignee else f"Utente {assigned_to}"
-                    celebration = "👏"
-                
+
                 keyboard = [
-                    [InlineKeyboardButton("📝 Vedi Tutte le Mie Task", callback_data="show_my_tasks")],
-                    [InlineKeyboardButton("🎯 Assegna Altra Task", callback_data="tasks_menu")],
-                    [InlineKeyboardButton("🏆 Vedi Classifica", callback_data="show_leaderboard")]
+                    [InlineKeyboardButton("🔙 Torna alle Task", callback_data="tasks_menu")],
+                    [InlineKeyboardButton("📝 Le Mie Task", callback_data="show_my_tasks")]
                 ]
                 reply_markup = InlineKeyboardMarkup(keyboard)
-                
-                success_message = (
-                    f"{celebration} **Task Assegnata con Successo!**\n\n"
+
+                await edit_message(
+                    query,
+                    f"ℹ️ **Task già assegnata**\n\n"
                     f"📋 **{task['name']}**\n"
-                    f"👤 **Assegnata a:** {assignee_name}\n"
-                    f"⭐ **Punti in palio:** {task['points']}\n"
-                    f"⏱️ **Tempo stimato:** ~{task['time_minutes']} minuti\n\n"
-                    f"💡 **Prossimi passi:**\n"
-                    f"• La task appare ora nelle attività di {assignee_name}\n"
-                    f"• Completa entro 3 giorni per ottimizzare il punteggio\n"
-                    f"• La stessa task può essere assegnata anche ad altri membri famiglia\n"
-                    f"• Usa 📝 Le Mie Task per vedere tutte le tue attività"
-                )
-                
-                await query.edit_message_text(
-                    success_message,
+                    f"👤 È già assegnata a {assignee_name}\n\n"
+                    f"💡 **Perché non posso assegnarla di nuovo?**\n"
+                    f"Ogni persona può avere la stessa task assegnata una sola volta per evitare duplicati.\n\n"
+                    f"✅ **Cosa posso fare?**\n"
+                    f"• Scegliere un'altra persona per questa task\n"
+                    f"• Assegnarmi una task diversa\n"
+                    f"• Aspettare che {assignee_name} completi la task",
                     parse_mode=ParseMode.MARKDOWN,
                     reply_markup=reply_markup
                 )
-            except ValueError as exc:
-                if "già assegnata" in str(exc):
-                    # Get task and assignee details for friendly error message
-                    task = self.get_db().get_task_by_id(task_id)
-                    members = self.get_db().get_family_members(chat_id)
-                    assignee = next((m for m in members if m['user_id'] == int(assigned_to)), None)
-                    
-                    if int(assigned_to) == user_id:
-                        assignee_name = "te stesso"
-                    else:
-                        assignee_name = assignee['first_name'] if assignee else f"Utente {assigned_to}"
-                    
-                    keyboard = [
-                        [InlineKeyboardButton("🔙 Torna alle Task", callback_data="tasks_menu")],
-                        [InlineKeyboardButton("📝 Le Mie Task", callback_data="show_my_tasks")]
-                    ]
-                    reply_markup = InlineKeyboardMarkup(keyboard)
-                    
-                    await query.edit_message_text(
-                        f"ℹ️ **Task già assegnata**\n\n"
-                        f"📋 **{task['name']}**\n"
-                        f"👤 È già assegnata a {assignee_name}\n\n"
-                        f"💡 **Perché non posso assegnarla di nuovo?**\n"
-                        f"Ogni persona può avere la stessa task assegnata una sola volta per evitare duplicati.\n\n"
-                        f"✅ **Cosa posso fare?**\n"
-                        f"• Scegliere un'altra persona per questa task\n"
-                        f"• Assegnarmi una task diversa\n"
-                        f"• Aspettare che {assignee_name} completi la task",
-                        parse_mode=ParseMode.MARKDOWN,
-                        reply_markup=reply_markup
-                    )
-                else:
-                    await query.edit_message_text(
-                        f"❌ **Errore nell'assegnazione**\n\n"
-                        f"Dettagli: {exc}\n\n"
-                        "💡 Riprova o contatta l'amministratore se il problema persiste."
-                    )
-            except Exception as exc:
-                await query.edit_message_text(
+            else:
+                await edit_message(
+                    query,
                     f"❌ **Errore nell'assegnazione**\n\n"
                     f"Dettagli: {exc}\n\n"
                     "💡 Riprova o contatta l'amministratore se il problema persiste."
                 )
-        elif data == "assign_menu":
-            class DummyUpdate:
-                message = query.message
-                callback_query = None
-            await self.assign_task_menu(DummyUpdate(), context)
-        elif data == "show_my_tasks":
-            await self.my_tasks(update, context)
-        elif data.startswith("complete_"):
-            task_id = data.replace("complete_", "")
-            user_id = query.from_user.id
-            chat_id = query.message.chat.id
-            
-            # Validate task_id format
-            if not task_id or len(task_id.strip()) == 0:
-                await query.edit_message_text(
-                    "❌ **Errore nei parametri**\n\nID task non valido. Torna alle tue task e riprova.",
-                    parse_mode=ParseMode.MARKDOWN
-                )
-                return
-            
-            # Get task details before completion
-            task = self.get_db().get_task_by_id(task_id)
-            if not task:
-                await query.edit_message_text(
-                    "❌ **Task Non Trovata**\n\n"
-                    "La task richiesta non esiste più.\n\n"
-                    "💡 **Possibili motivi:**\n"
-                    "• Task rimossa dal sistema\n"
-                    "• Errore temporaneo del database\n\n"
-                    "🔄 Torna alle tue task per vedere quelle disponibili.",
-                    parse_mode=ParseMode.MARKDOWN
-                )
-                return
-                
-            # Check if task is actually assigned to user
-            user_tasks = self.get_db().get_user_assigned_tasks(chat_id, user_id)
-            if not any(t['task_id'] == task_id for t in user_tasks):
-                await query.edit_message_text(
-                    "❌ **Task Non Assegnata**\n\n"
-                    "Questa task non ti è attualmente assegnata.\n\n"
-                    "💡 **Possibili motivi:**\n"
-                    "• Task già completata\n"
-                    "• Task riassegnata ad altri\n"
-                    "• Sincronizzazione in corso\n\n"
-                    "🔄 Controlla le tue task attuali.",
-                    parse_mode=ParseMode.MARKDOWN
-                )
-                return
-                
-            try:
-                # Show confirmation first
+        except Exception as exc:
+            await edit_message(
+                query,
+                f"❌ **Errore nell'assegnazione**\n\n"
+                f"Dettagli: {exc}\n\n"
+                "💡 Riprova o contatta l'amministratore se il problema persiste."
+            )
+
+    async def _on_assign_menu(self, query, page):
+        await edit_message(
+            query,
+            "*Scegli una task da assegnare:*",
+            parse_mode=ParseMode.MARKDOWN,
+            reply_markup=self._build_assign_menu(query.message.chat.id, page)
+        )
+
+    async def _on_show_my_tasks(self, query, page):
+        text, reply_markup = self._build_my_tasks(query.message.chat.id, query.from_user.id, page)
+        await edit_message(query, text, parse_mode=ParseMode.MARKDOWN, reply_markup=reply_markup)
+
+    async def _on_complete(self, query, page, task_ref):
+        user_id = query.from_user.id
+        chat_id = query.message.chat.id
+
+        # Get task details before completion
+        task = self._task_from_ref(task_ref, chat_id)
+        if not task:
+            await edit_message(
+                query,
+                "❌ **Task Non Trovata**\n\n"
+                "La task richiesta non esiste più.\n\n"
+                "💡 **Possibili motivi:**\n"
+                "• Task rimossa dal sistema\n"
+                "• Errore temporaneo del database\n\n"
+                "🔄 Torna alle tue task per vedere quelle disponibili.",
+                parse_mode=ParseMode.MARKDOWN
+            )
+            return
+        task_id = task['id']
+
+        # Check if task is actually assigned to user
+        user_tasks = self.get_db().get_user_assigned_tasks(chat_id, user_id)
+        if not any(t['task_id'] == task_id for t in user_tasks):
+            await edit_message(
+                query,
+                "❌ **Task Non Assegnata**\n\n"
+                "Questa task non ti è attualmente assegnata.\n\n"
+                "💡 **Possibili motivi:**\n"
+                "• Task già completata\n"
+                "• Task riassegnata ad altri\n"
+                "• Sincronizzazione in corso\n\n"
+                "🔄 Controlla le tue task attuali.",
+                parse_mode=ParseMode.MARKDOWN
+            )
+            return
+
+        try:
+            # Show confirmation first
+            keyboard = [
+                [InlineKeyboardButton("✅ Sì, completa!", callback_data=self._task_callback("confirm_complete", task_id))],
+                [InlineKeyboardButton("❌ Annulla", callback_data="cancel_complete")]
+            ]
+            reply_markup = InlineKeyboardMarkup(keyboard)
+
+            text = (
+                f"🎯 **Conferma Completamento**\n\n"
+                f"📋 **Task:** {task['name']}\n"
+                f"⭐ **Punti da guadagnare:** +{task['points']}\n"
+                f"⏱️ **Tempo stimato originale:** ~{task['time_minutes']} minuti\n\n"
+                f"✨ **Dopo il completamento:**\n"
+                f"• Guadagnerai {task['points']} punti\n"
+                f"• La task sarà archiviata\n"
+                f"• Sarà subito disponibile per nuove assegnazioni\n\n"
+                "🤔 **Sei sicuro di aver completato questa task?**"
+            )
+
+            await edit_message(query, text, parse_mode=ParseMode.MARKDOWN, reply_markup=reply_markup)
+
+        except Exception as exc:
+            logger.error(f"Error preparing task completion confirmation for task {task_id}: {exc}")
+            await edit_message(
+                query,
+                f"❌ **Errore di Sistema**\n\n"
+                f"Impossibile preparare la conferma di completamento.\n\n"
+                f"🔄 Riprova o torna al menu principale.",
+                parse_mode=ParseMode.MARKDOWN
+            )
+
+    async def _on_confirm_complete(self, query, page, task_ref):
+        user_id = query.from_user.id
+        chat_id = query.message.chat.id
+
+        try:
+            task = self._task_from_ref(task_ref, chat_id)
+            awarded = []
+            ok = task is not None and self.get_db().complete_task(chat_id, task['id'], user_id, awarded=awarded)
+
+            if ok:
+                # Get updated user stats
+                user_stats = self.get_db().get_user_stats(user_id, chat_id)
+                level_up = False
+
+                # Check if user leveled up (basic check)
+                new_level = 1 + (user_stats['total_points'] // 50) if user_stats else 1
+                old_points = user_stats['total_points'] - task['points'] if user_stats else 0
+                old_level = 1 + (old_points // 50)
+                level_up = new_level > old_level
+
                 keyboard = [
-                    [InlineKeyboardButton("✅ Sì, completa!", callback_data=f"confirm_complete_{task_id}")],
-                    [InlineKeyboardButton("❌ Annulla", callback_data="cancel_complete")]
+                    [InlineKeyboardButton("📝 Le Mie Task", callback_data="show_my_tasks")],
+                    [InlineKeyboardButton("📊 Vedi Statistiche", callback_data="show_stats")],
+                    [InlineKeyboardButton("🏆 Classifica", callback_data="show_leaderboard")]
                 ]
                 reply_markup = InlineKeyboardMarkup(keyboard)
-                
-                text = (
-                    f"🎯 **Conferma Completamento**\n\n"
-                    f"📋 **Task:** {task['name']}\n"
-                    f"⭐ **Punti da guadagnare:** +{task['points']}\n"
-                    f"⏱️ **Tempo stimato originale:** ~{task['time_minutes']} minuti\n\n"
-                    f"✨ **Dopo il completamento:**\n"
-                    f"• Guadagnerai {task['points']} punti\n"
-                    f"• La task sarà archiviata\n"
-                    f"• Sarà subito disponibile per nuove assegnazioni\n\n"
-                    "🤔 **Sei sicuro di aver completato questa task?**"
-                )
-                
-                await query.edit_message_text(text, parse_mode=ParseMode.MARKDOWN, reply_markup=reply_markup)
-                
-            except Exception as exc:
-                logger.error(f"Error preparing task completion confirmation for task {task_id}: {exc}")
-                await query.edit_message_text(
-                    f"❌ **Errore di Sistema**\n\n"
-                    f"Impossibile preparare la conferma di completamento.\n\n"
-                    f"🔄 Riprova o torna al menu principale.",
-                    parse_mode=ParseMode.MARKDOWN
+
+                celebration = "🎉🎊" if level_up else "🎉"
+                level_msg = f"\n🆙 **LIVELLO AUMENTATO!** Ora sei livello {new_level}!" if level_up else ""
+                badge_msg = "".join(f"\n🎖️ **Nuovo badge:** {label}" for label in badges.labels(awarded))
+
+                success_text = (
+                    f"{celebration} **Task Completata con Successo!**\n\n"
+                    f"📋 **{task['name']}**\n"
+                    f"⭐ **Punti guadagnati:** +{task['points']}\n"
+                    f"📊 **Punti totali:** {user_stats['total_points'] if user_stats else task['points']}\n"
+                    f"🏅 **Livello attuale:** {new_level}{level_msg}{badge_msg}\n\n"
+                    f"🎯 **Ottimo lavoro!** La task è stata completata e archiviata.\n"
+                    f"✨ Ora è disponibile per nuove assegnazioni.\n\n"
+                    f"💪 Continua così per guadagnare più punti e salire di livello!"
                 )
-        
-        elif data.startswith("confirm_complete_"):
-            task_id = data.replace("confirm_complete_", "")
-            user_id = query.from_user.id
-            chat_id = query.message.chat.id
-            
-            try:
-                task = self.get_db().get_task_by_id(task_id)
-                ok = self.get_db().complete_task(chat_id, task_id, user_id)
-                
-                if ok:
-                    # Get updated user stats
-                    user_stats = self.get_db().get_user_stats(user_id)
-                    level_up = False
-                    
-                    # Check if user leveled up (basic check)
-                    new_level = 1 + (user_stats['total_points'] // 50) if user_stats else 1
-                    old_points = user_stats['total_points'] - task['points'] if user_stats else 0
-                    old_level = 1 + (old_points // 50)
-                    level_up = new_level > old_level
-                    
-                    keyboard = [
-                        [InlineKeyboardButton("📝 Le Mie Task", callback_data="show_my_tasks")],
-                        [InlineKeyboardButton("📊 Vedi Statistiche", callback_data="show_stats")],
-                        [InlineKeyboardButton("🏆 Classifica", callback_data="show_leaderboard")]
-                    ]
-                    reply_markup = InlineKeyboardMarkup(keyboard)
-                    
-                    celebration = "🎉🎊" if level_up else "🎉"
-                    level_msg = f"\n🆙 **LIVELLO AUMENTATO!** Ora sei livello {new_level}!" if level_up else ""
-                    
-                    success_text = (
-                        f"{celebration} **Task Completata con Successo!**\n\n"
-                        f"📋 **{task['name']}**\n"
-                        f"⭐ **Punti guadagnati:** +{task['points']}\n"
-                        f"📊 **Punti totali:** {user_stats['total_points'] if user_stats else task['points']}\n"
-                        f"🏅 **Livello attuale:** {new_level}{level_msg}\n\n"
-                        f"🎯 **Ottimo lavoro!** La task è stata completata e archiviata.\n"
-                        f"✨ Ora è disponibile per nuove assegnazioni.\n\n"
-                        f"💪 Continua così per guadagnare più punti e salire di livello!"
+
+                await edit_message(query, success_text, parse_mode=ParseMode.MARKDOWN, reply_markup=reply_markup)
+            else:
+                await edit_message(query, "❌ Task non trovata o già completata.")
+        except Exception as exc:
+            await edit_message(query, f"❌ Errore nel completamento: {exc}")
+
+    async def _on_cancel_complete(self, query, page):
+        await edit_message(query, "❌ Completamento annullato.\n\n💡 Torna alle tue task quando hai finito!")
+
+    async def _on_show_stats(self, query, page):
+        # Create a dummy update object for stats
+        class DummyUpdate:
+            def __init__(self, user, chat):
+                self.effective_user = user
+                self.effective_chat = chat
+                self.message = query.message
+        await self.stats(DummyUpdate(query.from_user, query.message.chat), None)
+
+    async def _on_show_leaderboard(self, query, page):
+        # Create a dummy update object for leaderboard
+        class DummyUpdate:
+            def __init__(self, user, chat):
+                self.effective_user = user
+                self.effective_chat = chat
+                self.message = query.message
+        await self.leaderboard(DummyUpdate(query.from_user, query.message.chat), None)
+
+    async def _on_history(self, query, page, micros=None, row_id=None):
+        before = None if micros is None else self._history_cursor(micros, row_id)
+        text, reply_markup = self._build_history_page(query.message.chat.id, before)
+        await edit_message(query, text, parse_mode=ParseMode.MARKDOWN, reply_markup=reply_markup)
+
+    async def _on_recdel(self, query, page, rec_id):
+        if self.get_db().delete_recurring_task(query.message.chat.id, rec_id):
+            if self.scheduler is not None:
+                self.scheduler.remove(rec_id)
+            await edit_message(query, "🗑️ Task ricorrente eliminata.")
+        else:
+            await edit_message(query, "❌ Task ricorrente non trovata.")
+
+    async def _on_customdel(self, query, page, task_ref):
+        chat_id = query.message.chat.id
+        db = self.get_db()
+        task = self._task_from_ref(task_ref, chat_id)
+        # Le ricorrenze della task spariscono con lei (ON DELETE CASCADE): toglile anche dallo scheduler
+        recurrences = [r['id'] for r in db.get_recurring_tasks(chat_id) if task and r['task_id'] == task['id']]
+        if task and db.delete_custom_task(chat_id, task['id']):
+            if self.scheduler is not None:
+                for rec_id in recurrences:
+                    self.scheduler.remove(rec_id)
+            await edit_message(query, f"🗑️ Task personalizzata **{task['name']}** eliminata.", parse_mode=ParseMode.MARKDOWN)
+        else:
+            await edit_message(query, "❌ Task personalizzata non trovata.")
+
+    async def _on_leaderboard(self, query, page, period):
+        if period not in self.LEADERBOARD_ALIASES.values():
+            await edit_message(query, "❌ Periodo classifica non valido.")
+            return
+        text, reply_markup = self._build_leaderboard(query.message.chat.id, period)
+        await edit_message(query, text, parse_mode=ParseMode.MARKDOWN, reply_markup=reply_markup)
+
+    async def _on_category(self, query, page, cat):
+        chat_id = query.message.chat.id
+        # Find category info
+        if not any(c[0].lower() == cat for c in self.CATEGORIES):
+            await edit_message(query, "❌ Categoria non trovata.")
+            return
+        # Clamp first: stale or forged pages must hit the same cache entry as the last page
+        _, page, _ = keyboards.paginate(self._categorized_catalog(chat_id).get(cat, []), page)
+        text, reply_markup = self._cached_view(
+            "category", chat_id, lambda: self._build_category_view(chat_id, cat, page), cat, page
+        )
+        await edit_message(query, text, parse_mode=ParseMode.MARKDOWN, reply_markup=reply_markup)
+
+    async def _on_tasks_menu(self, query, page):
+        chat_id = query.message.chat.id
+        # Return to categories menu with enhanced information
+        text, reply_markup = self._cached_view("categories", chat_id, lambda: self._build_categories_menu(chat_id))
+        await edit_message(query, text, parse_mode=ParseMode.MARKDOWN, reply_markup=reply_markup)
+
+    async def _on_none(self, query, page=0):
+        # Informational buttons (page counters, "già assegnata"): nothing to do
+        pass
+
+    @_instrumented_handler("command", "timezone")
+    async def timezone_command(self, update, context):
+        """Set the family timezone used to count streak days"""
+        if not context.args:
+            await send_and_track_message(
+                update.message.reply_text,
+                "🌍 **Fuso orario della famiglia**\n\n"
+                "Usa `/timezone <zona>` per cambiarlo, ad esempio `/timezone Europe/Rome`.\n"
+                "Serve a calcolare correttamente le streak giornaliere.",
+                parse_mode=ParseMode.MARKDOWN
+            )
+            return
+        timezone = context.args[0]
+        try:
+            self.get_db().set_family_timezone(update.effective_chat.id, timezone)
+        except ValueError:
+            await send_and_track_message(update.message.reply_text, f"❌ Fuso orario non riconosciuto: {timezone}")
+            return
+        await send_and_track_message(
+            update.message.reply_text,
+            f"✅ Fuso orario impostato su **{timezone}**.",
+            parse_mode=ParseMode.MARKDOWN
+        )
+
+    @_instrumented_handler("command", "recurring")
+    async def recurring_command(self, update, context):
+        """/recurring lists the family recurrences, /recurring <task_id> <regola> creates one"""
+        user = update.effective_user
+        chat_id = update.effective_chat.id
+        db = self.get_db()
+
+        if not context.args:
+            recurrences = db.get_recurring_tasks(chat_id)
+            text = "🔁 **Task Ricorrenti**\n\n"
+            keyboard = []
+            if recurrences:
+                for rec in recurrences:
+                    task = db.get_task_by_id(rec['task_id'], chat_id)
+                    name = task['name'] if task else rec['task_id']
+                    who = rec['first_name'] or str(rec['assigned_to'])
+                    text += (
+                        f"• **{escape_markdown(name)}** (`{rec['task_id']}`) → {escape_markdown(who)}\n"
+                        f"    {scheduler.describe_rule(rec['interval_days'])}, "
+                        f"prossima: {rec['next_due']:%d/%m %H:%M}\n"
                     )
-                    
-                    await query.edit_message_text(success_text, parse_mode=ParseMode.MARKDOWN, reply_markup=reply_markup)
-                else:
-                    await query.edit_message_text("❌ Task non trovata o già completata.")
-            except Exception as exc:
-                await query.edit_message_text(f"❌ Errore nel completamento: {exc}")
-        
-        elif data == "cancel_complete":
-            await query.edit_message_text("❌ Completamento annullato.\n\n💡 Torna alle tue task quando hai finito!")
-        
-        elif data == "show_stats":
-            # Create a dummy update object for stats
-            class DummyUpdate:
-                def __init__(self, user):
-                    self.effective_user = user
-                    self.message = query.message
-            await self.stats(DummyUpdate(query.from_user), None)
-            
-        elif data == "show_leaderboard":
-            # Create a dummy update object for leaderboard
-            class DummyUpdate:
-                def __init__(self, user, chat):
-                    self.effective_user = user
-                    self.effective_chat = chat
-                    self.message = query.message
-            await self.leaderboard(DummyUpdate(query.from_user, query.message.chat), None)
-        elif data.startswith("cat_"):
-            cat = data.replace("cat_", "")
-            tasks = self.get_db().get_all_tasks()
-            assigned = self.get_db().get_assigned_tasks_for_chat(chat_id)
-            assigned_task_ids = set(a['task_id'] for a in assigned)
-            
-            # Find category info
-            cat_info = next((c for c in self.CATEGORIES if c[0].lower() == cat), None)
-            if not cat_info:
-                await query.edit_message_text("❌ Categoria non trovata.")
-                return
-                
-            cat_name, cat_emoji, cat_description = cat_info
-            
-            # Use priority-based filtering to avoid overlaps
-            if cat == "altro":
-                # Special handling for "Altro" category - only uncategorized tasks
-                filtered = [t for t in tasks if self._is_uncategorized_task(t['name'].lower())]
+                    keyboard.append([InlineKeyboardButton(f"🗑️ {name}", callback_data=callbacks.encode("recdel", rec['id']))])
+                text += "\n"
             else:
-                # For other categories, use priority order to avoid overlaps
-                filtered = []
-                priority_categories = ["animali", "cucina", "spesa", "pulizie", "bucato", "giardino", "auto", "casa"]
-                for task in tasks:
-                    task_name_lower = task['name'].lower()
-                    assigned_category = None
-                    for pcat in priority_categories:
-                        if pcat in self.CATEGORY_MAP and self.CATEGORY_MAP[pcat](task_name_lower):
-                            assigned_category = pcat
-                            break
-                    if assigned_category == cat:
-                        filtered.append(task)
-            
-            if not filtered:
-                text = (
-                    f"{cat_emoji} **{cat_name}**\n\n"
-                    f"📝 {cat_description}\n\n"
-                    f"🚫 Nessuna task disponibile in questa categoria.\n\n"
-                    "💡 Potrebbero essere tutte già assegnate!"
-                )
-                keyboard = [[InlineKeyboardButton("🔙 Tutte le Categorie", callback_data="tasks_menu")]]
-                reply_markup = InlineKeyboardMarkup(keyboard)
-                await query.edit_message_text(text, parse_mode=ParseMode.MARKDOWN, reply_markup=reply_markup)
-                return
-            
-            # Calculate statistics
-            total_assignments_in_cat = len([a for a in assigned if any(t['id'] == a['task_id'] for t in filtered)])
-            total_points = sum(t['points'] for t in filtered)
-            avg_time = sum(t['time_minutes'] for t in filtered) // max(len(filtered), 1)
-            
-            text = (
-                f"{cat_emoji} **{cat_name}**\n\n"
-                f"📝 {cat_description}\n\n"
-                f"📊 **Statistiche categoria:**\n"
-                f"• 📦 Task totali: {len(filtered)}\n"
-                f"• ✅ Assegnazioni attive: {total_assignments_in_cat}\n"
-                f"• ⭐ Punti totali disponibili: {total_points}\n"
-                f"• ⏱️ Tempo medio: ~{avg_time} min\n\n"
-                "👇 **Scegli una task da assegnare:**\n"
-                "💡 *Ogni task può essere assegnata a più persone*\n"
+                text += "Nessuna task ricorrente pianificata.\n\n"
+            # Gli id servono per /recurring: mostra quelli delle task aperte dell'utente
+            mine = db.get_user_assigned_tasks(chat_id, user.id)
+            if mine:
+                text += "📋 **Le tue task (id):**\n"
+                for t in mine[:10]:
+                    text += f"• `{t['task_id']}` {escape_markdown(t['name'])}\n"
+                text += "\n"
+            text += (
+                "💡 **Per crearne una:**\n"
+                "`/recurring <id_task> giornaliera`\n"
+                "`/recurring <id_task> settimanale`\n"
+                "`/recurring <id_task> ogni 3 giorni`\n\n"
+                "L'id è quello tra `apici` nell'elenco qui sopra."
             )
-            
+            await send_and_track_message(
+                update.message.reply_text, text, parse_mode=ParseMode.MARKDOWN,
+                reply_markup=InlineKeyboardMarkup(keyboard) if keyboard else None
+            )
+            return
+
+        task_id = context.args[0]
+        task = db.get_task_by_id(task_id, chat_id)
+        if not task:
+            await send_and_track_message(
+                update.message.reply_text, f"❌ Task non trovata: {task_id}\n\nUsa /recurring per vedere gli id delle tue task."
+            )
+            return
+        try:
+            interval_days = scheduler.parse_rule(" ".join(context.args[1:]) or "settimanale")
+        except ValueError:
+            await send_and_track_message(
+                update.message.reply_text,
+                "❌ Regola non valida. Usa giornaliera, settimanale oppure 'ogni N giorni'."
+            )
+            return
+
+        db.add_family_member(chat_id, user.id, user.username, user.first_name)
+        # First occurrence is due now: the scheduler assigns it right away
+        rec = db.add_recurring_task(chat_id, task_id, user.id, user.id, interval_days, datetime.now())
+        if self.scheduler is not None:
+            self.scheduler.add(rec)
+        await send_and_track_message(
+            update.message.reply_text,
+            f"🔁 **{escape_markdown(task['name'])}** pianificata {scheduler.describe_rule(interval_days)} "
+            f"per {escape_markdown(user.first_name)}.",
+            parse_mode=ParseMode.MARKDOWN
+        )
+
+    @_instrumented_handler("command", "customtask")
+    async def customtask_command(self, update, context):
+        """/customtask lists the family's own tasks, /customtask <punti> <minuti> <nome> adds one"""
+        user = update.effective_user
+        chat_id = update.effective_chat.id
+        db = self.get_db()
+
+        if not context.args:
+            custom = db.get_custom_tasks(chat_id)
+            text = "🧩 **Task della Famiglia**\n\n"
             keyboard = []
-            
-            # Sort tasks by points (higher first) and then by time (shorter first)
-            sorted_tasks = sorted(filtered, key=lambda x: (-x['points'], x['time_minutes']))
-            
-            for t in sorted_tasks:
-                # Add difficulty indicator
-                if t['time_minutes'] <= 10:
-                    difficulty = "🟢"  # Easy
-                elif t['time_minutes'] <= 25:
-                    difficulty = "🟡"  # Medium
-                else:
-                    difficulty = "🔴"  # Hard
-                
-                # Show assignment count instead of blocking assignment
-                assignment_count = len([a for a in assigned if a['task_id'] == t['id']])
-                if assignment_count > 0:
-                    status = f"({assignment_count} assegnaz.)"
-                else:
-                    status = ""
-                
-                # Always allow assignment - tasks can be assigned to multiple users
-                keyboard.append([InlineKeyboardButton(
-                    f"{difficulty} {t['name'][:20]}{'...' if len(t['name']) > 20 else ''} ({t['points']}pt) {status}", 
-                    callback_data=f"assign_{t['id']}"
-                )])
-            
-            keyboard.append([InlineKeyboardButton("🔙 Tutte le Categorie", callback_data="tasks_menu")])
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            await query.edit_message_text(text, parse_mode=ParseMode.MARKDOWN, reply_markup=reply_markup)
-        elif data == "tasks_menu":
-            # Return to categories menu with enhanced information
-            chat_id = query.message.chat.id
-            total_tasks = len(self.get_db().get_all_tasks())
-            assigned_tasks = len(self.get_db().get_assigned_tasks_for_chat(chat_id))
-            
+            if custom:
+                for task in custom:
+                    text += f"• **{task['name']}** — ⭐ {task['points']} pt • ⏱️ ~{task['time_minutes']} min\n"
+                    keyboard.append([InlineKeyboardButton(f"🗑️ {task['name']}", callback_data=self._task_callback("customdel", task['id']))])
+                text += "\n"
+            else:
+                text += "Nessuna task personalizzata: la famiglia usa il catalogo comune.\n\n"
+            text += (
+                "💡 **Per crearne una:**\n"
+                "`/customtask <punti> <minuti> <nome>`\n"
+                "Esempio: `/customtask 6 15 Portare a spasso Fido`"
+            )
+            await send_and_track_message(
+                update.message.reply_text, text, parse_mode=ParseMode.MARKDOWN,
+                reply_markup=InlineKeyboardMarkup(keyboard) if keyboard else None
+            )
+            return
+
+        name = " ".join(context.args[2:]).strip()
+        points, minutes = catalog_import.parse_task_numbers(*(context.args[:2] + [None, None])[:2])
+        problems = catalog_import.task_problems(name, points, minutes)
+        if problems:
+            # Testo semplice: i messaggi citano nomi di colonne con "_"
+            await send_and_track_message(
+                update.message.reply_text,
+                "❌ Task non valida: " + "; ".join(problems) + "\n\nUso: /customtask <punti> <minuti> <nome>"
+            )
+            return
+
+        db.add_family_member(chat_id, user.id, user.username, user.first_name)
+        try:
+            task = db.add_custom_task(chat_id, name, points, minutes)
+        except ValueError as e:
+            await send_and_track_message(update.message.reply_text, f"❌ {e}")
+            return
+        await send_and_track_message(
+            update.message.reply_text,
+            f"🧩 **{task['name']}** aggiunta alle task della famiglia (⭐ {task['points']} pt • ⏱️ ~{task['time_minutes']} min).\n\n"
+            "La trovi in 📋 Tutte le Task, nella sua categoria.",
+            parse_mode=ParseMode.MARKDOWN
+        )
+
+    IMPORT_USAGE = (
+        "📥 **Import catalogo task**\n\n"
+        "Invia un file `.csv` o `.json` con didascalia `/import` "
+        "(oppure `/import prova` per vedere solo le differenze).\n\n"
+        "Colonne: `id,name,points,time_minutes`. Le task assenti dal file restano invariate."
+    )
+
+    @_instrumented_handler("command", "import")
+    async def import_command(self, update, context):
+        """Admin-only: explain how to upload a catalog (the file itself goes to import_catalog)"""
+        if not self.is_admin(update.effective_user.id):
+            await send_and_track_message(update.message.reply_text, "⛔ Comando riservato agli amministratori.")
+            return
+        await send_and_track_message(update.message.reply_text, self.IMPORT_USAGE, parse_mode=ParseMode.MARKDOWN)
+
+    @_instrumented_handler("command", "import_file")
+    async def import_catalog(self, update, context):
+        """Admin-only: validate an uploaded CSV/JSON catalog, diff it and merge it into tasks"""
+        if not self.is_admin(update.effective_user.id):
+            await send_and_track_message(update.message.reply_text, "⛔ Comando riservato agli amministratori.")
+            return
+        document = update.message.document
+        dry_run = "prova" in (update.message.caption or "").lower().split()[1:]
+        if not document.file_name or not document.file_name.lower().endswith((".csv", ".json")):
+            await send_and_track_message(update.message.reply_text, self.IMPORT_USAGE, parse_mode=ParseMode.MARKDOWN)
+            return
+        if document.file_size and document.file_size > catalog_import.MAX_FILE_SIZE:
+            await send_and_track_message(update.message.reply_text, "❌ File troppo grande (massimo 1 MB).")
+            return
+
+        db = self.get_db()
+        try:
+            telegram_file = await document.get_file()
+            data = bytes(await telegram_file.download_as_bytearray())
+            tasks = catalog_import.parse_catalog(data, document.file_name)
+        except catalog_import.CatalogError as e:
+            # Testo semplice: gli errori citano id e colonne con "_"
+            await send_and_track_message(update.message.reply_text, f"❌ File rifiutato, nessuna modifica:\n{e}")
+            return
+        diff = catalog_import.diff_catalog(db.get_all_tasks(), tasks)
+
+        text = (
+            f"📥 **{'Anteprima import' if dry_run else 'Import catalogo'}** ({len(tasks)} task nel file)\n\n"
+            f"➕ Nuove: {len(diff.added)}\n"
+            f"✏️ Modificate: {len(diff.changed)}\n"
+            f"➖ Invariate: {len(diff.unchanged)}\n"
+            f"📦 Non presenti nel file (restano): {len(diff.missing)}\n"
+        )
+        for label, ids in (("Nuove", diff.added), ("Modificate", diff.changed)):
+            if ids:
+                shown = ", ".join(ids[:15]) + (f" e altre {len(ids) - 15}" if len(ids) > 15 else "")
+                text += f"\n{label}: `{shown}`"
+
+        if not dry_run and (diff.added or diff.changed):
+            try:
+                added, updated = db.import_tasks(tasks)
+            except Exception as e:
+                logger.error(f"Import catalogo fallito: {e}")
+                await send_and_track_message(update.message.reply_text, "❌ Import non riuscito, catalogo invariato.")
+                return
+            text += f"\n\n✅ Catalogo aggiornato: {len(added)} aggiunte, {len(updated)} modificate."
+        elif not dry_run:
+            text += "\n\n✅ Nessuna modifica da applicare."
+        await send_and_track_message(update.message.reply_text, text, parse_mode=ParseMode.MARKDOWN)
+
+    @_instrumented_handler("command", "profile")
+    async def profile_command(self, update, context):
+        """Admin-only: profile the running bot for N seconds (default 30)"""
+        user = update.effective_user
+        chat_id = update.effective_chat.id
+        if not self.is_admin(user.id):
+            await send_and_track_message(update.message.reply_text, "⛔ Comando riservato agli amministratori.")
+            return
+
+        if self._profile_task and not self._profile_task.done():
+            await send_and_track_message(update.message.reply_text, "⏳ Una profilazione è già in corso, attendi il report.")
+            return
+
+        duration = 30
+        if context.args and context.args[0].isdigit():
+            duration = int(context.args[0])
+        duration = max(1, min(duration, profiler.MAX_DURATION))
+
+        await send_and_track_message(
+            update.message.reply_text,
+            f"🔬 **Profilazione avviata** per {duration} secondi...\n\n"
+            "Il bot continua a rispondere normalmente, riceverai il report al termine.",
+            parse_mode=ParseMode.MARKDOWN
+        )
+        # Run in background so the profiled loop keeps serving other updates
+        self._profile_task = context.application.create_task(
+            self.run_profile(duration, bot=context.bot, chat_id=chat_id)
+        )
+
+    async def run_profile(self, duration, bot=None, chat_id=None):
+        """Sample the event loop, write collapsed stacks to disk and report hot functions"""
+        try:
+            result = await profiler.profile_for(duration)
+            path = await asyncio.to_thread(result.write, self.profile_dir)
+        except Exception as e:
+            logger.error(f"Errore durante la profilazione: {e}")
+            if bot and chat_id:
+                await send_and_track_message(bot.send_message, chat_id=chat_id, text=f"❌ Profilazione fallita: {e}")
+            return None
+
+        hot = result.hot_functions()
+        waiting = result.hot_functions(kind="task", limit=5)
+        logger.info(f"Profilo salvato in {path}; funzioni più calde: {hot[:5]}; in attesa: {waiting}")
+        if bot and chat_id:
             text = (
-                "📋 **Scegli una categoria di task:**\n\n"
-                f"📊 **Stato attuale:**\n"
-                f"• 📦 Task totali: {total_tasks}\n"
-                f"• ✅ Assegnazioni totali: {assigned_tasks}\n"
-                f"• 🆓 Tutte le task sono sempre disponibili per nuove assegnazioni\n\n"
-                "👇 Seleziona una categoria per vedere le task disponibili:"
+                f"🔬 **Profilazione completata**\n\n"
+                f"⏱️ Durata: {result.duration:.1f}s • 📊 Campioni: {result.samples}\n"
+                f"💾 File: `{path}`\n\n"
             )
-            
-            keyboard = []
-            for cat, emoji, description in self.CATEGORIES:
-                # Count tasks in this category (same logic as show_tasks)
-                tasks = self.get_db().get_all_tasks()
-                assigned = self.get_db().get_assigned_tasks_for_chat(chat_id)
-                
-                if cat.lower() == "altro":
-                    cat_tasks = [t for t in tasks if self._is_uncategorized_task(t['name'].lower())]
-                else:
-                    cat_tasks = []
-                    for task in tasks:
-                        task_name_lower = task['name'].lower()
-                        priority_categories = ["animali", "cucina", "spesa", "pulizie", "bucato", "giardino", "auto", "casa"]
-                        for pcat in priority_categories:
-                            if pcat in self.CATEGORY_MAP and self.CATEGORY_MAP[pcat](task_name_lower):
-                                if pcat == cat.lower():
-                                    cat_tasks.append(task)
-                                break
-                
-                # Count assignments in this category
-                assigned_in_cat = len([a for a in assigned if any(t['id'] == a['task_id'] for t in cat_tasks)])
-                total_in_cat = len(cat_tasks)
-                
-                if total_in_cat > 0:
-                    if assigned_in_cat > 0:
-                        status = f"({assigned_in_cat} assegnaz.)"
-                    else:
-                        status = f"({total_in_cat} disponibili)"
-                else:
-                    status = "(vuota)"
-                    
-                keyboard.append([InlineKeyboardButton(
-                    f"{emoji} {cat} {status}", 
-                    callback_data=f"cat_{cat.lower()}"
-                )])
-            
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            await query.edit_message_text(text, parse_mode=ParseMode.MARKDOWN, reply_markup=reply_markup)
-        else:
-            # For unhandled callback data, just acknowledge without changing the message
-            pass
+            # Percentuali sui tick: CPU del loop e attese delle task sono riportate separatamente
+            if hot:
+                text += "🔥 **In esecuzione sul loop (bot_handlers.py / db.py):**\n"
+                for i, entry in enumerate(hot, 1):
+                    share = 100 * entry['samples'] // max(result.samples, 1)
+                    text += f"{i}. `{entry['function']}` — {share}% ({entry['self_samples']} self)\n"
+            if waiting:
+                text += "\n⏳ **In attesa nelle task:**\n"
+                for i, entry in enumerate(waiting, 1):
+                    share = 100 * entry['samples'] // max(result.samples, 1)
+                    text += f"{i}. `{entry['function']}` — {share}%\n"
+            if not hot and not waiting:
+                text += "💤 Nessun campione in bot_handlers.py o db.py: il bot era inattivo."
+            await send_and_track_message(bot.send_message, chat_id=chat_id, text=text, parse_mode=ParseMode.MARKDOWN)
+        return path
+
+    # Exact (lowercased) texts of the reply keyboard and their aliases -> handler method
+    TEXT_COMMANDS = {
+        **dict.fromkeys(["/tasks", "tasks", "📋 tasks", "📋 tutte le task"], "show_tasks"),
+        **dict.fromkeys(["/mytasks", "mytasks", "📝 mytasks", "📝 le mie task"], "my_tasks"),
+        **dict.fromkeys(["/leaderboard", "leaderboard", "🏆 leaderboard", "🏆 classifica"], "leaderboard"),
+        **dict.fromkeys(["/stats", "stats", "📊 stat", "📊 statistiche"], "stats"),
+        **dict.fromkeys(["/help", "help", "❓ help", "❓ aiuto"], "help_command"),
+        "⚙️ gestione": "management_menu",
+    }
+    # Keyword fallbacks in priority order, in one pass: the alternatives are
+    # anchored lookaheads, so the first branch matching anywhere in the text wins
+    TEXT_FALLBACKS = re.compile(
+        r"^(?:(?=.*?(?P<show_tasks>assegna|task))"
+        r"|(?=.*?(?P<leaderboard>classifica|leaderboard))"
+        r"|(?=.*?(?P<stats>stat)))",
+        re.DOTALL
+    )
+    MAX_TEXT_LENGTH = 200
 
+    @classmethod
+    def match_text_command(cls, text):
+        """Handler method name for a lowercased message, None for chatter"""
+        action = cls.TEXT_COMMANDS.get(text)
+        if action is None:
+            match = cls.TEXT_FALLBACKS.match(text)
+            action = match.lastgroup if match else None
+        return action
+
+    @classmethod
+    def is_group_chatter(cls, update):
+        """True for group text that handle_message drops without a reply or DB work"""
+        message, chat = update.message, update.effective_chat
+        if message is None or not message.text or chat is None or chat.type == ChatType.PRIVATE:
+            return False
+        text = message.text.strip().lower()
+        if text.startswith("/"):
+            return False
+        return len(text) > cls.MAX_TEXT_LENGTH or cls.match_text_command(text) is None
+
+    @_instrumented_handler("message", "text")
     async def handle_message(self, update, context):
         """Handle text messages with improved input validation and error handling"""
         user = update.effective_user
@@ -902,83 +1409,39 @@ class FamilyTaskBot:
             logger.warning(f"Invalid message received: user={user}, message={update.message}")
             return
             
-        try:
-            self.get_db().add_family_member(chat_id, user.id, user.username, user.first_name)
-        except Exception as e:
-            logger.error(f"Errore auto-add membro {user.id} ({user.first_name}) in chat {chat_id}: {e}")
-            # Continue execution - member might already exist
-            
         # Clean and normalize the input text
         text = update.message.text.strip().lower()
+        private = update.effective_chat.type == ChatType.PRIVATE
         
         # Validate text length to prevent abuse
-        if len(text) > 200:
-            await send_and_track_message(
-                update.message.reply_text,
-                "🤖 **Messaggio troppo lungo**\n\nUsa i comandi del menu per navigare più facilmente!",
-                parse_mode=ParseMode.MARKDOWN
-            )
-            return
-        
-        try:
-            # Enhanced message handling with new keyboard layout
-            if text in ["/tasks", "tasks", "📋 tasks", "📋 tutte le task"]:
-                await self.show_tasks(update, context)
-            elif text in ["/mytasks", "mytasks", "📝 mytasks", "📝 le mie task"]:
-                await self.my_tasks(update, context)
-            elif text in ["/leaderboard", "leaderboard", "🏆 leaderboard", "🏆 classifica"]:
-                await self.leaderboard(update, context)
-            elif text in ["/stats", "stats", "📊 stat", "📊 statistiche"]:
-                await self.stats(update, context)
-            elif text in ["/help", "help", "❓ help", "❓ aiuto"]:
-                await self.help_command(update, context)
-            elif text in ["⚙️ gestione"]:
-                # Management menu for future features
+        if len(text) > self.MAX_TEXT_LENGTH:
+            metrics.TEXT_MESSAGES.inc(result="too_long")
+            if private:
                 await send_and_track_message(
                     update.message.reply_text,
-                    "⚙️ **Menu Gestione**\n\n"
-                    "🔧 **Funzionalità in sviluppo:**\n"
-                    "• Impostazioni famiglia personalizzate\n"
-                    "• Task personalizzate per la tua famiglia\n"
-                    "• Sistema di notifiche avanzato\n"
-                    "• Pianificazione task ricorrenti\n\n"
-                    "💡 **Per ora usa il menu principale per tutte le funzioni disponibili.**\n\n"
-                    "🚀 Stay tuned per gli aggiornamenti!",
+                    "🤖 **Messaggio troppo lungo**\n\nUsa i comandi del menu per navigare più facilmente!",
                     parse_mode=ParseMode.MARKDOWN
                 )
-            elif "assegna" in text or "task" in text:
-                await self.show_tasks(update, context)
-            elif "classifica" in text or "leaderboard" in text:
-                await self.leaderboard(update, context)
-            elif "stat" in text:
-                await self.stats(update, context)
+            return
+        
+        action = self.match_text_command(text)
+        if action is None and not private:
+            # Group chatter: no DB work and no reply
+            metrics.TEXT_MESSAGES.inc(result="ignored")
+            return
+        metrics.TEXT_MESSAGES.inc(result="matched" if action else "unrecognized")
+        
+        try:
+            self.get_db().add_family_member(chat_id, user.id, user.username, user.first_name)
+        except Exception as e:
+            logger.error(f"Errore auto-add membro {user.id} ({user.first_name}) in chat {chat_id}: {e}")
+            # Continue execution - member might already exist
+        
+        try:
+            if action is not None:
+                await getattr(self, action)(update, context)
             else:
-                # Friendly response for unrecognized messages with suggestions
-                keyboard = [
-                    ["📋 Tutte le Task", "📝 Le Mie Task"],
-                    ["🏆 Classifica", "📊 Statistiche"]
-                ]
-                reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
-                
-                # Provide context-aware suggestions
-                suggestions = []
-                if any(word in text for word in ["help", "aiuto", "come", "cosa"]):
-                    suggestions.append("• Prova `/help` per la guida completa")
-                if any(word in text for word in ["punto", "punti", "livello"]):
-                    suggestions.append("• Usa '📊 Statistiche' per vedere i tuoi progressi")
-                if any(word in text for word in ["famiglia", "membri", "chi"]):
-                    suggestions.append("• Usa '🏆 Classifica' per vedere tutti i membri")
-                
-                suggestion_text = "\n".join(suggestions) if suggestions else "• Usa il menu qui sotto per navigare facilmente"
-                
-                await send_and_track_message(
-                    update.message.reply_text,
-                    f"👋 Ciao {user.first_name}! Non ho capito \"{update.message.text[:50]}{'...' if len(update.message.text) > 50 else ''}\"\n\n"
-                    f"💡 **Suggerimenti:**\n{suggestion_text}\n\n"
-                    f"🚀 **I bottoni del menu sono il modo più veloce per navigare!**",
-                    reply_markup=reply_markup,
-                    parse_mode=ParseMode.MARKDOWN
-                )
+                await self._reply_unrecognized(update, text)
         except Exception as e:
             logger.error(f"Error handling message '{text}' from user {user.id}: {e}")
             await send_and_track_message(
@@ -993,6 +1456,51 @@ class FamilyTaskBot:
                 parse_mode=ParseMode.MARKDOWN
             )
 
+    async def management_menu(self, update, context):
+        # Management menu for future features
+        await send_and_track_message(
+            update.message.reply_text,
+            "⚙️ **Menu Gestione**\n\n"
+            "🔁 **Task ricorrenti:** usa `/recurring` per pianificarle\n"
+            "🧩 **Task personalizzate:** usa `/customtask` per crearle\n"
+            "🌍 **Fuso orario:** usa `/timezone` per le streak\n\n"
+            "🔧 **Funzionalità in sviluppo:**\n"
+            "• Impostazioni famiglia personalizzate\n"
+            "• Sistema di notifiche avanzato\n\n"
+            "💡 **Per ora usa il menu principale per tutte le funzioni disponibili.**\n\n"
+            "🚀 Stay tuned per gli aggiornamenti!",
+            parse_mode=ParseMode.MARKDOWN
+        )
+
+    async def _reply_unrecognized(self, update, text):
+        """Friendly response for unrecognized private messages with suggestions"""
+        user = update.effective_user
+        keyboard = [
+            ["📋 Tutte le Task", "📝 Le Mie Task"],
+            ["🏆 Classifica", "📊 Statistiche"]
+        ]
+        reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+        
+        # Provide context-aware suggestions
+        suggestions = []
+        if any(word in text for word in ["help", "aiuto", "come", "cosa"]):
+            suggestions.append("• Prova `/help` per la guida completa")
+        if any(word in text for word in ["punto", "punti", "livello"]):
+            suggestions.append("• Usa '📊 Statistiche' per vedere i tuoi progressi")
+        if any(word in text for word in ["famiglia", "membri", "chi"]):
+            suggestions.append("• Usa '🏆 Classifica' per vedere tutti i membri")
+        
+        suggestion_text = "\n".join(suggestions) if suggestions else "• Usa il menu qui sotto per navigare facilmente"
+        
+        await send_and_track_message(
+            update.message.reply_text,
+            f"👋 Ciao {user.first_name}! Non ho capito \"{update.message.text[:50]}{'...' if len(update.message.text) > 50 else ''}\"\n\n"
+            f"💡 **Suggerimenti:**\n{suggestion_text}\n\n"
+            f"🚀 **I bottoni del menu sono il modo più veloce per navigare!**",
+            reply_markup=reply_markup,
+            parse_mode=ParseMode.MARKDOWN
+        )
+
     # async def assign_category_menu(self, query, catid):
     #     """Mostra le task della categoria scelta, indicando se già assegnate"""
     #     tasks = self.get_db().get_default_tasks()
@@ -1039,14 +1547,15 @@ class FamilyTaskBot:
                 keyboard.append([InlineKeyboardButton(f"✅ {m['first_name']} (già assegnata)", callback_data="none")])
         keyboard.append([InlineKeyboardButton("🔙 Indietro", callback_data="assign_menu")])
         reply_markup = InlineKeyboardMarkup(keyboard)
-        task = self.get_db().get_task_by_id(task_id)
+        task = self.get_db().get_task_by_id(task_id, chat_id)
         message_text = (
             f"*🎯 A chi vuoi assegnare:*\n\n"
             f"📋 **{task['name']}**\n"
             f"⭐ {task['points']} punti | ⏱️ ~{task['time_minutes']} minuti\n\n"
             f"👥 *Scegli un membro della famiglia:*"
         )
-        await query.edit_message_text(
+        await edit_message(
+            query,
             message_text,
             parse_mode=ParseMode.MARKDOWN,
             reply_markup=reply_markup
@@ -1059,7 +1568,8 @@ class FamilyTaskBot:
         
         # Validate inputs
         if not task_id or not str(target_user_id).isdigit():
-            await query.edit_message_text(
+            await edit_message(
+                query,
                 "❌ **Errore nei parametri**\n\nParametri di assegnazione non validi. Riprova dal menu.",
                 parse_mode=ParseMode.MARKDOWN
             )
@@ -1067,9 +1577,10 @@ class FamilyTaskBot:
             
         try:
             # Check if task exists before assignment
-            task = self.get_db().get_task_by_id(task_id)
+            task = self.get_db().get_task_by_id(task_id, chat_id)
             if not task:
-                await query.edit_message_text(
+                await edit_message(
+                    query,
                     "❌ **Task Non Trovata**\n\nLa task richiesta non esiste. Potrebbe essere stata rimossa.",
                     parse_mode=ParseMode.MARKDOWN    
                 )
@@ -1079,7 +1590,8 @@ class FamilyTaskBot:
             members = self.get_db().get_family_members(chat_id)
             target_member = next((m for m in members if m['user_id'] == int(target_user_id)), None)
             if not target_member and int(target_user_id) != assigned_by:
-                await query.edit_message_text(
+                await edit_message(
+                    query,
                     "❌ **Utente Non Trovato**\n\nL'utente selezionato non è membro di questa famiglia.",
                     parse_mode=ParseMode.MARKDOWN
                 )
@@ -1110,7 +1622,8 @@ class FamilyTaskBot:
                 f"💡 **La task è ora visibile nell'elenco personale dell'utente!**\n"
                 f"🔄 **Dopo il completamento, sarà subito riassegnabile.**"
             )
-            await query.edit_message_text(
+            await edit_message(
+                query,
                 success_message,
                 parse_mode=ParseMode.MARKDOWN,
                 reply_markup=reply_markup
@@ -1120,13 +1633,15 @@ class FamilyTaskBot:
                 # Handle duplicate assignment with better error message (already improved above)
                 pass  # This is handled by the existing improved error message
             else:
-                await query.edit_message_text(
+                await edit_message(
+                    query,
                     f"❌ **Errore di Validazione**\n\n{exc}\n\n💡 Controlla i dati e riprova.",
                     parse_mode=ParseMode.MARKDOWN
                 )
         except Exception as exc:
             logger.error(f"Unexpected error in handle_assign: task_id={task_id}, target_user_id={target_user_id}, chat_id={chat_id}: {exc}")
-            await query.edit_message_text(
+            await edit_message(
+                query,
                 f"❌ **Errore Imprevisto**\n\nSi è verificato un errore durante l'assegnazione.\n\n"
                 f"💡 **Cosa fare:**\n"
                 f"• Riprova tra qualche momento\n"
@@ -0,0 +1,145 @@
+"""
+Compact callback_data encoding.
+
+Telegram limits callback_data to 64 bytes. Buttons used to carry readable
+payloads such as ``doassign_<user_id>_<task_id>``, which grow with the task
+id and are ambiguous once ids contain underscores. Buttons with arguments now
+carry ``<version><code>.<arg>.<arg>``: one version digit, a one-character
+action code and base-36 integers, with tasks referenced by their numeric
+``short_id`` (e.g. ``1d.1ly7vk.h`` instead of
+``doassign_1234567890_pulire_frigorifero``). Actions without arguments keep
+their readable name. Legacy payloads, still attached to keyboards sent before
+the switch, are decoded to the same actions.
+"""
+
+from collections import namedtuple
+
+VERSION = "1"
+SEPARATOR = "."
+
+# Argument kinds. TASK is a short_id in compact payloads and the text task id
+# in legacy ones; handlers accept both (see FamilyTaskBot._task_from_ref).
+INT, TASK, STR = "int", "task", "str"
+
+# ``legacy`` is the old prefix (or exact name) of the action; it also serves
+# as the bounded metrics label, so dashboards keep their series.
+Action = namedtuple("Action", "name code args legacy")
+
+ACTIONS = (
+    Action("main_menu", None, (), "main_menu"),
+    Action("tasks_menu", None, (), "tasks_menu"),
+    Action("assign_menu", None, (), "assign_menu"),
+    Action("show_my_tasks", None, (), "show_my_tasks"),
+    Action("show_stats", None, (), "show_stats"),
+    Action("show_leaderboard", None, (), "show_leaderboard"),
+    Action("cancel_complete", None, (), "cancel_complete"),
+    Action("history_top", None, (), "hist_top"),
+    Action("none", None, (), "none"),
+    Action("assign", "a", (TASK,), "assign_"),
+    Action("doassign", "d", (INT, TASK), "doassign_"),
+    Action("complete", "c", (TASK,), "complete_"),
+    Action("confirm_complete", "k", (TASK,), "confirm_complete_"),
+    Action("category", "g", (STR,), "cat_"),
+    Action("leaderboard", "l", (STR,), "lb_"),
+    Action("history", "h", (INT, INT), "hist_"),
+    Action("recdel", "r", (INT,), "recdel_"),
+    Action("customdel", "x", (TASK,), "customdel_"),
+)
+
+ACTIONS_BY_NAME = {action.name: action for action in ACTIONS}
+_BY_CODE = {action.code: action for action in ACTIONS if action.code}
+_STATIC = {action.legacy: action for action in ACTIONS if not action.args}
+# Legacy prefixes indexed by their first word ("confirm_complete_" -> "confirm")
+_LEGACY = {action.legacy.split("_", 1)[0]: action for action in ACTIONS if action.args}
+
+_DIGITS = "0123456789abcdefghijklmnopqrstuvwxyz"
+_DIGIT_SET = frozenset(_DIGITS)
+
+
+def _base36(value):
+    if value < 0:
+        raise ValueError(f"Valore negativo non codificabile: {value}")
+    digits = ""
+    while True:
+        value, rem = divmod(value, 36)
+        digits = _DIGITS[rem] + digits
+        if not value:
+            return digits
+
+
+def _encode_arg(kind, value):
+    if kind in (INT, TASK):
+        if not isinstance(value, int):
+            raise ValueError(f"Argomento {kind} non intero: {value!r}")
+        return _base36(value)
+    value = str(value)
+    if not value or SEPARATOR in value:
+        raise ValueError(f"Argomento non valido: {value!r}")
+    return value
+
+
+def encode(name, *args):
+    """callback_data of action ``name`` with ``args`` (see ACTIONS for the kinds)"""
+    action = ACTIONS_BY_NAME[name]
+    if len(args) != len(action.args):
+        raise ValueError(f"{name}: attesi {len(action.args)} argomenti, ricevuti {len(args)}")
+    if not action.args:
+        return action.legacy
+    data = VERSION + action.code + "".join(
+        SEPARATOR + _encode_arg(kind, value) for kind, value in zip(action.args, args)
+    )
+    if len(data.encode()) > 64:
+        raise ValueError(f"callback_data oltre 64 byte: {data}")
+    return data
+
+
+def legacy(name, *args):
+    """Old-style payload, for tasks that have no short_id yet"""
+    action = ACTIONS_BY_NAME[name]
+    return action.legacy + "_".join(str(arg) for arg in args)
+
+
+def _decode_compact(data):
+    if data[0] != VERSION:
+        raise ValueError(f"Versione callback non supportata: {data}")
+    code, *fields = data[1:].split(SEPARATOR)
+    action = _BY_CODE.get(code)
+    if action is None or len(fields) != len(action.args):
+        raise ValueError(f"Callback non valida: {data}")
+    args = []
+    for kind, field in zip(action.args, fields):
+        if not field or (kind != STR and not _DIGIT_SET.issuperset(field)):
+            raise ValueError(f"Callback non valida: {data}")
+        args.append(field if kind == STR else int(field, 36))
+    return action.name, tuple(args)
+
+
+def _decode_legacy(data):
+    action = _LEGACY.get(data.split("_", 1)[0])
+    if action is None or not data.startswith(action.legacy):
+        raise ValueError(f"Callback sconosciuta: {data}")
+    # Only the last argument (a text task id) may contain underscores
+    fields = data[len(action.legacy):].split("_", len(action.args) - 1)
+    if len(fields) != len(action.args) or not all(fields):
+        raise ValueError(f"Callback non valida: {data}")
+    args = []
+    for kind, field in zip(action.args, fields):
+        if kind == INT:
+            if not field.isdigit():
+                raise ValueError(f"Callback non valida: {data}")
+            field = int(field)
+        args.append(field)
+    return action.name, tuple(args)
+
+
+def decode(data):
+    """(action name, args) of compact or legacy callback_data; ValueError if unknown"""
+    if not data:
+        raise ValueError("callback_data vuota")
+    action = _STATIC.get(data)
+    if action is not None:
+        return action.name, ()
+    if data[0].isdigit():
+        return _decode_compact(data)
+    return _decode_legacy(data)
+
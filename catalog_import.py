@@ -0,0 +1,145 @@
+"""
+Task catalog import from an uploaded CSV or JSON file.
+
+``parse_catalog`` validates the whole file before anything is written: every
+problem is reported with its row, and a single bad row rejects the import.
+``diff_catalog`` compares the rows with the catalog currently loaded, so the
+admin sees what will change; FamilyTaskDB.import_tasks then applies the
+rows in one transaction, touching only the tasks that actually differ.
+
+CSV files need the header ``id,name,points,time_minutes``; JSON files hold a
+list of objects with the same keys. Tasks missing from the file are left
+as they are: removing a task would cascade to its assignments.
+"""
+
+import io
+import re
+import csv
+import json
+from collections import namedtuple
+
+from db import custom_task_chat
+
+FIELDS = ("id", "name", "points", "time_minutes")
+MAX_FILE_SIZE = 1024 * 1024
+MAX_TASKS = 1000
+MAX_NAME_LENGTH = 60
+POINTS_RANGE = (1, 100)
+MINUTES_RANGE = (1, 600)
+# Errori mostrati all'admin, il resto viene solo contato
+MAX_REPORTED_ERRORS = 10
+
+_TASK_ID = re.compile(r"[a-z0-9_]{1,40}")
+# I nomi finiscono in messaggi Markdown: niente caratteri di formattazione
+_MARKDOWN_CHARS = set("*_`[]")
+
+CatalogDiff = namedtuple("CatalogDiff", "added changed unchanged missing")
+
+
+class CatalogError(ValueError):
+    """The file was rejected; ``errors`` lists the problems found"""
+
+    def __init__(self, errors):
+        self.errors = list(errors)
+        shown = self.errors[:MAX_REPORTED_ERRORS]
+        if len(self.errors) > len(shown):
+            shown.append(f"...e altri {len(self.errors) - len(shown)} errori")
+        super().__init__("\n".join(shown))
+
+
+def _read_rows(data, filename):
+    text = data.decode("utf-8-sig")
+    if filename.lower().endswith(".json"):
+        rows = json.loads(text)
+        if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+            raise CatalogError(["Il file JSON deve contenere una lista di oggetti"])
+        return rows
+    reader = csv.DictReader(io.StringIO(text))
+    missing = [field for field in FIELDS if field not in (reader.fieldnames or ())]
+    if missing:
+        raise CatalogError([f"Colonne mancanti nell'intestazione CSV: {', '.join(missing)}"])
+    return list(reader)
+
+
+def _int_in_range(value, bounds):
+    if isinstance(value, bool):
+        return None
+    try:
+        number = int(str(value).strip())
+    except (TypeError, ValueError):
+        return None
+    return number if bounds[0] <= number <= bounds[1] else None
+
+
+def task_problems(name, points, time_minutes):
+    """Problems of a task's name and (already parsed, None if invalid) numbers, [] if valid"""
+    problems = []
+    if not name or len(name) > MAX_NAME_LENGTH:
+        problems.append(f"nome vuoto o più lungo di {MAX_NAME_LENGTH} caratteri")
+    elif _MARKDOWN_CHARS & set(name):
+        problems.append("il nome non può contenere * _ ` [ ]")
+    if points is None:
+        problems.append(f"points deve essere un intero tra {POINTS_RANGE[0]} e {POINTS_RANGE[1]}")
+    if time_minutes is None:
+        problems.append(f"time_minutes deve essere un intero tra {MINUTES_RANGE[0]} e {MINUTES_RANGE[1]}")
+    return problems
+
+
+def parse_task_numbers(points, time_minutes):
+    """(points, time_minutes) as ints, None where out of range or not a number"""
+    return _int_in_range(points, POINTS_RANGE), _int_in_range(time_minutes, MINUTES_RANGE)
+
+
+def parse_catalog(data, filename):
+    """Validated task dicts (id, name, points, time_minutes) from a CSV/JSON upload"""
+    if len(data) > MAX_FILE_SIZE:
+        raise CatalogError([f"File troppo grande (massimo {MAX_FILE_SIZE // 1024} KB)"])
+    try:
+        rows = _read_rows(data, filename)
+    except (UnicodeDecodeError, json.JSONDecodeError, csv.Error) as e:
+        raise CatalogError([f"File non leggibile: {e}"])
+    if not rows:
+        raise CatalogError(["Il file non contiene task"])
+    if len(rows) > MAX_TASKS:
+        raise CatalogError([f"Troppe task: {len(rows)} (massimo {MAX_TASKS})"])
+
+    tasks, errors, seen = [], [], set()
+    # Riga 1 del CSV è l'intestazione
+    first = 1 if filename.lower().endswith(".json") else 2
+    for number, row in enumerate(rows, first):
+        task_id = str(row.get("id") or "").strip()
+        name = str(row.get("name") or "").strip()
+        points, minutes = parse_task_numbers(row.get("points"), row.get("time_minutes"))
+        problems = []
+        if not _TASK_ID.fullmatch(task_id):
+            problems.append("id non valido (solo a-z, 0-9 e _, massimo 40 caratteri)")
+        elif custom_task_chat(task_id) is not None:
+            problems.append("gli id c<numero>_... sono riservati alle task personalizzate delle famiglie")
+        elif task_id in seen:
+            problems.append(f"id duplicato '{task_id}'")
+        problems += task_problems(name, points, minutes)
+        if problems:
+            errors.append(f"Riga {number}: " + "; ".join(problems))
+            continue
+        seen.add(task_id)
+        tasks.append({"id": task_id, "name": name, "points": points, "time_minutes": minutes})
+    if errors:
+        raise CatalogError(errors)
+    return tasks
+
+
+def diff_catalog(current, incoming):
+    """CatalogDiff of ``incoming`` task dicts against the ``current`` catalog (lists of ids)"""
+    by_id = {task['id']: task for task in current}
+    added, changed, unchanged = [], [], []
+    for task in incoming:
+        old = by_id.get(task['id'])
+        if old is None:
+            added.append(task['id'])
+        elif any(old[field] != task[field] for field in FIELDS[1:]):
+            changed.append(task['id'])
+        else:
+            unchanged.append(task['id'])
+    incoming_ids = {task['id'] for task in incoming}
+    missing = [task['id'] for task in current if task['id'] not in incoming_ids]
+    return CatalogDiff(added, changed, unchanged, missing)
@@ -1,24 +1,226 @@
 import logging
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, date
+import io
 import os
+import csv
+import time
+import functools
+import contextvars
+import itertools
+import threading
+import re
+from collections import Counter, OrderedDict, namedtuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 import psycopg2
 import psycopg2.extras
+import psycopg2.extensions
 from contextlib import contextmanager
+import metrics
+import tracing
+import badges
 
 logger = logging.getLogger(__name__)
 
-class FamilyTaskDB:
+# Name of the FamilyTaskDB method currently running, used to label DB errors
+_current_method = contextvars.ContextVar("db_current_method", default="unknown")
+
+# Round-trip counters of the update being processed (None outside track_queries)
+_query_stats = contextvars.ContextVar("db_query_stats", default=None)
+
+
+class QueryStats:
+    """FamilyTaskDB calls, connections and SQL statements issued in a block"""
+
     def __init__(self):
+        self.calls = 0
+        self.connections = 0
+        self.statements = 0
+        self.methods = Counter()
+
+    def merge(self, other):
+        self.calls += other.calls
+        self.connections += other.connections
+        self.statements += other.statements
+        self.methods.update(other.methods)
+
+    def __repr__(self):
+        return (f"QueryStats(calls={self.calls}, connections={self.connections}, "
+                f"statements={self.statements}, methods={dict(self.methods)})")
+
+
+@contextmanager
+def track_queries():
+    """Count DB round trips in the block; nested blocks also add to the outer one"""
+    parent = _query_stats.get()
+    stats = QueryStats()
+    token = _query_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _query_stats.reset(token)
+        if parent is not None:
+            parent.merge(stats)
+
+
+class _CountingCursor(psycopg2.extensions.cursor):
+    """Cursor that counts executed statements in the current QueryStats"""
+
+    def execute(self, query, vars=None):
+        stats = _query_stats.get()
+        if stats is not None:
+            stats.statements += 1
+        return super().execute(query, vars)
+
+    def executemany(self, query, vars_list):
+        stats = _query_stats.get()
+        if stats is not None:
+            stats.statements += 1
+        return super().executemany(query, vars_list)
+
+
+def _instrumented(func):
+    """Record latency of a FamilyTaskDB method in metrics, tracing and QueryStats"""
+    name = func.__name__
+    span_name = f"db.{name}"
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        stats = _query_stats.get()
+        if stats is not None:
+            stats.calls += 1
+            stats.methods[name] += 1
+        token = _current_method.set(name)
+        start = time.perf_counter()
+        try:
+            with tracing.span(span_name):
+                return func(*args, **kwargs)
+        finally:
+            metrics.DB_QUERY_LATENCY.observe(time.perf_counter() - start, method=name)
+            _current_method.reset(token)
+    return wrapper
+
+
+# Custom task ids: c<chat_id>_<slug>, "n" standing for the minus of group chats
+CUSTOM_TASK_ID = re.compile(r"c(n?)(\d+)_")
+# Merged catalogs kept in memory; the least recently used family is evicted first
+CHAT_CATALOG_CACHE_SIZE = int(os.environ.get("CHAT_CATALOG_CACHE_SIZE", "1024"))
+MAX_CUSTOM_TASKS = 50
+
+# Global catalog plus one family's custom tasks, with O(1) indexes
+ChatCatalog = namedtuple("ChatCatalog", "key tasks by_id by_short_id custom")
+
+
+def custom_task_prefix(chat_id):
+    """Id prefix of a family's custom tasks"""
+    return f"c{'n' if chat_id < 0 else ''}{abs(chat_id)}_"
+
+
+def custom_task_chat(task_id):
+    """chat_id owning a custom task id, None for global tasks"""
+    match = CUSTOM_TASK_ID.match(task_id) if isinstance(task_id, str) else None
+    if not match:
+        return None
+    return -int(match.group(2)) if match.group(1) else int(match.group(2))
+
+
+# Leaderboard windows, backed by completion_daily_rollups
+LEADERBOARD_PERIODS = ("week", "month", "all")
+
+
+def _shard_params(shard):
+    """Parameters of the ``(%s::int IS NULL OR abs(chat_id) %% %s = %s)`` filter of a sharding.Shard"""
+    return (None, None, None) if shard is None else (shard.count, shard.count, shard.index)
+
+
+def period_start(period, today=None):
+    """First day included in a leaderboard period (None for all-time)"""
+    today = today or date.today()
+    if period == "week":
+        return today - timedelta(days=today.weekday())
+    if period == "month":
+        return today.replace(day=1)
+    if period == "all":
+        return None
+    raise ValueError(f"Periodo classifica non valido: {period}")
+
+
+# Families that never chose a timezone count streak days in this one
+DEFAULT_TIMEZONE = os.environ.get("FAMILY_TIMEZONE", "Europe/Rome")
+
+
+def local_today(timezone=None, now=None):
+    """Current calendar day in a family's timezone"""
+    now = now or datetime.now(ZoneInfo("UTC"))
+    return now.astimezone(ZoneInfo(timezone or DEFAULT_TIMEZONE)).date()
+
+
+def advance_streak(current, last_day, today):
+    """Streak after one more completion on ``today``"""
+    if last_day == today:
+        return max(current, 1)
+    if last_day == today - timedelta(days=1):
+        return current + 1
+    return 1
+
+
+def visible_streak(current, last_day, today):
+    """Stored streak, or 0 if it was broken by skipping yesterday"""
+    if last_day is None or last_day < today - timedelta(days=1):
+        return 0
+    return current
+
+
+class FamilyTaskDB:
+    def __init__(self, load_catalog=True):
+        """With ``load_catalog=False`` the catalog is left to a later load_catalog() call"""
         self.test_mode = False
         self.fallback_mode = False
         self._tasks = []
+        # Catalog indexes by text id and by numeric short_id (see _set_catalog)
+        self._tasks_by_id = {}
+        self._tasks_by_short_id = {}
+        # Bumped whenever the task catalog is (re)loaded; keys derived caches
+        self.catalog_version = 0
+        # catalog_state.version the loaded catalog matches (None: not loaded from the DB)
+        self._stored_catalog_version = None
+        # Per-family custom tasks layered over the global catalog (see _chat_catalog):
+        # chat_id -> ChatCatalog, least recently used first
+        self._chat_catalogs = OrderedDict()
+        # chat_id -> counter bumped by every custom task change of that family
+        self._chat_catalog_versions = {}
+        # chat_id -> custom task dicts (fallback mode storage)
+        self._custom_tasks = {}
+        # chat_id -> counter bumped by every assignment change made through this instance
+        self._assignment_versions = {}
         self._assigned = []
         self._members = {}
         self._completed = []
+        # (chat_id, day) -> {user_id: [points, tasks_completed]}
+        self._daily_rollups = {}
+        # (chat_id, user_id) -> chat_user_stats row as a dict
+        self._chat_user_stats = {}
+        # chat_id -> IANA timezone name (fallback storage, cache with a database)
+        self._timezones = {}
+        # (chat_id, user_id) -> earned badge keys, in award order
+        self._badges = {}
+        # recurrence id -> recurring_tasks row as a dict
+        self._recurring = {}
+        self._recurring_ids = itertools.count(1)
+        # (chat_id, message_id) waiting for the cleanup job, see track_message
+        self._tracked_messages = []
+        self._tracked_lock = threading.Lock()
+        self._assignment_ids = itertools.count(1)
+        self._completion_ids = itertools.count(1)
         self.db_url = os.environ.get("DATABASE_URL")
         if not self.db_url:
             logger.warning("DATABASE_URL non impostato nelle variabili d'ambiente! Modalità fallback attivata.")
             self.fallback_mode = True
+        if load_catalog:
+            self.load_catalog()
+
+    def load_catalog(self):
+        """Seed the default tasks and load the global catalog (blocking, one connection)"""
+        if self.fallback_mode:
             self._load_fallback_tasks()
         else:
             self._load_tasks_from_db()
@@ -28,9 +230,15 @@ class FamilyTaskDB:
         """Context manager for database connections"""
         conn = None
         try:
-            conn = psycopg2.connect(self.db_url, sslmode='require')
+            with tracing.span("db.connect"):
+                conn = psycopg2.connect(self.db_url, sslmode='require', cursor_factory=_CountingCursor)
+            stats = _query_stats.get()
+            if stats is not None:
+                stats.connections += 1
             yield conn
         except Exception as e:
+            if isinstance(e, psycopg2.Error):
+                metrics.DB_QUERY_ERRORS.inc(method=_current_method.get())
             if conn:
                 conn.rollback()
             logger.error(f"Errore connessione database: {e}")
@@ -133,13 +341,38 @@ class FamilyTaskDB:
 
     def _load_fallback_tasks(self):
         """Load tasks in fallback mode (memory-only) when database is unavailable"""
-        default_tasks = self._get_default_tasks()
-        self._tasks = [
-            {"id": t[0], "name": t[1], "points": t[2], "time_minutes": t[3]}
-            for t in default_tasks
-        ]
+        self._set_catalog(self._default_catalog())
         logger.info(f"Loaded {len(self._tasks)} tasks in fallback mode (no database)")
 
+    def _default_catalog(self):
+        # short_id follows the order of the default list, like a fresh SERIAL column
+        return [
+            {"id": t[0], "name": t[1], "points": t[2], "time_minutes": t[3], "short_id": i}
+            for i, t in enumerate(self._get_default_tasks(), start=1)
+        ]
+
+    def _set_catalog(self, tasks):
+        """Install the task catalog and its id/short_id indexes"""
+        # Indici costruiti prima: nessun lettore vede un catalogo a metà
+        by_id = {t['id']: t for t in tasks}
+        by_short_id = {t['short_id']: t for t in tasks}
+        self._tasks, self._tasks_by_id, self._tasks_by_short_id = tasks, by_id, by_short_id
+        self.catalog_version += 1
+
+    @staticmethod
+    def _fetch_catalog(cur):
+        cur.execute("SELECT id, name, points, time_minutes, short_id FROM tasks WHERE chat_id IS NULL ORDER BY short_id;")
+        return [
+            {"id": row[0], "name": row[1], "points": row[2], "time_minutes": row[3], "short_id": row[4]}
+            for row in cur.fetchall()
+        ]
+
+    @staticmethod
+    def _fetch_catalog_version(cur):
+        cur.execute("SELECT version FROM catalog_state;")
+        row = cur.fetchone()
+        return row[0] if row else 0
+
     def _load_tasks_from_db(self):
         """Load tasks from database with fallback to in-memory defaults"""
         default_tasks = self._get_default_tasks()
@@ -147,30 +380,117 @@ class FamilyTaskDB:
         try:
             with self.get_db_connection() as conn:
                 cur = conn.cursor()
-                # Task di default sempre sincronizzate
-                for t in default_tasks:
-                    cur.execute(
-                        "INSERT INTO tasks (id, name, points, time_minutes) VALUES (%s, %s, %s, %s) ON CONFLICT (id) DO NOTHING;",
-                        t
-                    )
+                # Task di default sempre sincronizzate, in un solo statement
+                psycopg2.extras.execute_values(
+                    cur,
+                    "INSERT INTO tasks (id, name, points, time_minutes) VALUES %s ON CONFLICT (id) DO NOTHING;",
+                    default_tasks,
+                    page_size=len(default_tasks),
+                )
                 conn.commit()
-                cur.execute("SELECT id, name, points, time_minutes FROM tasks;")
-                rows = cur.fetchall()
-                
-                self._tasks = [
-                    {"id": row[0], "name": row[1], "points": row[2], "time_minutes": row[3]}
-                    for row in rows
-                ]
+                version = self._fetch_catalog_version(cur)
+                self._set_catalog(self._fetch_catalog(cur))
+                self._stored_catalog_version = version
                 logger.info(f"Successfully loaded {len(self._tasks)} tasks from database")
         except Exception as e:
             logger.warning(f"Database connection failed, using fallback tasks: {e}")
             # Use in-memory fallback tasks when database is unavailable
-            self._tasks = [
-                {"id": t[0], "name": t[1], "points": t[2], "time_minutes": t[3]}
-                for t in default_tasks
-            ]
+            self._set_catalog(self._default_catalog())
             logger.info(f"Loaded {len(self._tasks)} fallback tasks in memory")
 
+    @_instrumented
+    def import_tasks(self, tasks):
+        """Insert or update catalog tasks in one transaction; returns (added ids, updated ids).
+
+        The rows are COPYed into a temporary staging table and merged with a
+        single INSERT ... ON CONFLICT whose update only fires where a column
+        IS DISTINCT FROM the new value, so unchanged tasks are not rewritten.
+        The in-memory catalog is reloaded and swapped in once committed; the
+        same transaction bumps catalog_state.version, so the other processes
+        pick the change up in refresh_catalog.
+        """
+        if self.fallback_mode:
+            catalog = [dict(t) for t in self._tasks]
+            by_id = {t['id']: t for t in catalog}
+            next_short_id = self._next_fallback_short_id()
+            added, updated = [], []
+            for task in tasks:
+                old = by_id.get(task['id'])
+                if old is None:
+                    catalog.append(dict(task, short_id=next_short_id))
+                    next_short_id += 1
+                    added.append(task['id'])
+                elif any(old[k] != task[k] for k in ('name', 'points', 'time_minutes')):
+                    old.update(task)
+                    updated.append(task['id'])
+            if added or updated:
+                self._set_catalog(catalog)
+            return added, updated
+
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows((t['id'], t['name'], t['points'], t['time_minutes']) for t in tasks)
+        buffer.seek(0)
+        with self.get_db_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("""
+                CREATE TEMP TABLE tasks_import (id TEXT PRIMARY KEY, name TEXT, points INTEGER, time_minutes INTEGER)
+                ON COMMIT DROP;
+            """)
+            cur.copy_expert("COPY tasks_import (id, name, points, time_minutes) FROM STDIN WITH (FORMAT csv)", buffer)
+            cur.execute("""
+                INSERT INTO tasks AS t (id, name, points, time_minutes)
+                SELECT id, name, points, time_minutes FROM tasks_import
+                ON CONFLICT (id) DO UPDATE
+                SET name = EXCLUDED.name, points = EXCLUDED.points, time_minutes = EXCLUDED.time_minutes
+                WHERE t.chat_id IS NULL AND (t.name, t.points, t.time_minutes)
+                      IS DISTINCT FROM (EXCLUDED.name, EXCLUDED.points, EXCLUDED.time_minutes)
+                RETURNING t.id, (xmax = 0);
+            """)
+            merged = cur.fetchall()
+            version = None
+            if merged:
+                cur.execute("UPDATE catalog_state SET version = version + 1 RETURNING version;")
+                row = cur.fetchone()
+                version = row[0] if row else None
+            conn.commit()
+            catalog = self._fetch_catalog(cur) if merged else None
+        added = sorted(task_id for task_id, inserted in merged if inserted)
+        updated = sorted(task_id for task_id, inserted in merged if not inserted)
+        logger.info(f"Import catalogo: {len(added)} task aggiunte, {len(updated)} aggiornate")
+        if catalog is not None:
+            self._set_catalog(catalog)
+            self._stored_catalog_version = version
+        return added, updated
+
+    @_instrumented
+    def refresh_catalog(self):
+        """Reload the global catalog if another process changed it; True if reloaded.
+
+        One small SELECT when nothing changed. Sharded workers call it on a
+        timer (main.start_background_jobs) so an import done by one worker
+        reaches the menus and short ids of all the others.
+        """
+        if self.fallback_mode:
+            return False
+        with self.get_db_connection() as conn:
+            cur = conn.cursor()
+            version = self._fetch_catalog_version(cur)
+            if version == self._stored_catalog_version:
+                return False
+            catalog = self._fetch_catalog(cur)
+        self._set_catalog(catalog)
+        self._stored_catalog_version = version
+        logger.info(f"Catalogo ricaricato (versione {version}): {len(catalog)} task")
+        return True
+
+    def assignment_version(self, chat_id):
+        """Version of a family's open assignments, for render caches (no DB access)"""
+        return self._assignment_versions.get(chat_id, 0)
+
+    def _bump_assignment_version(self, chat_id):
+        self._assignment_versions[chat_id] = self._assignment_versions.get(chat_id, 0) + 1
+
+    @_instrumented
     def add_family_member(self, chat_id, user_id, username, first_name):
         """Add a family member with improved error handling and logging"""
         if self.fallback_mode:
@@ -205,23 +525,173 @@ class FamilyTaskDB:
             logger.error(f"Unexpected error in add_family_member for user {user_id} ({first_name}) in chat {chat_id}: {e}")
             raise
 
-    def get_all_tasks(self):
+    @_instrumented
+    def get_all_tasks(self, chat_id=None):
+        """Global catalog, or the catalog seen by ``chat_id`` (global plus its custom tasks)"""
         try:
-            return self._tasks.copy()
+            if chat_id is None:
+                return self._tasks.copy()
+            return list(self._chat_catalog(chat_id).tasks)
         except Exception as e:
             logger.error(f"Errore in get_all_tasks: {e}")
             return []
 
-    def assign_task(self, chat_id, task_id, assigned_to, assigned_by):
+    def catalog_key(self, chat_id):
+        """Version key of the catalog seen by ``chat_id``, for render caches.
+
+        Families without custom tasks share the global key, so their
+        catalog-derived pages are built once for all of them.
+        """
+        return self._chat_catalog(chat_id).key
+
+    def _chat_catalog(self, chat_id):
+        """Merged catalog of a family, cached until the global catalog or its custom tasks change"""
+        # Le modifiche della famiglia rimuovono la voce, un nuovo catalogo globale la rende vecchia
+        catalog = self._chat_catalogs.get(chat_id)
+        if catalog is not None and catalog.key[0] == self.catalog_version:
+            self._chat_catalogs.move_to_end(chat_id)
+            metrics.record_cache("chat_catalog", hit=True)
+            return catalog
+        metrics.record_cache("chat_catalog", hit=False)
+
+        shared = ChatCatalog((self.catalog_version,), self._tasks, self._tasks_by_id, self._tasks_by_short_id, [])
+        try:
+            custom = self._load_custom_tasks(chat_id)
+        except Exception as e:
+            # Senza database si mostra almeno il catalogo globale, senza metterlo in cache
+            logger.error(f"Errore nel caricamento delle task personalizzate della chat {chat_id}: {e}")
+            return shared
+        if custom:
+            catalog = ChatCatalog(
+                (self.catalog_version, chat_id, self._chat_catalog_versions.get(chat_id, 0)), self._tasks + custom,
+                {**self._tasks_by_id, **{t['id']: t for t in custom}},
+                {**self._tasks_by_short_id, **{t['short_id']: t for t in custom}},
+                custom,
+            )
+        else:
+            # Nessuna task personalizzata: indici globali condivisi, nessuna copia
+            catalog = shared
+        self._chat_catalogs[chat_id] = catalog
+        if len(self._chat_catalogs) > CHAT_CATALOG_CACHE_SIZE:
+            self._chat_catalogs.popitem(last=False)
+        return catalog
+
+    def _load_custom_tasks(self, chat_id):
+        if self.fallback_mode:
+            return [dict(t) for t in self._custom_tasks.get(chat_id, [])]
+        with self.get_db_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("""
+                SELECT id, name, points, time_minutes, short_id FROM tasks
+                WHERE chat_id = %s ORDER BY short_id;
+            """, (chat_id,))
+            return [
+                {"id": row[0], "name": row[1], "points": row[2], "time_minutes": row[3], "short_id": row[4],
+                 "chat_id": chat_id}
+                for row in cur.fetchall()
+            ]
+
+    def _invalidate_chat_catalog(self, chat_id):
+        self._chat_catalog_versions[chat_id] = self._chat_catalog_versions.get(chat_id, 0) + 1
+        self._chat_catalogs.pop(chat_id, None)
+
+    def _catalog_task(self, task_id):
+        """Cached task by text id, custom tasks included (no DB access for global ids)"""
+        task = self._tasks_by_id.get(task_id)
+        if task is None:
+            owner = custom_task_chat(task_id)
+            if owner is not None:
+                task = self._chat_catalog(owner).by_id.get(task_id)
+        return task
+
+    def _next_fallback_short_id(self):
+        custom = (t['short_id'] for tasks in self._custom_tasks.values() for t in tasks)
+        return max(itertools.chain((t['short_id'] for t in self._tasks), custom), default=0) + 1
+
+    @_instrumented
+    def get_custom_tasks(self, chat_id):
+        """Custom tasks of a family, oldest first"""
+        return list(self._chat_catalog(chat_id).custom)
+
+    @_instrumented
+    def add_custom_task(self, chat_id, name, points, time_minutes):
+        """Create a family task and return it; ValueError for duplicates or over MAX_CUSTOM_TASKS"""
+        slug = re.sub(r"[^a-z0-9]+", "_", name.lower()).strip("_")[:30] or "task"
+        task_id = custom_task_prefix(chat_id) + slug
+        catalog = self._chat_catalog(chat_id)
+        if len(catalog.custom) >= MAX_CUSTOM_TASKS:
+            raise ValueError(f"Massimo {MAX_CUSTOM_TASKS} task personalizzate per famiglia")
+        if task_id in catalog.by_id or any(t['name'].lower() == name.lower() for t in catalog.custom):
+            raise ValueError("Esiste già una task personalizzata con questo nome")
+
+        if self.fallback_mode:
+            task = {"id": task_id, "name": name, "points": points, "time_minutes": time_minutes,
+                    "short_id": self._next_fallback_short_id(), "chat_id": chat_id}
+            self._custom_tasks.setdefault(chat_id, []).append(task)
+        else:
+            with self.get_db_connection() as conn:
+                cur = conn.cursor()
+                cur.execute("INSERT INTO families (chat_id) VALUES (%s) ON CONFLICT DO NOTHING;", (chat_id,))
+                cur.execute("""
+                    INSERT INTO tasks (id, name, points, time_minutes, chat_id)
+                    VALUES (%s, %s, %s, %s, %s)
+                    ON CONFLICT (id) DO NOTHING
+                    RETURNING short_id;
+                """, (task_id, name, points, time_minutes, chat_id))
+                row = cur.fetchone()
+                conn.commit()
+            if row is None:
+                raise ValueError("Esiste già una task personalizzata con questo nome")
+            task = {"id": task_id, "name": name, "points": points, "time_minutes": time_minutes,
+                    "short_id": row[0], "chat_id": chat_id}
+        self._invalidate_chat_catalog(chat_id)
+        logger.info(f"Task personalizzata {task_id} creata nella chat {chat_id}")
+        return dict(task)
+
+    @_instrumented
+    def delete_custom_task(self, chat_id, task_id):
+        """Delete a family's own task (its assignments and recurrences go with it)"""
+        if custom_task_chat(task_id) != chat_id:
+            return False
+        if self.fallback_mode:
+            tasks = self._custom_tasks.get(chat_id, [])
+            kept = [t for t in tasks if t['id'] != task_id]
+            if len(kept) == len(tasks):
+                return False
+            self._custom_tasks[chat_id] = kept
+            self._assigned = [a for a in self._assigned if a['task_id'] != task_id]
+            self._recurring = {k: r for k, r in self._recurring.items() if r['task_id'] != task_id}
+            self._bump_assignment_version(chat_id)
+        else:
+            try:
+                with self.get_db_connection() as conn:
+                    cur = conn.cursor()
+                    cur.execute("DELETE FROM tasks WHERE id = %s AND chat_id = %s;", (task_id, chat_id))
+                    deleted = cur.rowcount > 0
+                    conn.commit()
+            except Exception as e:
+                logger.error(f"Errore in delete_custom_task ({task_id}): {e}")
+                return False
+            if not deleted:
+                return False
+            self._bump_assignment_version(chat_id)
+        self._invalidate_chat_catalog(chat_id)
+        return True
+
+    @_instrumented
+    def assign_task(self, chat_id, task_id, assigned_to, assigned_by, due_date=None):
         if self.fallback_mode:
             # In fallback mode, store assignments in memory
             assignment = {
+                'id': next(self._assignment_ids),
                 'chat_id': chat_id,
                 'task_id': task_id,
                 'assigned_to': assigned_to,
                 'assigned_by': assigned_by,
                 'assigned_date': datetime.now(),
-                'status': 'assigned'
+                'status': 'assigned',
+                'due_date': due_date,
+                'reminder_stage': 0
             }
             
             # Check for duplicate assignment
@@ -234,6 +704,7 @@ class FamilyTaskDB:
                 raise ValueError(f"Task già assegnata a questo utente")
             
             self._assigned.append(assignment)
+            self._bump_assignment_version(chat_id)
             logger.info(f"Assigned task {task_id} to user {assigned_to} in chat {chat_id} (fallback mode)")
             return
 
@@ -256,12 +727,13 @@ class FamilyTaskDB:
                 # Allow multiple assignments to different users
                 cur.execute(
                     """
-                    INSERT INTO assigned_tasks (chat_id, task_id, assigned_to, assigned_by, assigned_date, status)
-                    VALUES (%s, %s, %s, %s, NOW(), 'assigned');
+                    INSERT INTO assigned_tasks (chat_id, task_id, assigned_to, assigned_by, assigned_date, status, due_date)
+                    VALUES (%s, %s, %s, %s, NOW(), 'assigned', %s);
                     """,
-                    (chat_id, task_id, assigned_to, assigned_by)
+                    (chat_id, task_id, assigned_to, assigned_by, due_date)
                 )
                 conn.commit()
+                self._bump_assignment_version(chat_id)
         except ValueError as e:
             # This is expected for duplicate assignments
             logger.info(f"Assignment validation failed for task {task_id} to user {assigned_to}: {e}")
@@ -273,6 +745,7 @@ class FamilyTaskDB:
             logger.error(f"Unexpected error in assign_task (task: {task_id}, user: {assigned_to}, chat: {chat_id}): {e}")
             raise
 
+    @_instrumented
     def get_user_assigned_tasks(self, chat_id, user_id):
         if self.fallback_mode:
             # In fallback mode, get assignments from memory
@@ -283,7 +756,7 @@ class FamilyTaskDB:
             
             result = []
             for assignment in user_assignments:
-                task = next((t for t in self._tasks if t['id'] == assignment['task_id']), None)
+                task = self._catalog_task(assignment['task_id'])
                 if task:
                     result.append({
                         "task_id": task['id'],
@@ -311,8 +784,13 @@ class FamilyTaskDB:
             logger.error(f"Errore in get_user_assigned_tasks: {e}")
             return []
 
-    def complete_task(self, chat_id, task_id, user_id):
-        """Complete a task with improved validation and error handling"""
+    @_instrumented
+    def complete_task(self, chat_id, task_id, user_id, awarded=None):
+        """Complete a task with improved validation and error handling.
+
+        Badges unlocked by this completion are persisted and, if ``awarded``
+        is a list, their keys are appended to it.
+        """
         if self.fallback_mode:
             # In fallback mode, handle completion in memory
             # Find the assignment
@@ -331,13 +809,14 @@ class FamilyTaskDB:
                 return False
             
             # Find the task details
-            task = next((t for t in self._tasks if t['id'] == task_id), None)
+            task = self._catalog_task(task_id)
             if not task:
                 logger.error(f"Task {task_id} not found in fallback mode")
                 return False
             
             # Mark as completed and add to completed tasks
             completion = {
+                'id': next(self._completion_ids),
                 'chat_id': chat_id,
                 'task_id': task_id,
                 'assigned_to': user_id,
@@ -347,9 +826,32 @@ class FamilyTaskDB:
                 'points_earned': task['points']
             }
             self._completed.append(completion)
+            # Giorno della famiglia: lo stesso usato da streak e classifiche settimanali/mensili
+            today = local_today(self._family_timezone(chat_id))
+            day_rollup = self._daily_rollups.setdefault((chat_id, today), {})
+            totals = day_rollup.setdefault(user_id, [0, 0])
+            totals[0] += task['points']
+            totals[1] += 1
+            stats = self._chat_user_stats.setdefault((chat_id, user_id), {
+                'total_points': 0, 'tasks_completed': 0,
+                'current_streak': 0, 'best_streak': 0, 'last_task_day': None,
+            })
+            before = dict(stats)
+            stats['total_points'] += task['points']
+            stats['tasks_completed'] += 1
+            stats['current_streak'] = advance_streak(stats['current_streak'], stats['last_task_day'], today)
+            stats['best_streak'] = max(stats['best_streak'], stats['current_streak'])
+            stats['last_task_day'] = max(stats['last_task_day'] or today, today)
+            earned = self._badges.setdefault((chat_id, user_id), [])
+            for rule in badges.evaluate(before, stats):
+                if rule.key not in earned:
+                    earned.append(rule.key)
+                    if awarded is not None:
+                        awarded.append(rule.key)
             
             # Remove from assigned tasks
             self._assigned.pop(assignment_index)
+            self._bump_assignment_version(chat_id)
             
             logger.info(f"Task {task_id} completed by user {user_id} in chat {chat_id} (+{task['points']} points) [fallback mode]")
             return True
@@ -357,6 +859,7 @@ class FamilyTaskDB:
         try:
             with self.get_db_connection() as conn:
                 cur = conn.cursor()
+                today = local_today(self._family_timezone(chat_id, cur))
                 
                 # First, check if the task assignment exists and is in 'assigned' status
                 cur.execute("""
@@ -392,6 +895,63 @@ class FamilyTaskDB:
                     WHERE chat_id = %s AND task_id = %s AND assigned_to = %s AND status = 'completed';
                 """, (points, chat_id, task_id, user_id))
                 
+                # Keep the per-day rollup used by the leaderboards in sync, keyed by
+                # the family's local day (not the DB session's CURRENT_DATE)
+                cur.execute("""
+                    INSERT INTO completion_daily_rollups (chat_id, day, user_id, points, tasks_completed)
+                    VALUES (%s, %s, %s, %s, 1)
+                    ON CONFLICT (chat_id, day, user_id) DO UPDATE
+                    SET points = completion_daily_rollups.points + EXCLUDED.points,
+                        tasks_completed = completion_daily_rollups.tasks_completed + 1;
+                """, (chat_id, today, user_id, points))
+                
+                # ...and the per-family totals read by stats and the all-time board.
+                # The streak advances by comparing the last completion day with
+                # the same family-local ``today`` as the rollup (rules of advance_streak).
+                # The CTE reads the pre-update row, so one statement returns the
+                # before/after counters the badge rules are evaluated on.
+                cur.execute("""
+                    WITH old AS (
+                        SELECT current_streak FROM chat_user_stats WHERE chat_id = %s AND user_id = %s
+                    )
+                    INSERT INTO chat_user_stats (chat_id, user_id, total_points, tasks_completed, last_completed_at,
+                                                 current_streak, best_streak, last_task_day)
+                    SELECT %s, %s, %s, 1, NOW(), 1, 1, %s::date
+                    ON CONFLICT (chat_id, user_id) DO UPDATE
+                    SET total_points = chat_user_stats.total_points + EXCLUDED.total_points,
+                        tasks_completed = chat_user_stats.tasks_completed + 1,
+                        last_completed_at = EXCLUDED.last_completed_at,
+                        current_streak = CASE
+                            WHEN chat_user_stats.last_task_day = EXCLUDED.last_task_day
+                                THEN GREATEST(chat_user_stats.current_streak, 1)
+                            WHEN chat_user_stats.last_task_day = EXCLUDED.last_task_day - 1
+                                THEN chat_user_stats.current_streak + 1
+                            ELSE 1 END,
+                        best_streak = GREATEST(chat_user_stats.best_streak, CASE
+                            WHEN chat_user_stats.last_task_day = EXCLUDED.last_task_day
+                                THEN GREATEST(chat_user_stats.current_streak, 1)
+                            WHEN chat_user_stats.last_task_day = EXCLUDED.last_task_day - 1
+                                THEN chat_user_stats.current_streak + 1
+                            ELSE 1 END),
+                        last_task_day = GREATEST(chat_user_stats.last_task_day, EXCLUDED.last_task_day)
+                    RETURNING total_points, tasks_completed, current_streak, (SELECT current_streak FROM old);
+                """, (chat_id, user_id, chat_id, user_id, points, today))
+                total_points, tasks_completed, streak, old_streak = cur.fetchone()
+                before = {
+                    'total_points': total_points - points,
+                    'tasks_completed': tasks_completed - 1,
+                    'current_streak': old_streak or 0,
+                }
+                after = {'total_points': total_points, 'tasks_completed': tasks_completed, 'current_streak': streak}
+                new_badges = badges.evaluate(before, after)
+                if new_badges:
+                    cur.executemany("""
+                        INSERT INTO badges (chat_id, user_id, name) VALUES (%s, %s, %s)
+                        ON CONFLICT (chat_id, user_id, name) DO NOTHING;
+                    """, [(chat_id, user_id, rule.key) for rule in new_badges])
+                    if awarded is not None:
+                        awarded.extend(rule.key for rule in new_badges)
+                
                 # Remove from assigned_tasks (so it can be reassigned)
                 cur.execute("""
                     DELETE FROM assigned_tasks 
@@ -399,6 +959,7 @@ class FamilyTaskDB:
                 """, (chat_id, task_id, user_id))
                 
                 conn.commit()
+                self._bump_assignment_version(chat_id)
                 logger.info(f"Task {task_id} completed by user {user_id} in chat {chat_id} (+{points} points)")
                 return True
                 
@@ -409,6 +970,253 @@ class FamilyTaskDB:
             logger.error(f"Unexpected error in complete_task (chat_id={chat_id}, task_id={task_id}, user_id={user_id}): {e}")
             return False
 
+    @_instrumented
+    def get_due_assignments(self, until, shard=None):
+        """Open assignments due by ``until`` that still owe a reminder or an overdue notice.
+
+        One range query on the partial index idx_assigned_tasks_due; rows carry
+        reminder_stage (0 = nothing sent, 1 = reminder sent). ``shard``
+        (sharding.Shard) restricts the rows to the chats of one worker.
+        """
+        if self.fallback_mode:
+            rows = []
+            for a in self._assigned:
+                if a['status'] != 'assigned' or not a.get('due_date') or a['due_date'] > until:
+                    continue
+                if shard is not None and not shard.owns(a['chat_id']):
+                    continue
+                if a.get('reminder_stage', 0) >= 2:
+                    continue
+                task = self._catalog_task(a['task_id'])
+                member = self._members.get(a['chat_id'], {}).get(a['assigned_to'], {})
+                rows.append({
+                    'id': a['id'], 'chat_id': a['chat_id'], 'task_id': a['task_id'],
+                    'assigned_to': a['assigned_to'], 'due_date': a['due_date'],
+                    'reminder_stage': a.get('reminder_stage', 0),
+                    'name': task['name'] if task else a['task_id'],
+                    'first_name': member.get('first_name')
+                })
+            return sorted(rows, key=lambda r: (r['chat_id'], r['due_date']))
+
+        try:
+            with self.get_db_connection() as conn:
+                cur = conn.cursor()
+                cur.execute("""
+                    SELECT a.id, a.chat_id, a.task_id, a.assigned_to, a.due_date, a.reminder_stage,
+                           t.name, m.first_name
+                    FROM assigned_tasks a
+                    JOIN tasks t ON t.id = a.task_id
+                    LEFT JOIN family_members m ON m.chat_id = a.chat_id AND m.user_id = a.assigned_to
+                    WHERE a.status = 'assigned' AND a.reminder_stage < 2 AND a.due_date <= %s
+                      AND (%s::int IS NULL OR abs(a.chat_id) %% %s = %s)
+                    ORDER BY a.chat_id, a.due_date;
+                """, (until,) + _shard_params(shard))
+                return [
+                    {
+                        'id': row[0], 'chat_id': row[1], 'task_id': row[2], 'assigned_to': row[3],
+                        'due_date': row[4], 'reminder_stage': row[5], 'name': row[6], 'first_name': row[7]
+                    }
+                    for row in cur.fetchall()
+                ]
+        except Exception as e:
+            logger.error(f"Errore in get_due_assignments: {e}")
+            return []
+
+    @_instrumented
+    def set_reminder_stages(self, stages):
+        """Record sent notifications: {assignment id: new reminder_stage}"""
+        if not stages:
+            return
+        if self.fallback_mode:
+            for a in self._assigned:
+                if a.get('id') in stages:
+                    a['reminder_stage'] = stages[a['id']]
+            return
+        try:
+            with self.get_db_connection() as conn:
+                cur = conn.cursor()
+                cur.execute("""
+                    UPDATE assigned_tasks a SET reminder_stage = v.stage
+                    FROM (SELECT unnest(%s::int[]) AS id, unnest(%s::smallint[]) AS stage) v
+                    WHERE a.id = v.id;
+                """, (list(stages), list(stages.values())))
+                conn.commit()
+        except Exception as e:
+            logger.error(f"Errore in set_reminder_stages: {e}")
+
+    @_instrumented
+    def add_recurring_task(self, chat_id, task_id, assigned_to, assigned_by, interval_days, next_due):
+        """Create a recurrence and return it as a dict (see get_recurring_tasks)"""
+        if self.fallback_mode:
+            member = self._members.get(chat_id, {}).get(assigned_to, {})
+            rec = {
+                'id': next(self._recurring_ids),
+                'chat_id': chat_id,
+                'task_id': task_id,
+                'assigned_to': assigned_to,
+                'assigned_by': assigned_by,
+                'interval_days': interval_days,
+                'next_due': next_due,
+                'first_name': member.get('first_name')
+            }
+            self._recurring[rec['id']] = rec
+            return dict(rec)
+
+        with self.get_db_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("""
+                INSERT INTO recurring_tasks (chat_id, task_id, assigned_to, assigned_by, interval_days, next_due)
+                VALUES (%s, %s, %s, %s, %s, %s)
+                RETURNING id, (SELECT first_name FROM family_members WHERE chat_id = %s AND user_id = %s);
+            """, (chat_id, task_id, assigned_to, assigned_by, interval_days, next_due, chat_id, assigned_to))
+            rec_id, first_name = cur.fetchone()
+            conn.commit()
+        return {
+            'id': rec_id, 'chat_id': chat_id, 'task_id': task_id, 'assigned_to': assigned_to,
+            'assigned_by': assigned_by, 'interval_days': interval_days, 'next_due': next_due,
+            'first_name': first_name
+        }
+
+    @_instrumented
+    def get_recurring_tasks(self, chat_id=None, shard=None):
+        """Active recurrences of a family (or of every family of ``shard``), earliest next_due first"""
+        if self.fallback_mode:
+            recs = [
+                dict(rec) for rec in self._recurring.values()
+                if (chat_id is None or rec['chat_id'] == chat_id) and (shard is None or shard.owns(rec['chat_id']))
+            ]
+            return sorted(recs, key=lambda r: (r['next_due'], r['id']))
+
+        try:
+            with self.get_db_connection() as conn:
+                cur = conn.cursor()
+                cur.execute("""
+                    SELECT r.id, r.chat_id, r.task_id, r.assigned_to, r.assigned_by, r.interval_days, r.next_due,
+                           m.first_name
+                    FROM recurring_tasks r
+                    LEFT JOIN family_members m ON m.chat_id = r.chat_id AND m.user_id = r.assigned_to
+                    WHERE (%s::bigint IS NULL OR r.chat_id = %s::bigint)
+                      AND (%s::int IS NULL OR abs(r.chat_id) %% %s = %s)
+                    ORDER BY r.next_due, r.id;
+                """, (chat_id, chat_id) + _shard_params(shard))
+                return [
+                    {
+                        'id': row[0], 'chat_id': row[1], 'task_id': row[2], 'assigned_to': row[3],
+                        'assigned_by': row[4], 'interval_days': row[5], 'next_due': row[6],
+                        'first_name': row[7]
+                    }
+                    for row in cur.fetchall()
+                ]
+        except Exception as e:
+            logger.error(f"Errore in get_recurring_tasks: {e}")
+            return []
+
+    @_instrumented
+    def advance_recurring_task(self, rec_id, next_due):
+        if self.fallback_mode:
+            if rec_id in self._recurring:
+                self._recurring[rec_id]['next_due'] = next_due
+            return
+        try:
+            with self.get_db_connection() as conn:
+                cur = conn.cursor()
+                cur.execute("UPDATE recurring_tasks SET next_due = %s WHERE id = %s;", (next_due, rec_id))
+                conn.commit()
+        except Exception as e:
+            logger.error(f"Errore in advance_recurring_task (id={rec_id}): {e}")
+
+    @_instrumented
+    def delete_recurring_task(self, chat_id, rec_id):
+        """Remove a recurrence of the given family; False if it does not exist"""
+        if self.fallback_mode:
+            rec = self._recurring.get(rec_id)
+            if rec is None or rec['chat_id'] != chat_id:
+                return False
+            del self._recurring[rec_id]
+            return True
+        try:
+            with self.get_db_connection() as conn:
+                cur = conn.cursor()
+                cur.execute("DELETE FROM recurring_tasks WHERE id = %s AND chat_id = %s;", (rec_id, chat_id))
+                deleted = cur.rowcount > 0
+                conn.commit()
+                return deleted
+        except Exception as e:
+            logger.error(f"Errore in delete_recurring_task (id={rec_id}): {e}")
+            return False
+
+    def track_message(self, chat_id, message_id):
+        """Remember a bot message for the cleanup job (memory only, no DB access).
+
+        With a database the ids reach tracked_messages in batches, see
+        flush_tracked_messages, so sending a reply never opens a connection.
+        """
+        with self._tracked_lock:
+            self._tracked_messages.append((chat_id, message_id))
+
+    @_instrumented
+    def flush_tracked_messages(self):
+        """Write the buffered message ids to tracked_messages in one INSERT; returns how many"""
+        if self.fallback_mode:
+            return 0
+        with self._tracked_lock:
+            pending, self._tracked_messages = self._tracked_messages, []
+        if not pending:
+            return 0
+        try:
+            with self.get_db_connection() as conn:
+                cur = conn.cursor()
+                psycopg2.extras.execute_values(
+                    cur,
+                    "INSERT INTO tracked_messages (chat_id, message_id) VALUES %s ON CONFLICT DO NOTHING;",
+                    pending,
+                )
+                conn.commit()
+        except Exception as e:
+            # Restano in memoria: il prossimo flush o la pulizia li riprendono
+            with self._tracked_lock:
+                self._tracked_messages[:0] = pending
+            logger.error(f"Errore in flush_tracked_messages ({len(pending)} messaggi): {e}")
+            return 0
+        return len(pending)
+
+    @_instrumented
+    def take_tracked_messages(self, shard=None):
+        """Remove and return the tracked messages (of ``shard``'s chats) as {chat_id: [message_id, ...]}
+
+        Buffered ids are taken straight from memory, flushed ones with one DELETE.
+        """
+        with self._tracked_lock:
+            buffered, self._tracked_messages = self._tracked_messages, []
+        pairs, kept = [], []
+        for chat_id, message_id in buffered:
+            if shard is None or shard.owns(chat_id):
+                pairs.append((chat_id, message_id))
+            else:
+                kept.append((chat_id, message_id))
+        if not self.fallback_mode:
+            try:
+                with self.get_db_connection() as conn:
+                    cur = conn.cursor()
+                    cur.execute("""
+                        DELETE FROM tracked_messages
+                        WHERE (%s::int IS NULL OR abs(chat_id) %% %s = %s)
+                        RETURNING chat_id, message_id;
+                    """, _shard_params(shard))
+                    pairs += cur.fetchall()
+                    conn.commit()
+            except Exception as e:
+                logger.error(f"Errore in take_tracked_messages: {e}")
+                kept = buffered
+                pairs = []
+        with self._tracked_lock:
+            self._tracked_messages[:0] = kept
+        taken = {}
+        for chat_id, message_id in sorted(set(pairs)):
+            taken.setdefault(chat_id, []).append(message_id)
+        return taken
+
+    @_instrumented
     def get_family_members(self, chat_id):
         if self.fallback_mode:
             # In fallback mode, get members from memory
@@ -431,62 +1239,145 @@ class FamilyTaskDB:
             logger.error(f"Errore in get_family_members: {e}")
             return []
 
-    def get_user_stats(self, user_id):
+    @_instrumented
+    def get_user_stats(self, user_id, chat_id=None):
+        """Points, completions, level and streaks of a user within one family.
+
+        Reads the chat_user_stats aggregate: a primary key lookup when chat_id
+        is given, otherwise the totals over every family of the user (with the
+        longest live streak). Streaks are kept up to date by complete_task, so
+        no completion history is scanned here.
+        """
         if self.fallback_mode:
-            # In fallback mode, calculate stats from memory
-            user_completions = [c for c in self._completed if c['assigned_to'] == user_id]
-            total_points = sum(c['points_earned'] for c in user_completions)
-            tasks_completed = len(user_completions)
-            level = 1 + total_points // 50
-            streak = min(tasks_completed, 7)
-            return {
-                'total_points': total_points,
-                'tasks_completed': tasks_completed,
-                'level': level,
-                'streak': streak
-            }
+            # In fallback mode, read the in-memory aggregates
+            total_points = tasks_completed = streak = best_streak = 0
+            earned = [
+                key for (badge_chat, badge_user), keys in self._badges.items()
+                if badge_user == user_id and (chat_id is None or badge_chat == chat_id)
+                for key in keys
+            ]
+            for (stats_chat, stats_user), row in self._chat_user_stats.items():
+                if stats_user != user_id or (chat_id is not None and stats_chat != chat_id):
+                    continue
+                today = local_today(self._timezones.get(stats_chat))
+                total_points += row['total_points']
+                tasks_completed += row['tasks_completed']
+                streak = max(streak, visible_streak(row['current_streak'], row['last_task_day'], today))
+                best_streak = max(best_streak, row['best_streak'])
+        else:
+            try:
+                with self.get_db_connection() as conn:
+                    cur = conn.cursor()
+                    cur.execute("""
+                        SELECT COALESCE(SUM(s.total_points),0), COALESCE(SUM(s.tasks_completed),0),
+                               COALESCE(MAX(CASE
+                                   WHEN s.last_task_day >= (NOW() AT TIME ZONE COALESCE(f.timezone, %s))::date - 1
+                                   THEN s.current_streak ELSE 0 END), 0),
+                               COALESCE(MAX(s.best_streak), 0),
+                               (SELECT array_agg(b.name ORDER BY b.earned_date, b.id) FROM badges b
+                                WHERE b.user_id = %s AND (%s::bigint IS NULL OR b.chat_id = %s::bigint))
+                        FROM chat_user_stats s
+                        LEFT JOIN families f ON f.chat_id = s.chat_id
+                        WHERE s.user_id = %s AND (%s::bigint IS NULL OR s.chat_id = %s::bigint);
+                    """, (DEFAULT_TIMEZONE, user_id, chat_id, chat_id, user_id, chat_id, chat_id))
+                    total_points, tasks_completed, streak, best_streak, earned = cur.fetchone()
+            except Exception as e:
+                logger.error(f"Errore in get_user_stats: {e}")
+                return None
+
+        total_points = total_points or 0
+        return {
+            'total_points': total_points,
+            'tasks_completed': tasks_completed or 0,
+            'level': 1 + total_points // 50,
+            'streak': streak or 0,
+            'best_streak': best_streak or 0,
+            # Badge keys (see badges.RULES) and the tier they add up to
+            'badges': list(dict.fromkeys(earned or [])),
+            'tier': badges.tier(earned or [])
+        }
 
+    @_instrumented
+    def set_family_timezone(self, chat_id, timezone):
+        """Set the IANA timezone used to count a family's streak days"""
+        try:
+            ZoneInfo(timezone)
+        except (ZoneInfoNotFoundError, ValueError):
+            raise ValueError(f"Fuso orario non valido: {timezone}")
+        if self.fallback_mode:
+            self._timezones[chat_id] = timezone
+            return
+        with self.get_db_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("""
+                INSERT INTO families (chat_id, timezone) VALUES (%s, %s)
+                ON CONFLICT (chat_id) DO UPDATE SET timezone = EXCLUDED.timezone;
+            """, (chat_id, timezone))
+            conn.commit()
+        self._timezones[chat_id] = timezone
+
+    def _family_timezone(self, chat_id, cur=None):
+        """IANA timezone of a family; with a database it is read once through ``cur`` and kept in _timezones"""
+        timezone = self._timezones.get(chat_id)
+        if timezone is not None or self.fallback_mode:
+            return timezone or DEFAULT_TIMEZONE
+        cur.execute("SELECT timezone FROM families WHERE chat_id = %s;", (chat_id,))
+        row = cur.fetchone()
+        # La chat è servita da un solo processo, che vede anche ogni set_family_timezone
+        timezone = row[0] if row and isinstance(row[0], str) else DEFAULT_TIMEZONE
+        self._timezones[chat_id] = timezone
+        return timezone
+
+    @_instrumented
+    def get_user_badges(self, user_id, chat_id=None):
+        """Badge keys earned by a user (in one family, or in any), oldest first"""
+        if self.fallback_mode:
+            return list(dict.fromkeys(
+                key for (badge_chat, badge_user), keys in self._badges.items()
+                if badge_user == user_id and (chat_id is None or badge_chat == chat_id)
+                for key in keys
+            ))
         try:
             with self.get_db_connection() as conn:
                 cur = conn.cursor()
                 cur.execute("""
-                    SELECT COALESCE(SUM(points_earned),0), COUNT(*)
-                    FROM completed_tasks
-                    WHERE assigned_to = %s;
-                """, (user_id,))
-                row = cur.fetchone()
-                total_points = row[0] or 0
-                tasks_completed = row[1] or 0
-                level = 1 + total_points // 50
-                streak = min(tasks_completed, 7)
-                return {
-                    'total_points': total_points,
-                    'tasks_completed': tasks_completed,
-                    'level': level,
-                    'streak': streak
-                }
+                    SELECT name FROM badges
+                    WHERE user_id = %s AND (%s::bigint IS NULL OR chat_id = %s::bigint)
+                    ORDER BY earned_date, id;
+                """, (user_id, chat_id, chat_id))
+                return list(dict.fromkeys(row[0] for row in cur.fetchall()))
         except Exception as e:
-            logger.error(f"Errore in get_user_stats: {e}")
-            return None
+            logger.error(f"Errore in get_user_badges: {e}")
+            return []
 
-    def get_user_badges(self, user_id):
-        """Get user badges - stub implementation for compatibility"""
-        # This is a stub implementation for tests - badges are not implemented yet
-        return []
+    @_instrumented
+    def get_user_task_completion_stats(self, user_id, chat_id=None):
+        """Get individual task completion statistics for a user (optionally in one family)"""
+        if self.fallback_mode:
+            # In fallback mode, group completions from memory
+            counts = {}
+            for c in self._completed:
+                if c['assigned_to'] == user_id and (chat_id is None or c['chat_id'] == chat_id):
+                    task = self._catalog_task(c['task_id'])
+                    name = task['name'] if task else c['task_id']
+                    counts[name] = counts.get(name, 0) + 1
+            return [
+                {"task_name": name, "completion_count": count}
+                for name, count in sorted(counts.items(), key=lambda x: (-x[1], x[0]))
+            ]
 
-    def get_user_task_completion_stats(self, user_id):
-        """Get individual task completion statistics for a user"""
         try:
             with self.get_db_connection() as conn:
                 cur = conn.cursor()
+                # (chat_id, assigned_to) is covered by idx_completed_tasks_chat_user
                 cur.execute("""
                     SELECT t.name, COUNT(*) as completion_count
                     FROM completed_tasks ct
                     JOIN tasks t ON ct.task_id = t.id
-                    WHERE ct.assigned_to = %s
+                    WHERE ct.assigned_to = %s AND (%s::bigint IS NULL OR ct.chat_id = %s::bigint)
                     GROUP BY ct.task_id, t.name
                     ORDER BY completion_count DESC, t.name ASC;
-                """, (user_id,))
+                """, (user_id, chat_id, chat_id))
                 rows = cur.fetchall()
                 return [
                     {"task_name": row[0], "completion_count": row[1]}
@@ -496,42 +1387,232 @@ class FamilyTaskDB:
             logger.error(f"Errore in get_user_task_completion_stats: {e}")
             return []
 
-    def get_leaderboard(self, chat_id):
+    @_instrumented
+    def get_completion_history(self, chat_id, limit=10, before=None):
+        """Family completions, newest first, starting after the keyset cursor ``before``.
+
+        ``before`` is the (completed_date, id) of the last row of the previous
+        page: every page is an index range scan on idx_completed_tasks_history,
+        so deep pages cost the same as the first one.
+        """
+        if self.fallback_mode:
+            rows = [
+                c for c in self._completed
+                if c['chat_id'] == chat_id and (before is None or (c['completed_date'], c['id']) < before)
+            ]
+            rows.sort(key=lambda c: (c['completed_date'], c['id']), reverse=True)
+            members = self._members.get(chat_id, {})
+            history = []
+            for c in rows[:limit]:
+                task = self._catalog_task(c['task_id'])
+                history.append({
+                    'id': c['id'],
+                    'completed_date': c['completed_date'],
+                    'task_name': task['name'] if task else c['task_id'],
+                    'points_earned': c['points_earned'],
+                    'first_name': members.get(c['assigned_to'], {}).get('first_name')
+                })
+            return history
+
         try:
-            members = self.get_family_members(chat_id)
-            leaderboard = []
-            for m in members:
-                stats = self.get_user_stats(m['user_id'])
-                if stats:
-                    leaderboard.append({
-                        'user_id': m['user_id'],
-                        'first_name': m['first_name'],
-                        'total_points': stats['total_points'],
-                        'tasks_completed': stats['tasks_completed'],
-                        'level': stats['level']
-                    })
-            leaderboard.sort(key=lambda x: (-x['total_points'], -x['tasks_completed']))
-            return leaderboard
+            with self.get_db_connection() as conn:
+                cur = conn.cursor()
+                cur.execute("""
+                    SELECT ct.id, ct.completed_date, COALESCE(t.name, ct.task_id), ct.points_earned, m.first_name
+                    FROM completed_tasks ct
+                    LEFT JOIN tasks t ON t.id = ct.task_id
+                    LEFT JOIN family_members m ON m.chat_id = ct.chat_id AND m.user_id = ct.assigned_to
+                    WHERE ct.chat_id = %s
+                      AND (%s::timestamp IS NULL OR (ct.completed_date, ct.id) < (%s::timestamp, %s::int))
+                    ORDER BY ct.completed_date DESC, ct.id DESC
+                    LIMIT %s;
+                """, (chat_id, before and before[0], before and before[0], before and before[1], limit))
+                return [
+                    {
+                        'id': row[0], 'completed_date': row[1], 'task_name': row[2],
+                        'points_earned': row[3], 'first_name': row[4]
+                    }
+                    for row in cur.fetchall()
+                ]
         except Exception as e:
-            logger.error(f"Errore in get_leaderboard: {e}")
+            logger.error(f"Errore in get_completion_history: {e}")
             return []
 
-    def get_task_by_id(self, task_id):
+    # Query per sezione di /export; ogni riga diventa un record dict con queste colonne
+    _EXPORT_QUERIES = (
+        ("member", ("user_id", "username", "first_name", "joined_date"), """
+            SELECT user_id, username, first_name, joined_date
+            FROM family_members WHERE chat_id = %s ORDER BY id;
+        """),
+        ("assignment", ("id", "task_id", "task_name", "assigned_to", "assigned_by", "assigned_date", "status", "due_date"), """
+            SELECT a.id, a.task_id, COALESCE(t.name, a.task_id), a.assigned_to, a.assigned_by,
+                   a.assigned_date, a.status, a.due_date
+            FROM assigned_tasks a LEFT JOIN tasks t ON t.id = a.task_id
+            WHERE a.chat_id = %s ORDER BY a.id;
+        """),
+        ("completion", ("id", "task_id", "task_name", "assigned_to", "assigned_by", "assigned_date",
+                        "completed_date", "points_earned"), """
+            SELECT ct.id, ct.task_id, COALESCE(t.name, ct.task_id), ct.assigned_to, ct.assigned_by,
+                   ct.assigned_date, ct.completed_date, ct.points_earned
+            FROM completed_tasks ct LEFT JOIN tasks t ON t.id = ct.task_id
+            WHERE ct.chat_id = %s ORDER BY ct.completed_date, ct.id;
+        """),
+    )
+
+    def iter_chat_export(self, chat_id, batch_size=1000):
+        """Yield (record_type, row dict) for a family's members, assignments and completions.
+
+        Each section is read through a server-side (named) cursor fetching
+        ``batch_size`` rows at a time, so memory stays flat however long the
+        history is. Not @_instrumented: it would only time the generator's
+        creation. Errors propagate, a truncated export must not look complete.
+        """
+        if self.fallback_mode:
+            for member in self._members.get(chat_id, {}).values():
+                yield "member", dict(member)
+            for a in self._assigned:
+                if a['chat_id'] == chat_id:
+                    task = self._catalog_task(a['task_id'])
+                    yield "assignment", {
+                        'id': a['id'], 'task_id': a['task_id'], 'task_name': task['name'] if task else a['task_id'],
+                        'assigned_to': a['assigned_to'], 'assigned_by': a['assigned_by'],
+                        'assigned_date': a['assigned_date'], 'status': a['status'], 'due_date': a.get('due_date'),
+                    }
+            for c in sorted((c for c in self._completed if c['chat_id'] == chat_id),
+                            key=lambda c: (c['completed_date'], c['id'])):
+                task = self._catalog_task(c['task_id'])
+                yield "completion", dict(
+                    {k: v for k, v in c.items() if k != 'chat_id'},
+                    task_name=task['name'] if task else c['task_id']
+                )
+            return
+
+        with self.get_db_connection() as conn:
+            for record_type, columns, query in self._EXPORT_QUERIES:
+                cur = conn.cursor(name=f"export_{record_type}")
+                cur.itersize = batch_size
+                cur.execute(query, (chat_id,))
+                for row in cur:
+                    yield record_type, dict(zip(columns, row))
+                cur.close()
+
+    @_instrumented
+    def get_leaderboard(self, chat_id, period="all"):
+        """Points and completed tasks of every family member in a period, in one round trip.
+
+        The all-time board reads the chat_user_stats totals; weekly and monthly
+        boards sum completion_daily_rollups, at most a few rows per member.
+        Periods start on the family's local day, like the rollup rows.
+        """
+        if period not in LEADERBOARD_PERIODS:
+            raise ValueError(f"Periodo classifica non valido: {period}")
+        if self.fallback_mode:
+            start = period_start(period, today=local_today(self._family_timezone(chat_id)))
+            if start is None:
+                totals = {
+                    user_id: (row['total_points'], row['tasks_completed'])
+                    for (stats_chat, user_id), row in self._chat_user_stats.items()
+                    if stats_chat == chat_id
+                }
+            else:
+                totals = {}
+                for (rollup_chat, day), users in self._daily_rollups.items():
+                    if rollup_chat != chat_id or day < start:
+                        continue
+                    for user_id, (points, count) in users.items():
+                        old_points, old_count = totals.get(user_id, (0, 0))
+                        totals[user_id] = (old_points + points, old_count + count)
+            rows = [
+                (user_id, member['first_name']) + totals.get(user_id, (0, 0))
+                for user_id, member in self._members.get(chat_id, {}).items()
+            ]
+        else:
+            try:
+                with self.get_db_connection() as conn:
+                    cur = conn.cursor()
+                    start = None
+                    if period != "all":
+                        start = period_start(period, today=local_today(self._family_timezone(chat_id, cur)))
+                    if start is None:
+                        cur.execute("""
+                            SELECT m.user_id, m.first_name, COALESCE(s.total_points, 0), COALESCE(s.tasks_completed, 0)
+                            FROM family_members m
+                            LEFT JOIN chat_user_stats s
+                                ON s.chat_id = m.chat_id AND s.user_id = m.user_id
+                            WHERE m.chat_id = %s;
+                        """, (chat_id,))
+                    else:
+                        cur.execute("""
+                            SELECT m.user_id, m.first_name, COALESCE(SUM(r.points), 0), COALESCE(SUM(r.tasks_completed), 0)
+                            FROM family_members m
+                            LEFT JOIN completion_daily_rollups r
+                                ON r.chat_id = m.chat_id AND r.user_id = m.user_id AND r.day >= %s
+                            WHERE m.chat_id = %s
+                            GROUP BY m.user_id, m.first_name;
+                        """, (start, chat_id))
+                    rows = cur.fetchall()
+            except Exception as e:
+                logger.error(f"Errore in get_leaderboard: {e}")
+                return []
+
+        leaderboard = [
+            {
+                'user_id': row[0],
+                'first_name': row[1],
+                'total_points': row[2] or 0,
+                'tasks_completed': row[3] or 0,
+                'level': 1 + (row[2] or 0) // 50
+            }
+            for row in rows
+        ]
+        leaderboard.sort(key=lambda x: (-x['total_points'], -x['tasks_completed']))
+        return leaderboard
+
+    @_instrumented
+    def get_task_by_id(self, task_id, chat_id=None):
+        """Catalog task by text id; with ``chat_id``, other families' custom tasks are not found"""
+        owner = custom_task_chat(task_id)
+        if owner is not None:
+            if chat_id is not None and owner != chat_id:
+                return None
+            return self._lookup_task(self._chat_catalog(owner).by_id, "id", task_id, custom=True)
+        return self._lookup_task(self._tasks_by_id, "id", task_id)
+
+    @_instrumented
+    def get_task_by_short_id(self, short_id, chat_id=None):
+        """Task referenced by its numeric short_id (compact callback_data) in ``chat_id``'s catalog"""
+        if chat_id is not None:
+            task = self._chat_catalog(chat_id).by_short_id.get(short_id)
+            if task is not None:
+                metrics.record_cache("task_catalog", hit=True)
+                return task
+        return self._lookup_task(self._tasks_by_short_id, "short_id", short_id)
+
+    def task_short_id(self, task_id):
+        """short_id of a catalog task, None if unknown (no DB access for global tasks)"""
+        task = self._catalog_task(task_id)
+        return task['short_id'] if task else None
+
+    def _lookup_task(self, index, column, value, custom=False):
         try:
-            for t in self._tasks:
-                if t['id'] == task_id:
-                    return t
+            task = index.get(value)
+            metrics.record_cache("task_catalog", hit=task is not None)
+            # Le task personalizzate arrivano già dal catalogo della famiglia, appena caricato
+            if task is not None or custom or self.fallback_mode:
+                return task
+            # Global task added after startup (e.g. by sync_default_tasks.py)
             with self.get_db_connection() as conn:
                 cur = conn.cursor()
-                cur.execute("SELECT id, name, points, time_minutes FROM tasks WHERE id = %s;", (task_id,))
+                cur.execute(f"SELECT id, name, points, time_minutes, short_id FROM tasks WHERE {column} = %s AND chat_id IS NULL;", (value,))
                 row = cur.fetchone()
                 if row:
-                    return {"id": row[0], "name": row[1], "points": row[2], "time_minutes": row[3]}
+                    return {"id": row[0], "name": row[1], "points": row[2], "time_minutes": row[3], "short_id": row[4]}
             return None
         except Exception as e:
-            logger.error(f"Errore in get_task_by_id: {e}")
+            logger.error(f"Errore nella ricerca della task {column}={value}: {e}")
             return None
 
+    @_instrumented
     def get_assigned_tasks_for_chat(self, chat_id):
         if self.fallback_mode:
             # In fallback mode, get assignments from memory
@@ -541,7 +1622,7 @@ class FamilyTaskDB:
             
             result = []
             for assignment in chat_assignments:
-                task = next((t for t in self._tasks if t['id'] == assignment['task_id']), None)
+                task = self._catalog_task(assignment['task_id'])
                 if task:
                     result.append({
                         "task_id": task['id'],
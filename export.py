@@ -0,0 +1,74 @@
+"""
+Family data export for /export.
+
+``write_export`` streams FamilyTaskDB.iter_chat_export into a gzip file one
+record at a time: the database side uses server-side cursors and the file
+side writes through a compressor, so neither the rows nor the file content
+are ever held in memory. It is blocking and meant for ``asyncio.to_thread``.
+
+Every record carries its ``type`` (member, assignment, completion). JSONL
+has one object per line; CSV uses one header with the union of the columns,
+empty where a record type has no value.
+"""
+
+import io
+import os
+import csv
+import gzip
+import json
+import logging
+import tempfile
+from datetime import date, datetime
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ("csv", "jsonl")
+# Telegram bots can upload documents up to 50 MB
+MAX_DOCUMENT_SIZE = 50 * 1024 * 1024
+
+CSV_FIELDS = (
+    "type", "id", "user_id", "username", "first_name", "joined_date", "task_id", "task_name",
+    "assigned_to", "assigned_by", "assigned_date", "status", "due_date", "completed_date", "points_earned",
+)
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Valore non serializzabile: {value!r}")
+
+
+def _csv_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def write_export(db, chat_id, fmt="csv", directory=None):
+    """Write a family export to a temporary ``.{fmt}.gz`` file; returns (path, records).
+
+    The caller owns the file and must remove it.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Formato non supportato: {fmt}")
+    fd, path = tempfile.mkstemp(prefix=f"export_{abs(chat_id)}_", suffix=f".{fmt}.gz", dir=directory)
+    records = 0
+    try:
+        with os.fdopen(fd, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb") as gz, \
+                io.TextIOWrapper(gz, encoding="utf-8", newline="") as out:
+            if fmt == "csv":
+                writer = csv.DictWriter(out, CSV_FIELDS, extrasaction="ignore")
+                writer.writeheader()
+                for record_type, row in db.iter_chat_export(chat_id):
+                    writer.writerow({"type": record_type, **{k: _csv_value(v) for k, v in row.items()}})
+                    records += 1
+            else:
+                for record_type, row in db.iter_chat_export(chat_id):
+                    out.write(json.dumps({"type": record_type, **row}, default=_json_default, ensure_ascii=False))
+                    out.write("\n")
+                    records += 1
+    except BaseException:
+        os.unlink(path)
+        raise
+    logger.info(f"Export chat {chat_id}: {records} record in {path} ({os.path.getsize(path)} byte)")
+    return path, records
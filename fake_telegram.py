@@ -0,0 +1,166 @@
+"""
+Local stand-in for the Telegram Bot API.
+
+``FakeBotAPI`` plugs into python-telegram-bot as a request backend, so a real
+``telegram.Bot``/``Application`` runs end to end without network access.
+The ``*_update`` helpers build synthetic updates bound to that bot.
+"""
+
+import json
+import time
+import asyncio
+import itertools
+from collections import Counter
+
+from telegram import Update
+from telegram.ext import Application, ExtBot
+from telegram.request import BaseRequest
+
+BOT_USER = {"id": 424242, "is_bot": True, "first_name": "FamilyTaskBot", "username": "family_task_bot"}
+FAKE_TOKEN = "424242:FAKE-TOKEN-FOR-LOCAL-TESTS"
+
+
+class FakeBotAPI(BaseRequest):
+    """Answers Bot API methods locally and records every call"""
+
+    def __init__(self, latency=0.0, record=True):
+        self.latency = latency
+        self.record = record
+        self.calls = Counter()
+        self.requests = []
+        self._message_ids = itertools.count(1000)
+        # file_id -> contents served by getFile and the file download
+        self.files = {}
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    def reset(self):
+        self.calls.clear()
+        self.requests.clear()
+
+    async def do_request(self, url, method, request_data=None, read_timeout=None,
+                         write_timeout=None, connect_timeout=None, pool_timeout=None):
+        api_method = url.rsplit("/", 1)[-1]
+        if "/file/bot" in url:
+            return 200, self.files[api_method]
+        params = request_data.parameters if request_data else {}
+        self.calls[api_method] += 1
+        if self.record:
+            self.requests.append((api_method, params))
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        result = self._answer(api_method, params)
+        return 200, json.dumps({"ok": True, "result": result}).encode("utf-8")
+
+    def _message(self, params, **extra):
+        chat_id = int(params.get("chat_id", 0))
+        message = {
+            "message_id": int(params.get("message_id") or next(self._message_ids)),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private" if chat_id > 0 else "group"},
+            "from": BOT_USER,
+        }
+        if "text" in params:
+            message["text"] = params["text"]
+        message.update(extra)
+        return message
+
+    def _answer(self, api_method, params):
+        if api_method == "getMe":
+            return dict(BOT_USER, can_join_groups=True, can_read_all_group_messages=False,
+                        supports_inline_queries=False)
+        if api_method in ("sendMessage", "editMessageText", "editMessageReplyMarkup"):
+            return self._message(params)
+        if api_method == "sendDocument":
+            return self._message(params, document={"file_id": "fake", "file_unique_id": "fake"})
+        if api_method == "getUpdates":
+            return []
+        if api_method == "getFile":
+            file_id = params["file_id"]
+            return {"file_id": file_id, "file_unique_id": file_id, "file_size": len(self.files[file_id]),
+                    "file_path": file_id}
+        return True
+
+
+def make_bot(api=None):
+    """Return a bot wired to a FakeBotAPI (created if not given) and the API"""
+    api = api or FakeBotAPI()
+    return ExtBot(FAKE_TOKEN, request=api, get_updates_request=api), api
+
+
+def build_application(family_bot, api=None, throttle=None):
+    """Application with every FamilyTaskBot handler registered, talking to a FakeBotAPI"""
+    from main import register_handlers
+    bot, api = make_bot(api)
+    application = Application.builder().bot(bot).updater(None).build()
+    register_handlers(application, family_bot, throttle=throttle)
+    return application, api
+
+
+_update_ids = itertools.count(1)
+_message_ids = itertools.count(1)
+
+
+def _user(user_id, first_name):
+    return {"id": user_id, "is_bot": False, "first_name": first_name, "username": first_name.lower()}
+
+
+def _chat(chat_id):
+    if chat_id > 0:
+        return {"id": chat_id, "type": "private", "first_name": "Famiglia"}
+    return {"id": chat_id, "type": "group", "title": f"Famiglia {abs(chat_id)}"}
+
+
+def text_update(bot, chat_id, user_id, first_name, text):
+    """Message update; a leading /command gets the bot_command entity"""
+    message = {
+        "message_id": next(_message_ids),
+        "date": int(time.time()),
+        "chat": _chat(chat_id),
+        "from": _user(user_id, first_name),
+        "text": text,
+    }
+    if text.startswith("/"):
+        message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+    return Update.de_json({"update_id": next(_update_ids), "message": message}, bot)
+
+
+def command_update(bot, chat_id, user_id, first_name, command, *args):
+    return text_update(bot, chat_id, user_id, first_name, " ".join((f"/{command}",) + args))
+
+
+def callback_update(bot, chat_id, user_id, first_name, data, message_id=None):
+    """Callback query update pressed on a message previously sent by the bot"""
+    message = {
+        "message_id": message_id or next(_message_ids),
+        "date": int(time.time()),
+        "chat": _chat(chat_id),
+        "from": BOT_USER,
+        "text": "menu",
+    }
+    query = {
+        "id": str(next(_update_ids)),
+        "from": _user(user_id, first_name),
+        "chat_instance": str(chat_id),
+        "data": data,
+        "message": message,
+    }
+    return Update.de_json({"update_id": next(_update_ids), "callback_query": query}, bot)
+
+
+def document_update(bot, chat_id, user_id, first_name, file_name, file_id, caption=None):
+    """Message update carrying a document (register its contents in FakeBotAPI.files)"""
+    message = {
+        "message_id": next(_message_ids),
+        "date": int(time.time()),
+        "chat": _chat(chat_id),
+        "from": _user(user_id, first_name),
+        "document": {"file_id": file_id, "file_unique_id": file_id, "file_name": file_name},
+    }
+    if caption:
+        message["caption"] = caption
+    return Update.de_json({"update_id": next(_update_ids), "message": message}, bot)
@@ -0,0 +1,93 @@
+"""
+Paginated inline keyboards.
+
+Long lists (task catalog, category views, member pickers, personal task
+lists) are shown ``PAGE_SIZE`` buttons at a time with a ⬅️ n/N ➡️ row, so
+the reply_markup payload stays bounded however large the family or the
+catalog gets. Navigation buttons carry ``pg_<page>_<callback>``, where
+``callback`` is the callback_data that opened the view.
+"""
+
+from collections import OrderedDict
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+import metrics
+
+PAGE_SIZE = 8
+PAGE_PREFIX = "pg_"
+
+
+def page_callback(callback, page):
+    """callback_data that reopens ``callback`` at ``page`` (page 0 is the view itself)"""
+    return callback if page == 0 else f"{PAGE_PREFIX}{page}_{callback}"
+
+
+def parse_page_callback(data):
+    """Split ``pg_<page>_<callback>`` into (page, callback); other data is page 0"""
+    if not data.startswith(PAGE_PREFIX):
+        return 0, data
+    page, _, callback = data[len(PAGE_PREFIX):].partition("_")
+    if not page.isdigit() or not callback:
+        raise ValueError(f"Pagina non valida: {data}")
+    return int(page), callback
+
+
+def paginate(items, page, page_size=PAGE_SIZE):
+    """Items of ``page`` (clamped to the valid range), the page and the page count"""
+    pages = max(1, -(-len(items) // page_size))
+    page = min(max(page, 0), pages - 1)
+    return items[page * page_size:(page + 1) * page_size], page, pages
+
+
+def navigation_row(callback, page, pages):
+    if pages <= 1:
+        return []
+    row = []
+    if page > 0:
+        row.append(InlineKeyboardButton("⬅️", callback_data=page_callback(callback, page - 1)))
+    row.append(InlineKeyboardButton(f"{page + 1}/{pages}", callback_data="none"))
+    if page < pages - 1:
+        row.append(InlineKeyboardButton("➡️", callback_data=page_callback(callback, page + 1)))
+    return [row]
+
+
+def paged_keyboard(items, render, callback, page=0, header=(), footer=(), page_size=PAGE_SIZE):
+    """InlineKeyboardMarkup with one ``render(item)`` button per row for one page.
+
+    Only the visible items are rendered; ``header``/``footer`` are extra rows
+    (lists of buttons) shown on every page.
+    """
+    visible, page, pages = paginate(items, page, page_size)
+    keyboard = [list(row) for row in header]
+    keyboard.extend([render(item)] for item in visible)
+    keyboard.extend(navigation_row(callback, page, pages))
+    keyboard.extend(list(row) for row in footer)
+    return InlineKeyboardMarkup(keyboard)
+
+
+class PageCache:
+    """Small LRU cache for page inputs/keyboards keyed by a caller-chosen version"""
+
+    def __init__(self, name, maxsize=256):
+        self.name = name
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get_or_build(self, key, build):
+        try:
+            self._entries.move_to_end(key)
+            metrics.record_cache(self.name, hit=True)
+            return self._entries[key]
+        except KeyError:
+            metrics.record_cache(self.name, hit=False)
+        value = self._entries[key] = build()
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        self._entries.clear()
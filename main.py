@@ -1,17 +1,95 @@
 import os
 import sys
+import signal
 import logging
-from telegram.ext import Application, CommandHandler, MessageHandler, CallbackQueryHandler, filters, JobQueue
 import asyncio
-from bot_handlers import FamilyTaskBot
-from db import FamilyTaskDB
-from utils import delete_old_messages, setup_enhanced_logging
 
-# Setup enhanced logging
-setup_enhanced_logging()
+# telegram, bot_handlers e db (psycopg2) sono importati dove servono: all'avvio
+# il caricamento del catalogo parte prima e si sovrappone agli import di telegram (vedi startup.py)
 logger = logging.getLogger(__name__)
 
+
+def __getattr__(name):
+    # ``from main import FamilyTaskDB`` (script e test storici) senza importare psycopg2 con main
+    if name == "FamilyTaskDB":
+        from db import FamilyTaskDB
+        return FamilyTaskDB
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# Ogni quanto un processo controlla se il catalogo è stato importato altrove
+CATALOG_REFRESH_INTERVAL = int(os.environ.get("CATALOG_REFRESH_INTERVAL", "30"))
+
+
+def register_handlers(application, bot, throttle=None):
+    """Register all FamilyTaskBot handlers on a telegram Application.
+
+    ``throttle`` (a ratelimit.UpdateThrottle) runs in group -1, before any handler.
+    """
+    from telegram import Update
+    from telegram.ext import CommandHandler, MessageHandler, CallbackQueryHandler, TypeHandler, filters
+
+    if throttle is not None:
+        application.add_handler(TypeHandler(Update, throttle), group=-1)
+    application.add_handler(CommandHandler("start", bot.start))
+    application.add_handler(CommandHandler("help", bot.help_command))
+    application.add_handler(CommandHandler("leaderboard", bot.leaderboard))
+    application.add_handler(CommandHandler("stats", bot.stats))
+    application.add_handler(CommandHandler("tasks", bot.show_tasks))
+    application.add_handler(CommandHandler("mytasks", bot.my_tasks))
+    application.add_handler(CommandHandler("history", bot.history))
+    application.add_handler(CommandHandler("export", bot.export_command))
+    application.add_handler(CommandHandler("recurring", bot.recurring_command))
+    application.add_handler(CommandHandler("customtask", bot.customtask_command))
+    application.add_handler(CommandHandler("timezone", bot.timezone_command))
+    application.add_handler(CommandHandler("profile", bot.profile_command))
+    application.add_handler(CommandHandler("import", bot.import_command))
+    application.add_handler(MessageHandler(filters.Document.ALL & filters.CaptionRegex(r"^/import\b"), bot.import_catalog))
+    application.add_handler(CallbackQueryHandler(bot.button_handler))
+    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, bot.handle_message))
+
+
+async def refresh_catalog(context):
+    """Reload the catalog when another process imported a new one (see FamilyTaskDB.refresh_catalog)"""
+    try:
+        await asyncio.to_thread(context.job.data.refresh_catalog)
+    except Exception as e:
+        logger.error(f"Controllo versione catalogo fallito: {e}")
+
+
+def start_background_jobs(application, bot, shard=None):
+    """Recurring task scheduler, message cleanup, due-date reminders and catalog refresh.
+
+    With ``shard`` (sharding.Shard) every job only handles that worker's chats.
+    """
+    from scheduler import RecurringScheduler
+    from reminders import DueDateNotifier, DEFAULT_INTERVAL as REMINDER_INTERVAL
+    from utils import delete_old_messages
+
+    db = bot.get_db()
+    # Una sola sveglia per la prossima task ricorrente in scadenza
+    bot.scheduler = RecurringScheduler(db, application.job_queue, application.bot, shard=shard)
+    bot.scheduler.load()
+
+    # Job per cancellare i messaggi ogni 15 minuti
+    job_queue = application.job_queue
+    job_queue.run_repeating(delete_old_messages, interval=900, first=900)
+
+    # Promemoria scadenze: una query per tick, un messaggio per chat
+    job_queue.run_repeating(DueDateNotifier(db, shard=shard), interval=REMINDER_INTERVAL, first=60,
+                            name="due_date_reminders")
+
+    # Import del catalogo fatti da altri worker: una SELECT per tick
+    if not db.fallback_mode:
+        job_queue.run_repeating(refresh_catalog, interval=CATALOG_REFRESH_INTERVAL, first=CATALOG_REFRESH_INTERVAL,
+                                data=db, name="catalog_refresh")
+
+
 if __name__ == "__main__":
+    from utils import setup_enhanced_logging
+    from startup import StartupTimer, warm_up
+
+    startup = StartupTimer()
+    setup_enhanced_logging()
     TELEGRAM_TOKEN = os.environ.get("TELEGRAM_TOKEN")
     if not TELEGRAM_TOKEN:
         print("=" * 60)
@@ -34,7 +112,10 @@ if __name__ == "__main__":
         sys.exit(1)
 
     try:
-        db = FamilyTaskDB()
+        from db import FamilyTaskDB
+        # Un'unica istanza condivisa: il catalogo si carica in background
+        db = FamilyTaskDB(load_catalog=False)
+        catalog_ready = warm_up(db, startup)
         if db.fallback_mode:
             print("=" * 60)
             print("⚠️  MODALITÀ FALLBACK ATTIVATA")
@@ -62,21 +143,50 @@ if __name__ == "__main__":
         print(f"❌ Errore nell'inizializzazione: {e}")
         sys.exit(1)
 
-    bot = FamilyTaskBot()
-    application = Application.builder().token(TELEGRAM_TOKEN).build()
+    startup.mark("db_setup")
 
-    application.add_handler(CommandHandler("start", bot.start))
-    application.add_handler(CommandHandler("help", bot.help_command))
-    application.add_handler(CommandHandler("leaderboard", bot.leaderboard))
-    application.add_handler(CommandHandler("stats", bot.stats))
-    application.add_handler(CommandHandler("tasks", bot.show_tasks))
-    application.add_handler(CommandHandler("mytasks", bot.my_tasks))
-    application.add_handler(CallbackQueryHandler(bot.button_handler))
-    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, bot.handle_message))
+    # Import pesanti mentre il catalogo si carica
+    from telegram.ext import Application
+    from bot_handlers import FamilyTaskBot
+    from metrics import start_metrics_server
+    from ratelimit import UpdateThrottle
+    startup.mark("imports")
 
-    # Job per cancellare i messaggi ogni 15 minuti
-    job_queue = application.job_queue
-    job_queue.run_repeating(delete_old_messages, interval=900, first=900)
+    bot = FamilyTaskBot(db=db)
+
+    async def post_init(application):
+        # initialize() ha già fatto getMe
+        startup.mark("telegram_init")
+        await asyncio.wrap_future(catalog_ready)
+        startup.mark("catalog_wait")
+        start_background_jobs(application, bot)
+        install_profile_signal(application)
+        startup.mark("background_jobs")
+        logger.info(startup.report())
+
+    def install_profile_signal(application):
+        """SIGUSR2 starts a time-boxed profile written to PROFILE_DIR"""
+        if not hasattr(signal, "SIGUSR2"):
+            return
+        seconds = int(os.environ.get("PROFILE_SIGNAL_SECONDS", "30"))
+        asyncio.get_running_loop().add_signal_handler(
+            signal.SIGUSR2,
+            lambda: application.create_task(bot.run_profile(seconds))
+        )
+
+    application = Application.builder().token(TELEGRAM_TOKEN).post_init(post_init).build()
+
+    # Limiti per utente/chat prima di qualsiasi handler
+    register_handlers(application, bot, throttle=UpdateThrottle(ignore=bot.is_group_chatter))
+
+    # Endpoint metriche opzionale (formato testo Prometheus)
+    metrics_port = os.environ.get("METRICS_PORT")
+    if metrics_port:
+        try:
+            start_metrics_server(int(metrics_port), host=os.environ.get("METRICS_HOST", "127.0.0.1"))
+        except (ValueError, OSError) as e:
+            logger.error(f"Impossibile avviare l'endpoint metriche sulla porta {metrics_port}: {e}")
+    startup.mark("application")
 
     if db.fallback_mode:
         logger.warning("Bot avviato in MODALITÀ FALLBACK (senza database persistente)")
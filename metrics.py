@@ -0,0 +1,273 @@
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+logger = logging.getLogger(__name__)
+
+# Latency buckets in seconds, tuned for Telegram handlers and single DB round trips
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name}: attesi label {self.labelnames}, ricevuti {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        lines.extend(self._render_samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """Monotonically increasing counter"""
+    type = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def total(self):
+        with self._lock:
+            return sum(self._values.values())
+
+    def _render_samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Gauge(Counter):
+    """Value that can go up and down"""
+    type = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    """Cumulative histogram with fixed buckets"""
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._series = {}
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            series["buckets"][index] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the wall-clock duration of the ``with`` block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels):
+        series = self._series.get(self._key(labels))
+        return series["count"] if series else 0
+
+    def total_count(self):
+        """Observations across every label combination"""
+        with self._lock:
+            return sum(series["count"] for series in self._series.values())
+
+    def _render_samples(self):
+        with self._lock:
+            items = sorted((key, dict(s, buckets=list(s["buckets"]))) for key, s in self._series.items())
+        for key, series in items:
+            cumulative = 0
+            for bound, hits in zip(self.buckets, series["buckets"]):
+                cumulative += hits
+                labels = _format_labels(self.labelnames, key, ("le", _format_value(float(bound))))
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}_sum{labels} {series['sum']}"
+            yield f"{self.name}_count{labels} {series['count']}"
+
+
+class Registry:
+    """Collection of metrics rendered together in the text exposition format"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metrica già registrata: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+REGISTRY = Registry()
+
+HANDLER_LATENCY = REGISTRY.register(Histogram(
+    "familybot_handler_latency_seconds",
+    "Latency of Telegram update handlers",
+    ("kind", "name"),
+))
+HANDLER_ERRORS = REGISTRY.register(Counter(
+    "familybot_handler_errors_total",
+    "Unhandled exceptions raised by Telegram update handlers",
+    ("kind", "name"),
+))
+HANDLER_DB_CALLS = REGISTRY.register(Histogram(
+    "familybot_handler_db_calls",
+    "FamilyTaskDB calls issued while handling one update",
+    ("kind", "name"),
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50),
+))
+DB_QUERY_LATENCY = REGISTRY.register(Histogram(
+    "familybot_db_query_latency_seconds",
+    "Latency of FamilyTaskDB methods",
+    ("method",),
+))
+DB_QUERY_ERRORS = REGISTRY.register(Counter(
+    "familybot_db_query_errors_total",
+    "Database errors raised inside FamilyTaskDB methods",
+    ("method",),
+))
+CACHE_REQUESTS = REGISTRY.register(Counter(
+    "familybot_cache_requests_total",
+    "In-memory cache lookups by result (hit/miss)",
+    ("cache", "result"),
+))
+CLEANUP_RUNS = REGISTRY.register(Counter(
+    "familybot_cleanup_runs_total",
+    "Executions of the message cleanup job",
+))
+CLEANUP_MESSAGES = REGISTRY.register(Counter(
+    "familybot_cleanup_messages_total",
+    "Messages processed by the cleanup job by result (deleted/failed)",
+    ("result",),
+))
+CLEANUP_DURATION = REGISTRY.register(Histogram(
+    "familybot_cleanup_duration_seconds",
+    "Duration of the message cleanup job",
+    buckets=(0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 120.0),
+))
+MESSAGE_EDITS = REGISTRY.register(Counter(
+    "familybot_message_edits_total",
+    "Callback message edits by result (sent/skipped/not_modified)",
+    ("result",),
+))
+TEXT_MESSAGES = REGISTRY.register(Counter(
+    "familybot_text_messages_total",
+    "Free-text messages by outcome (matched/unrecognized/ignored/too_long)",
+    ("result",),
+))
+THROTTLED_UPDATES = REGISTRY.register(Counter(
+    "familybot_throttled_updates_total",
+    "Incoming updates dropped before the handlers (rate/repeat)",
+    ("reason",),
+))
+REPORT_RENDER_LATENCY = REGISTRY.register(Histogram(
+    "familybot_report_render_seconds",
+    "Report rendering time by report",
+    ("report",),
+))
+TRACKED_MESSAGES = REGISTRY.register(Gauge(
+    "familybot_tracked_messages",
+    "Bot messages currently waiting for automatic deletion",
+))
+STARTUP_SECONDS = REGISTRY.register(Gauge(
+    "familybot_startup_seconds",
+    "Duration of the last cold start by phase (see startup.py)",
+    ("phase",),
+))
+
+
+def record_cache(cache, hit):
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug("metrics %s - %s", self.address_string(), format % args)
+
+
+def start_metrics_server(port, host="127.0.0.1", registry=REGISTRY):
+    """Expose ``/metrics`` on a background thread and return the server"""
+    handler = type("MetricsRequestHandler", (_MetricsRequestHandler,), {"registry": registry})
+    server = ThreadingHTTPServer((host, port), handler)
+    thread = threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True)
+    thread.start()
+    logger.info(f"Endpoint metriche disponibile su http://{host}:{server.server_address[1]}/metrics")
+    return server
@@ -0,0 +1,186 @@
+import os
+import sys
+import time
+import asyncio
+import logging
+import threading
+from collections import Counter
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INTERVAL = 0.005
+MAX_DURATION = 120
+
+# Only frames from these files are reported as "hot" back to the admin
+REPORTED_FILES = ("bot_handlers.py", "db.py")
+
+
+def _frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _thread_stack(frame):
+    """Return the stack of a thread frame, outermost call first"""
+    stack = []
+    while frame is not None:
+        stack.append(frame.f_code)
+        frame = frame.f_back
+    stack.reverse()
+    return stack
+
+
+def _task_stack(task):
+    """Return the await chain of an asyncio task, outermost coroutine first"""
+    stack = []
+    coro = task.get_coro()
+    while coro is not None:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None)
+        if frame is None:
+            break
+        stack.append(frame.f_code)
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None)
+    return stack
+
+
+class ProfileResult:
+    def __init__(self, stacks, samples, duration, task_ticks=None, task_leaf_ticks=None):
+        self.stacks = stacks
+        self.samples = samples
+        self.duration = duration
+        # code -> ticks in which at least one task was awaiting in it (innermost frame: leaf)
+        self.task_ticks = task_ticks or Counter()
+        self.task_leaf_ticks = task_leaf_ticks or Counter()
+
+    def collapsed(self):
+        """Stacks in the collapsed format understood by flamegraph.pl/speedscope"""
+        lines = []
+        for (root, codes), count in self.stacks.most_common():
+            frames = [root] + [_frame_label(code) for code in codes]
+            lines.append(f"{';'.join(frames)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def hot_functions(self, files=REPORTED_FILES, limit=10, kind="thread"):
+        """Top functions from ``files`` by inclusive samples, with self samples.
+
+        ``kind="thread"`` ranks what the loop thread was running (CPU time);
+        ``kind="task"`` ranks where asyncio tasks were waiting, counting a
+        function once per tick however many tasks await in it. Both count
+        ticks, so ``samples / self.samples`` never exceeds 100%.
+        """
+        inclusive = Counter()
+        own = Counter()
+        if kind == "task":
+            inclusive.update({code: n for code, n in self.task_ticks.items() if os.path.basename(code.co_filename) in files})
+            own = self.task_leaf_ticks
+        elif kind == "thread":
+            for (root, codes), count in self.stacks.items():
+                if root != "thread":
+                    continue
+                seen = set()
+                for code in codes:
+                    if os.path.basename(code.co_filename) in files and code not in seen:
+                        seen.add(code)
+                        inclusive[code] += count
+                if codes and os.path.basename(codes[-1].co_filename) in files:
+                    own[codes[-1]] += count
+        else:
+            raise ValueError(f"Tipo di campioni non valido: {kind}")
+        return [
+            {"function": _frame_label(code), "samples": count, "self_samples": own[code]}
+            for code, count in inclusive.most_common(limit)
+        ]
+
+    def write(self, directory, prefix="profile"):
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{prefix}-{datetime.now():%Y%m%d-%H%M%S}.collapsed")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.collapsed())
+        return path
+
+
+class SamplingProfiler:
+    """Wall-clock sampler of the event loop thread and of its pending asyncio tasks.
+
+    Sampling runs on a background thread, so the loop keeps serving updates
+    while being profiled. Each tick records the loop thread stack plus the
+    await chain of every task, so time spent waiting on I/O is visible too.
+    The GIL switch interval is lowered while sampling, otherwise the sampler
+    would only get to run when the loop blocks in ``select`` and CPU-bound
+    handler code would never show up.
+    """
+
+    def __init__(self, loop, interval=DEFAULT_INTERVAL):
+        self.loop = loop
+        self.interval = interval
+        self.thread_id = None
+        self._stacks = Counter()
+        self._samples = 0
+        self._task_ticks = Counter()
+        self._task_leaf_ticks = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+        self._started = None
+        self._switch_interval = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, thread_id=None):
+        if self.running:
+            raise RuntimeError("Profilazione già in corso")
+        self.thread_id = thread_id or threading.get_ident()
+        self._stop.clear()
+        self._switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(min(self._switch_interval, self.interval / 5))
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self._switch_interval is not None:
+            sys.setswitchinterval(self._switch_interval)
+            self._switch_interval = None
+        return ProfileResult(self._stacks, self._samples, time.perf_counter() - self._started,
+                             self._task_ticks, self._task_leaf_ticks)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def sample(self):
+        frame = sys._current_frames().get(self.thread_id)
+        if frame is not None:
+            self._stacks[("thread", tuple(_thread_stack(frame)))] += 1
+        try:
+            tasks = asyncio.all_tasks(self.loop)
+        except RuntimeError:
+            tasks = ()
+        # Una funzione conta una volta per tick, anche se più task vi attendono
+        waiting, leaves = set(), set()
+        for task in tasks:
+            stack = _task_stack(task)
+            if stack:
+                self._stacks[("task", tuple(stack))] += 1
+                waiting.update(stack)
+                leaves.add(stack[-1])
+        self._task_ticks.update(waiting)
+        self._task_leaf_ticks.update(leaves)
+        self._samples += 1
+
+
+async def profile_for(duration, interval=DEFAULT_INTERVAL):
+    """Profile the running loop for ``duration`` seconds without blocking it"""
+    duration = max(1, min(duration, MAX_DURATION))
+    profiler = SamplingProfiler(asyncio.get_running_loop(), interval=interval)
+    profiler.start()
+    try:
+        await asyncio.sleep(duration)
+    finally:
+        result = profiler.stop()
+    logger.info(f"Profilazione completata: {result.samples} campioni in {result.duration:.1f}s")
+    return result
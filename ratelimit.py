@@ -0,0 +1,176 @@
+"""
+Token buckets for outgoing (and incoming) message rates.
+
+Telegram allows roughly 30 messages per second per bot and about one per
+second per chat; ``SendLimiter`` keeps bulk notifications under both limits.
+``UpdateThrottle`` does the opposite job for incoming updates: it drops taps
+and messages from a member (or a whole chat) going faster than a human would,
+before any handler touches the database.
+"""
+
+import os
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+
+from telegram.error import RetryAfter
+from telegram.ext import ApplicationHandlerStop
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Incoming update limits: sustained rate per second and burst size
+USER_RATE = float(os.environ.get("THROTTLE_USER_RATE", "1"))
+USER_BURST = float(os.environ.get("THROTTLE_USER_BURST", "5"))
+CHAT_RATE = float(os.environ.get("THROTTLE_CHAT_RATE", "5"))
+CHAT_BURST = float(os.environ.get("THROTTLE_CHAT_BURST", "20"))
+# Identical taps on the same message within this many seconds are handled once
+COALESCE_WINDOW = 1.0
+
+
+class TokenBucket:
+    """Classic token bucket: ``rate`` tokens per second, bursts up to ``capacity``"""
+
+    def __init__(self, rate, capacity=None, clock=time.monotonic):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(rate, 1))
+        self.tokens = self.capacity
+        self._clock = clock
+        self._updated = clock()
+
+    def _refill(self):
+        now = self._clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens=1):
+        """Take tokens if available; never waits"""
+        self._refill()
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return True
+        return False
+
+    def delay(self, tokens=1):
+        """Seconds until ``tokens`` will be available"""
+        self._refill()
+        return max(0.0, (tokens - self.tokens) / self.rate)
+
+    async def acquire(self, tokens=1):
+        while not self.try_acquire(tokens):
+            await asyncio.sleep(self.delay(tokens))
+
+
+class BucketMap:
+    """Token buckets created on demand per key, least recently used evicted past ``maxsize``"""
+
+    def __init__(self, rate, capacity=None, maxsize=10000, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.maxsize = maxsize
+        self._clock = clock
+        self._buckets = OrderedDict()
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def get(self, key):
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(self.rate, self.capacity, self._clock)
+            if len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket
+
+    def try_acquire(self, key, tokens=1):
+        return self.get(key).try_acquire(tokens)
+
+
+class UpdateThrottle:
+    """Per-user and per-chat limits for incoming updates, plus coalescing of repeated taps.
+
+    Registered as a TypeHandler in group -1 (see main.register_handlers): a
+    throttled update stops with ApplicationHandlerStop, so no handler runs.
+    Updates matching ``ignore`` (e.g. FamilyTaskBot.is_group_chatter) pass
+    through without spending tokens: the handler drops them anyway, and a
+    chatty group must not throttle its own button taps.
+    """
+
+    NOTICE = "⏳ Troppe richieste, riprova tra qualche secondo."
+
+    def __init__(self, user_rate=USER_RATE, user_burst=USER_BURST, chat_rate=CHAT_RATE, chat_burst=CHAT_BURST,
+                 coalesce_window=COALESCE_WINDOW, ignore=None, clock=time.monotonic):
+        self.users = BucketMap(user_rate, user_burst, clock=clock)
+        self.chats = BucketMap(chat_rate, chat_burst, clock=clock)
+        self.coalesce_window = coalesce_window
+        self.ignore = ignore
+        self._clock = clock
+        # (user_id, message_id, data) -> time of the last tap, oldest first
+        self._taps = OrderedDict()
+
+    def allow(self, chat_id, user_id):
+        """Take one token from the user's bucket, then from the chat's.
+
+        The user bucket goes first so a single spammer runs out of their own
+        tokens without draining the family's.
+        """
+        return self.users.try_acquire(user_id) and self.chats.try_acquire(chat_id)
+
+    def is_repeat(self, key):
+        """True if the same tap was seen less than ``coalesce_window`` seconds ago"""
+        now = self._clock()
+        while self._taps:
+            oldest_key, seen = next(iter(self._taps.items()))
+            if now - seen < self.coalesce_window:
+                break
+            del self._taps[oldest_key]
+        if key in self._taps:
+            return True
+        self._taps[key] = now
+        return False
+
+    async def __call__(self, update, context):
+        user, chat = update.effective_user, update.effective_chat
+        if user is None or chat is None:
+            return
+        if self.ignore is not None and self.ignore(update):
+            return
+        query = update.callback_query
+        if query is not None:
+            message_id = query.message.message_id if query.message else None
+            if self.is_repeat((user.id, message_id, query.data)):
+                metrics.THROTTLED_UPDATES.inc(reason="repeat")
+                await query.answer()
+                raise ApplicationHandlerStop
+        if not self.allow(chat.id, user.id):
+            metrics.THROTTLED_UPDATES.inc(reason="rate")
+            logger.info(f"Update limitato: utente {user.id} in chat {chat.id}")
+            if query is not None:
+                await query.answer(self.NOTICE)
+            # Throttled messages are dropped silently: a reply would be more spam
+            raise ApplicationHandlerStop
+
+
+class SendLimiter:
+    """Global plus per-chat token buckets in front of Bot API send calls"""
+
+    def __init__(self, global_rate=25, per_chat_rate=1, per_chat_burst=3, maxsize=10000):
+        self.global_bucket = TokenBucket(global_rate)
+        # Idle chats are evicted like UpdateThrottle's buckets
+        self._chats = BucketMap(per_chat_rate, per_chat_burst, maxsize=maxsize)
+
+    async def send(self, chat_id, func, /, *args, **kwargs):
+        """Await ``func`` once both buckets allow it, honouring one RetryAfter"""
+        await self._chats.get(chat_id).acquire()
+        await self.global_bucket.acquire()
+        try:
+            return await func(*args, **kwargs)
+        except RetryAfter as e:
+            retry_after = e.retry_after.total_seconds() if hasattr(e.retry_after, "total_seconds") else e.retry_after
+            logger.warning(f"Flood control su chat {chat_id}: nuovo tentativo tra {retry_after}s")
+            await asyncio.sleep(retry_after)
+            return await func(*args, **kwargs)
@@ -0,0 +1,104 @@
+"""
+Due-date reminders and overdue notices.
+
+Every tick runs one range query for open assignments due within the lead
+time, groups them per chat into a single message and sends those through a
+``ratelimit.SendLimiter``. Sent stages are written back in one UPDATE, so an
+assignment gets at most one reminder and one overdue notice.
+"""
+
+import os
+import logging
+from datetime import datetime, timedelta
+
+from telegram.constants import ParseMode
+from telegram.error import BadRequest, Forbidden
+from telegram.helpers import escape_markdown
+
+from ratelimit import SendLimiter
+
+logger = logging.getLogger(__name__)
+
+REMINDER_SENT = 1
+OVERDUE_SENT = 2
+
+DEFAULT_LEAD = timedelta(hours=float(os.environ.get("REMINDER_LEAD_HOURS", "2")))
+DEFAULT_INTERVAL = int(os.environ.get("REMINDER_INTERVAL", "300"))
+
+
+def _mention(item):
+    name = escape_markdown(item['first_name'] or str(item['assigned_to']))
+    return f"[{name}](tg://user?id={item['assigned_to']})"
+
+
+def build_message(items, now):
+    """Combined reminder text for one chat: (text, {assignment id: new stage})"""
+    overdue = [i for i in items if i['due_date'] <= now]
+    upcoming = [i for i in items if i['due_date'] > now and i['reminder_stage'] < REMINDER_SENT]
+    if not overdue and not upcoming:
+        return None, {}
+
+    text = "⏰ **Promemoria task**\n"
+    stages = {}
+    if overdue:
+        text += "\n⚠️ **In ritardo:**\n"
+        for item in overdue:
+            text += f"• **{escape_markdown(item['name'])}** → {_mention(item)} (scaduta il {item['due_date']:%d/%m %H:%M})\n"
+            stages[item['id']] = OVERDUE_SENT
+    if upcoming:
+        text += "\n🕒 **In scadenza:**\n"
+        for item in upcoming:
+            text += f"• **{escape_markdown(item['name'])}** → {_mention(item)} (entro le {item['due_date']:%H:%M} del {item['due_date']:%d/%m})\n"
+            stages[item['id']] = REMINDER_SENT
+    text += "\n💡 Usa '📝 Le Mie Task' per completarle!"
+    return text, stages
+
+
+class DueDateNotifier:
+    """JobQueue callback sending batched due-date reminders"""
+
+    def __init__(self, db, limiter=None, lead=DEFAULT_LEAD, shard=None):
+        self.db = db
+        self.limiter = limiter or SendLimiter()
+        self.lead = lead
+        # sharding.Shard: only remind this worker's chats
+        self.shard = shard
+
+    async def __call__(self, context):
+        await self.tick(context.bot)
+
+    async def tick(self, bot, now=None):
+        """Send one message per chat with due items; returns the number of messages sent"""
+        now = now or datetime.now()
+        items = self.db.get_due_assignments(now + self.lead, shard=self.shard)
+        by_chat = {}
+        for item in items:
+            by_chat.setdefault(item['chat_id'], []).append(item)
+
+        sent = 0
+        stages = {}
+        for chat_id, chat_items in by_chat.items():
+            text, chat_stages = build_message(chat_items, now)
+            if not text:
+                continue
+            try:
+                await self.limiter.send(
+                    chat_id, bot.send_message,
+                    chat_id=chat_id, text=text, parse_mode=ParseMode.MARKDOWN
+                )
+            except (BadRequest, Forbidden) as e:
+                # Errore permanente (testo rifiutato, bot rimosso): riprovare spenderebbe token a ogni tick
+                logger.error(f"Promemoria rifiutati dalla chat {chat_id}, segnati come inviati: {e}")
+                stages.update(chat_stages)
+                continue
+            except Exception as e:
+                # Not marked: the next tick retries this chat
+                logger.error(f"Errore nell'invio dei promemoria alla chat {chat_id}: {e}")
+                continue
+            stages.update(chat_stages)
+            sent += 1
+
+        self.db.set_reminder_stages(stages)
+        if sent:
+            logger.info(f"Promemoria inviati: {sent} messaggi per {len(stages)} task")
+        return sent
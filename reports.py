@@ -0,0 +1,154 @@
+"""
+Report rendering for the leaderboard, /stats and /history.
+
+The render functions here are pure: they take the rows already fetched from
+FamilyTaskDB (plain dicts, lists and datetimes) and return Markdown text.
+Their inputs are bounded by the handlers (family members, at most ~90 task
+types, one history page), so a render takes tens of microseconds and runs
+inline; ``render`` only times it.
+"""
+
+import time
+
+import badges
+import metrics
+
+
+def leaderboard_text(leaderboard, period, title):
+    """Family leaderboard; ``title`` is the period suffix (e.g. "di questo mese")"""
+    if not leaderboard:
+        return (
+            "🏆 **Classifica Famiglia**\n\n"
+            "🌟 **La competizione non è ancora iniziata!**\n\n"
+            "🚀 **Come entrare in classifica:**\n"
+            "1️⃣ Vai su '📋 Tutte le Task'\n"
+            "2️⃣ Scegli una categoria interessante\n"
+            "3️⃣ Assegnati una task facile per iniziare\n"
+            "4️⃣ Completala per guadagnare i primi punti\n"
+            "5️⃣ Apparirà il tuo nome in classifica! 🎉\n\n"
+            "💡 **Task consigliate per iniziare:**\n"
+            "• 🏠 Fare i letti (4 pt)\n"
+            "• 🍽️ Preparare la tavola (4 pt)\n"
+            "• 🌱 Innaffiare le piante (3 pt)\n\n"
+            "🎯 **Chi farà il primo passo e aprirà la competizione?**"
+        )
+
+    parts = [f"🏆 **Classifica Famiglia {title}**\n\n"]
+    for i, entry in enumerate(leaderboard, 1):
+        if i == 1:
+            pos = "🥇"
+            badge = "👑"
+        elif i == 2:
+            pos = "🥈"
+            badge = "🌟"
+        elif i == 3:
+            pos = "🥉"
+            badge = "⭐"
+        else:
+            pos = f"{i}°"
+            badge = "🏃"
+
+        if period == "all":
+            # Calculate progress to next level
+            current_level_points = (entry['level'] - 1) * 50
+            progress = entry['total_points'] - current_level_points
+            parts.append(
+                f"{pos} {badge} **{entry['first_name']}**\n"
+                f"    ⭐ {entry['total_points']} punti • 🏅 Livello {entry['level']}\n"
+                f"    ✅ {entry['tasks_completed']} task completate\n"
+                f"    📈 {progress}/50 punti al prossimo livello\n\n"
+            )
+        else:
+            # Levels are all-time: periodic boards only rank points in the window
+            parts.append(
+                f"{pos} {badge} **{entry['first_name']}**\n"
+                f"    ⭐ {entry['total_points']} punti • ✅ {entry['tasks_completed']} task\n\n"
+            )
+
+    if period != "all" and not any(entry['tasks_completed'] for entry in leaderboard):
+        parts.append("🌱 Nessuna task completata in questo periodo: chi inizia?\n\n")
+    parts.append("💡 Completa più task per scalare la classifica!")
+    return "".join(parts)
+
+
+def stats_text(first_name, stats, task_stats, max_types):
+    """Personal stats card; ``task_stats`` are the per-task completion counts"""
+    if not stats:
+        return (
+            f"📊 **Statistiche di {first_name}**\n\n"
+            "🆕 **Benvenuto nel Family Task Manager!**\n\n"
+            "📈 **I tuoi progressi:**\n"
+            "⭐ Punti: 0\n"
+            "✅ Task completate: 0\n"
+            "🏅 Livello: 1\n"
+            "🔥 Streak: 0\n\n"
+            "🎯 **Prossimo obiettivo:**\n"
+            "Completa la tua prima task per guadagnare punti!\n\n"
+            "💡 Vai su 📋 Tutte le Task per iniziare!"
+        )
+
+    # Calculate progress to next level
+    current_level_points = (stats['level'] - 1) * 50
+    next_level_points = stats['level'] * 50
+    progress = stats['total_points'] - current_level_points
+    needed = next_level_points - stats['total_points']
+    progress_bar = "▓" * (progress // 5) + "░" * ((50 - progress) // 5)
+
+    text = (
+        f"📊 **Statistiche di {first_name}**\n\n"
+        f"🏅 **{stats['tier']}**\n\n"
+        f"📈 **I tuoi progressi:**\n"
+        f"⭐ **Punti totali:** {stats['total_points']}\n"
+        f"✅ **Task completate:** {stats['tasks_completed']}\n"
+        f"🏅 **Livello:** {stats['level']}\n"
+        f"🔥 **Streak:** {stats['streak']} {'giorno' if stats['streak'] == 1 else 'giorni'} "
+        f"(record: {stats['best_streak']})\n\n"
+        f"📊 **Progresso livello:**\n"
+        f"{progress_bar}\n"
+        f"🎯 {progress}/50 punti • {needed} punti al livello {stats['level'] + 1}\n\n"
+        f"💡 **Media punti per task:** {stats['total_points'] // max(stats['tasks_completed'], 1)}"
+    )
+    earned = badges.labels(stats['badges'])
+    if earned:
+        text += f"\n\n🎖️ **Badge sbloccati ({len(earned)}):**\n" + " • ".join(earned)
+
+    # Add individual task completion statistics
+    if task_stats:
+        text += "\n\n🎯 **Task completate per tipo:**\n"
+        for task_stat in task_stats[:max_types]:
+            count_text = "volta" if task_stat['completion_count'] == 1 else "volte"
+            text += f"• **{task_stat['task_name']}**: completata {task_stat['completion_count']} {count_text}\n"
+        hidden = len(task_stats) - max_types
+        if hidden > 0:
+            text += f"• ...e altre {hidden} task (vedi /history)\n"
+    return text
+
+
+def history_text(rows, max_length):
+    """Completion history rows (newest first), cut at ``max_length`` characters"""
+    if not rows:
+        return (
+            "📜 **Storico Completamenti**\n\n"
+            "Nessuna task completata ancora.\n\n"
+            "💡 Completa una task per iniziare lo storico della famiglia!"
+        )
+
+    parts = ["📜 **Storico Completamenti**\n\n"]
+    length = len(parts[0])
+    for row in rows:
+        name = row['task_name'] if len(row['task_name']) <= 40 else row['task_name'][:39] + "…"
+        when = f"{row['completed_date']:%d/%m %H:%M}" if row['completed_date'] else "—"
+        line = f"• {when} **{name}** → {row['first_name'] or 'Membro'} (+{row['points_earned']} pt)\n"
+        parts.append(line)
+        length += len(line)
+        if length >= max_length:
+            break
+    return "".join(parts)[:max_length]
+
+
+def render(func, *args):
+    """Run ``func(*args)`` and record its duration"""
+    start = time.perf_counter()
+    result = func(*args)
+    metrics.REPORT_RENDER_LATENCY.observe(time.perf_counter() - start, report=func.__name__)
+    return result
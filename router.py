@@ -0,0 +1,119 @@
+"""
+Table-driven callback router.
+
+Handlers are registered per action name (see callbacks.ACTIONS) and a tap is
+dispatched with one dict lookup, whatever the number of actions or their
+order of registration. Each route is wrapped once, at registration, by its
+middleware chain: the route's own middleware (e.g. ``rate_limited``) runs
+first, then the router-wide middleware (e.g. ``answer_first``,
+``catch_errors``), then the handler.
+
+A middleware is ``middleware(call, route) -> call``, where ``call`` is an
+``async (query, *args)`` callable.
+"""
+
+import logging
+import functools
+from collections import namedtuple
+
+from telegram.error import TelegramError
+
+from ratelimit import BucketMap
+from utils import edit_message
+
+logger = logging.getLogger(__name__)
+
+Route = namedtuple("Route", "action label handler")
+
+# Used for callback data that does not decode to a registered action
+FALLBACK_ACTION = "other"
+
+
+async def _ignore(query, *args):
+    pass
+
+
+class Router:
+    """Action name -> handler table with per-route middleware"""
+
+    def __init__(self, decode, middleware=(), fallback=_ignore):
+        # decode(data) -> (action, args); ValueError for unknown data
+        self._decode = decode
+        self._middleware = tuple(middleware)
+        self._routes = {}
+        self._fallback = self._wrap(Route(FALLBACK_ACTION, FALLBACK_ACTION, fallback), ())
+
+    def __contains__(self, action):
+        return action in self._routes
+
+    def __len__(self):
+        return len(self._routes)
+
+    def _wrap(self, route, middleware):
+        call = route.handler
+        for mw in reversed(tuple(middleware) + self._middleware):
+            call = mw(call, route)
+        return call
+
+    def add(self, action, handler, label=None, middleware=()):
+        """Register ``handler(query, *args)`` for ``action``"""
+        if action in self._routes:
+            raise ValueError(f"Azione già registrata: {action}")
+        route = Route(action, label or action, handler)
+        self._routes[action] = self._wrap(route, middleware)
+
+    async def dispatch(self, query, data):
+        try:
+            action, args = self._decode(data)
+            call = self._routes[action]
+        except (ValueError, KeyError) as exc:
+            logger.debug(f"Callback non instradata {data!r}: {exc}")
+            return await self._fallback(query)
+        return await call(query, *args)
+
+
+def answer_first(call, route):
+    """Acknowledge the button press before the handler runs"""
+    @functools.wraps(call)
+    async def wrapper(query, *args):
+        await query.answer()
+        return await call(query, *args)
+    return wrapper
+
+
+def catch_errors(message):
+    """Middleware factory: log a failing route and show ``message`` instead of raising"""
+    def middleware(call, route):
+        @functools.wraps(call)
+        async def wrapper(query, *args):
+            try:
+                return await call(query, *args)
+            except Exception as exc:
+                logger.exception(f"Errore nella callback {route.action}: {exc}")
+                try:
+                    await edit_message(query, message)
+                except TelegramError as edit_error:
+                    logger.warning(f"Impossibile mostrare l'errore della callback {route.action}: {edit_error}")
+        return wrapper
+    return middleware
+
+
+def rate_limited(rate, burst, notice, key=lambda query: query.from_user.id, maxsize=4096):
+    """Middleware factory: at most ``rate`` taps per second (bursts of ``burst``) per key.
+
+    Taps over the limit are answered with ``notice`` and never reach the
+    handler. Put it on the route, so it runs before ``answer_first``.
+    """
+    def middleware(call, route):
+        buckets = BucketMap(rate, burst, maxsize=maxsize)
+
+        @functools.wraps(call)
+        async def wrapper(query, *args):
+            k = key(query)
+            if not buckets.try_acquire(k):
+                logger.info(f"Callback {route.action} limitata per {k}")
+                await query.answer(notice)
+                return None
+            return await call(query, *args)
+        return wrapper
+    return middleware
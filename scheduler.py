@@ -0,0 +1,172 @@
+"""
+Recurring task scheduler.
+
+Recurrences live in the ``recurring_tasks`` table with an indexed
+``next_due`` column. At startup they are loaded once into a min-heap keyed
+by ``next_due``; a single JobQueue ``run_once`` job is armed for the heap top,
+so the bot wakes up exactly when the next recurrence is due instead of
+polling every row.
+"""
+
+import re
+import heapq
+import logging
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+# Named rules accepted by /recurring, in days
+NAMED_RULES = {
+    "giornaliera": 1, "giornaliero": 1, "ogni giorno": 1, "daily": 1,
+    "settimanale": 7, "ogni settimana": 7, "weekly": 7,
+    "quindicinale": 14, "biweekly": 14,
+}
+_CUSTOM_RULE = re.compile(r"^(?:ogni\s+)?(\d{1,3})\s*(?:d|g|giorni|days)?$")
+
+MAX_INTERVAL_DAYS = 365
+
+
+def parse_rule(text):
+    """Interval in days of a recurrence rule ("settimanale", "ogni 3 giorni", "3d")"""
+    text = " ".join(text.lower().split())
+    if text in NAMED_RULES:
+        return NAMED_RULES[text]
+    match = _CUSTOM_RULE.match(text)
+    if match and 1 <= int(match.group(1)) <= MAX_INTERVAL_DAYS:
+        return int(match.group(1))
+    raise ValueError(f"Regola di ricorrenza non valida: {text}")
+
+
+def describe_rule(interval_days):
+    if interval_days == 1:
+        return "ogni giorno"
+    if interval_days == 7:
+        return "ogni settimana"
+    return f"ogni {interval_days} giorni"
+
+
+def next_occurrence(due, interval_days, now):
+    """First occurrence after ``now``; occurrences missed while offline are skipped"""
+    step = timedelta(days=interval_days)
+    if due > now:
+        return due
+    missed = (now - due) // step + 1
+    return due + missed * step
+
+
+class RecurringScheduler:
+    """Min-heap of recurrences woken by one JobQueue job at the earliest next_due"""
+
+    def __init__(self, db, job_queue=None, bot=None, shard=None):
+        self.db = db
+        self.job_queue = job_queue
+        self.bot = bot
+        # sharding.Shard: only the recurrences of this worker's chats
+        self.shard = shard
+        self._heap = []
+        # recurrence id -> row; heap entries whose next_due no longer match are stale
+        self._recurrences = {}
+        self._job = None
+        self._job_due = None
+
+    def __len__(self):
+        return len(self._recurrences)
+
+    def load(self):
+        """Fill the heap from the database (one query)"""
+        self._heap = []
+        self._recurrences = {}
+        for rec in self.db.get_recurring_tasks(shard=self.shard):
+            self._recurrences[rec['id']] = rec
+            self._heap.append((rec['next_due'], rec['id']))
+        heapq.heapify(self._heap)
+        self._arm()
+        logger.info(f"Scheduler ricorrenze avviato con {len(self._recurrences)} task ricorrenti")
+
+    def next_due(self):
+        self._drop_stale()
+        return self._heap[0][0] if self._heap else None
+
+    def add(self, rec):
+        self._recurrences[rec['id']] = rec
+        heapq.heappush(self._heap, (rec['next_due'], rec['id']))
+        self._arm()
+
+    def remove(self, rec_id):
+        # Lazy deletion: the heap entry is skipped when it surfaces
+        self._recurrences.pop(rec_id, None)
+        self._arm()
+
+    def _drop_stale(self):
+        while self._heap:
+            due, rec_id = self._heap[0]
+            rec = self._recurrences.get(rec_id)
+            if rec is not None and rec['next_due'] == due:
+                return
+            heapq.heappop(self._heap)
+
+    def _arm(self):
+        """(Re)schedule the single wakeup job for the earliest due recurrence"""
+        if self.job_queue is None:
+            return
+        due = self.next_due()
+        if due == self._job_due:
+            return
+        if self._job is not None:
+            self._job.schedule_removal()
+            self._job = None
+        self._job_due = due
+        if due is not None:
+            delay = max((due - datetime.now()).total_seconds(), 0)
+            self._job = self.job_queue.run_once(self._wakeup, when=delay, name="recurring_tasks")
+
+    async def _wakeup(self, context):
+        self._job = None
+        self._job_due = None
+        await self.run_due()
+
+    async def run_due(self, now=None):
+        """Assign every recurrence due by ``now`` and return the fired rows"""
+        now = now or datetime.now()
+        fired = []
+        while self._heap and self._heap[0][0] <= now:
+            due, rec_id = heapq.heappop(self._heap)
+            rec = self._recurrences.get(rec_id)
+            if rec is None or rec['next_due'] != due:
+                continue
+            try:
+                self.db.assign_task(
+                    rec['chat_id'], rec['task_id'], rec['assigned_to'], rec['assigned_by'],
+                    due_date=due + timedelta(days=rec['interval_days'])
+                )
+                fired.append(rec)
+            except ValueError:
+                # Previous occurrence still open: nothing new to assign
+                logger.info(f"Ricorrenza {rec_id}: task {rec['task_id']} ancora assegnata, salto")
+            except Exception as e:
+                logger.error(f"Errore nell'assegnazione della ricorrenza {rec_id}: {e}")
+
+            rec['next_due'] = next_occurrence(due, rec['interval_days'], now)
+            self.db.advance_recurring_task(rec_id, rec['next_due'])
+            heapq.heappush(self._heap, (rec['next_due'], rec_id))
+
+        if fired and self.bot is not None:
+            await self._notify(fired)
+        self._arm()
+        return fired
+
+    async def _notify(self, fired):
+        from telegram.helpers import escape_markdown
+        from utils import send_and_track_message
+        by_chat = {}
+        for rec in fired:
+            by_chat.setdefault(rec['chat_id'], []).append(rec)
+        for chat_id, recs in by_chat.items():
+            lines = []
+            for rec in recs:
+                task = self.db.get_task_by_id(rec['task_id'])
+                name = escape_markdown(task['name'] if task else rec['task_id'])
+                who = escape_markdown(rec.get('first_name') or str(rec['assigned_to']))
+                lines.append(f"• **{name}** → {who}")
+            text = "🔁 **Task ricorrenti assegnate**\n\n" + "\n".join(lines)
+            await send_and_track_message(self.bot.send_message, chat_id=chat_id, text=text, parse_mode="Markdown")
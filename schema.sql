@@ -2,7 +2,8 @@
 
 CREATE TABLE IF NOT EXISTS families (
     chat_id BIGINT PRIMARY KEY,
-    created_at TIMESTAMP DEFAULT NOW()
+    created_at TIMESTAMP DEFAULT NOW(),
+    timezone TEXT
 );
 
 CREATE TABLE IF NOT EXISTS family_members (
@@ -31,6 +32,7 @@ CREATE TABLE IF NOT EXISTS assigned_tasks (
     assigned_date TIMESTAMP,
     status TEXT,
     due_date TIMESTAMP,
+    reminder_stage SMALLINT DEFAULT 0,
     UNIQUE(chat_id, task_id, assigned_to)
 );
 
@@ -45,6 +47,11 @@ CREATE TABLE IF NOT EXISTS completed_tasks (
     points_earned INTEGER
 );
 
+-- Per-family history lookups (stats, exports) filter on both columns
+CREATE INDEX IF NOT EXISTS idx_completed_tasks_chat_user ON completed_tasks (chat_id, assigned_to);
+-- Keyset pagination of /history: (completed_date, id) cursor within a family
+CREATE INDEX IF NOT EXISTS idx_completed_tasks_history ON completed_tasks (chat_id, completed_date DESC, id DESC);
+
 CREATE TABLE IF NOT EXISTS user_stats (
     user_id BIGINT PRIMARY KEY,
     total_points INTEGER DEFAULT 0,
@@ -57,8 +64,134 @@ CREATE TABLE IF NOT EXISTS user_stats (
 
 CREATE TABLE IF NOT EXISTS badges (
     id SERIAL PRIMARY KEY,
+    chat_id BIGINT,
     user_id BIGINT,
     name TEXT,
-    earned_date TIMESTAMP DEFAULT NOW(),
-    UNIQUE(user_id, name)
+    earned_date TIMESTAMP DEFAULT NOW()
+);
+
+
+-- Daily totals per (chat, user), updated on every completion.
+-- Weekly/monthly/all-time leaderboards are summed from here.
+CREATE TABLE IF NOT EXISTS completion_daily_rollups (
+    chat_id BIGINT,
+    day DATE,
+    user_id BIGINT,
+    points INTEGER DEFAULT 0,
+    tasks_completed INTEGER DEFAULT 0,
+    PRIMARY KEY (chat_id, day, user_id)
+);
+
+-- Running totals per (chat, user), updated on every completion.
+-- Stats and the all-time leaderboard are point lookups on this table, so a
+-- user in several families sees separate numbers in each of them.
+CREATE TABLE IF NOT EXISTS chat_user_stats (
+    chat_id BIGINT,
+    user_id BIGINT,
+    total_points INTEGER DEFAULT 0,
+    tasks_completed INTEGER DEFAULT 0,
+    last_completed_at TIMESTAMP,
+    PRIMARY KEY (chat_id, user_id)
+);
+
+-- One-off backfill from existing history
+INSERT INTO chat_user_stats (chat_id, user_id, total_points, tasks_completed, last_completed_at)
+SELECT chat_id, assigned_to, SUM(points_earned), COUNT(*), MAX(completed_date)
+FROM completed_tasks
+GROUP BY chat_id, assigned_to
+ON CONFLICT (chat_id, user_id) DO NOTHING;
+
+-- Streaks, advanced incrementally by complete_task in the family's timezone
+-- (families.timezone, default Europe/Rome)
+ALTER TABLE families ADD COLUMN IF NOT EXISTS timezone TEXT;
+ALTER TABLE chat_user_stats ADD COLUMN IF NOT EXISTS current_streak INTEGER DEFAULT 0;
+ALTER TABLE chat_user_stats ADD COLUMN IF NOT EXISTS best_streak INTEGER DEFAULT 0;
+ALTER TABLE chat_user_stats ADD COLUMN IF NOT EXISTS last_task_day DATE;
+UPDATE chat_user_stats
+SET last_task_day = last_completed_at::date, current_streak = 1, best_streak = GREATEST(best_streak, 1)
+WHERE last_task_day IS NULL AND last_completed_at IS NOT NULL;
+
+-- One-off backfill of the daily rollups from existing history, keyed by the
+-- family's local day like complete_task (completed_date is stored in UTC).
+-- Runs only while the table is empty: on a re-run, live rows would otherwise
+-- get a second copy under a different day.
+INSERT INTO completion_daily_rollups (chat_id, day, user_id, points, tasks_completed)
+SELECT ct.chat_id, (ct.completed_date AT TIME ZONE 'UTC' AT TIME ZONE COALESCE(f.timezone, 'Europe/Rome'))::date,
+       ct.assigned_to, SUM(ct.points_earned), COUNT(*)
+FROM completed_tasks ct
+LEFT JOIN families f ON f.chat_id = ct.chat_id
+WHERE NOT EXISTS (SELECT 1 FROM completion_daily_rollups)
+GROUP BY 1, 2, 3
+ON CONFLICT (chat_id, day, user_id) DO NOTHING;
+
+-- Badges are earned per family (keys from badges.RULES)
+ALTER TABLE badges ADD COLUMN IF NOT EXISTS chat_id BIGINT;
+ALTER TABLE badges DROP CONSTRAINT IF EXISTS badges_user_id_name_key;
+CREATE UNIQUE INDEX IF NOT EXISTS idx_badges_chat_user_name ON badges (chat_id, user_id, name);
+
+-- Backfill of the counter badges for existing members (mirrors badges.RULES)
+INSERT INTO badges (chat_id, user_id, name)
+SELECT s.chat_id, s.user_id, r.name
+FROM chat_user_stats s
+JOIN (VALUES
+    ('first_task', 'tasks_completed', 1),
+    ('task_runner', 'tasks_completed', 5),
+    ('task_warrior', 'tasks_completed', 10),
+    ('task_expert', 'tasks_completed', 25),
+    ('task_master', 'tasks_completed', 50),
+    ('centurion', 'total_points', 100),
+    ('points_500', 'total_points', 500)
+) AS r(name, metric, threshold)
+    ON (CASE r.metric WHEN 'tasks_completed' THEN s.tasks_completed ELSE s.total_points END) >= r.threshold
+ON CONFLICT (chat_id, user_id, name) DO NOTHING;
+
+-- Recurring assignments. The scheduler keeps a heap ordered by next_due and
+-- only needs this index to load it; due_date of the assignments it creates is
+-- the next occurrence.
+CREATE TABLE IF NOT EXISTS recurring_tasks (
+    id SERIAL PRIMARY KEY,
+    chat_id BIGINT REFERENCES families(chat_id) ON DELETE CASCADE,
+    task_id TEXT REFERENCES tasks(id) ON DELETE CASCADE,
+    assigned_to BIGINT,
+    assigned_by BIGINT,
+    interval_days INTEGER NOT NULL CHECK (interval_days > 0),
+    next_due TIMESTAMP NOT NULL,
+    created_at TIMESTAMP DEFAULT NOW()
+);
+CREATE INDEX IF NOT EXISTS idx_recurring_tasks_next_due ON recurring_tasks (next_due);
+CREATE INDEX IF NOT EXISTS idx_recurring_tasks_chat ON recurring_tasks (chat_id);
+
+-- Due-date reminders: 0 = nothing sent, 1 = reminder sent, 2 = overdue notice sent.
+-- The notifier's range scan only touches open assignments still owing a message.
+ALTER TABLE assigned_tasks ADD COLUMN IF NOT EXISTS reminder_stage SMALLINT DEFAULT 0;
+CREATE INDEX IF NOT EXISTS idx_assigned_tasks_due ON assigned_tasks (due_date)
+    WHERE status = 'assigned' AND reminder_stage < 2;
+
+-- Compact numeric task ids for callback_data (callbacks.py): existing rows are
+-- numbered by the SERIAL default, new tasks get the next value
+ALTER TABLE tasks ADD COLUMN IF NOT EXISTS short_id SERIAL;
+CREATE UNIQUE INDEX IF NOT EXISTS idx_tasks_short_id ON tasks (short_id);
+
+-- Per-family custom tasks: NULL = global catalog, otherwise the owning chat.
+-- Ids are c<chat_id>_<slug> ("n" for negative chat ids), see db.custom_task_prefix
+ALTER TABLE tasks ADD COLUMN IF NOT EXISTS chat_id BIGINT REFERENCES families(chat_id) ON DELETE CASCADE;
+CREATE INDEX IF NOT EXISTS idx_tasks_chat ON tasks (chat_id) WHERE chat_id IS NOT NULL;
+
+-- Version of the global catalog, bumped by every import (db.import_tasks).
+-- Each process compares it with the catalog it has in memory and reloads
+-- when it changed (db.refresh_catalog), so sharded workers stay in sync.
+CREATE TABLE IF NOT EXISTS catalog_state (
+    id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+    version BIGINT NOT NULL DEFAULT 0
+);
+INSERT INTO catalog_state (id, version) VALUES (TRUE, 0) ON CONFLICT DO NOTHING;
+
+-- Bot messages waiting for the cleanup job. Sharded workers (sharding.py)
+-- track here instead of in process memory, so nothing is lost on restart and
+-- each worker deletes the messages of its own chats.
+CREATE TABLE IF NOT EXISTS tracked_messages (
+    chat_id BIGINT,
+    message_id BIGINT,
+    sent_at TIMESTAMP DEFAULT NOW(),
+    PRIMARY KEY (chat_id, message_id)
 );
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Chat-sharded deployment: one dispatcher, N worker processes.
+
+The dispatcher is the only process talking to getUpdates. It routes every
+raw update to the worker owning its chat (``abs(chat_id) % N``), so all the
+traffic of a family is handled, in order, by one process. Workers run the
+usual handlers and background jobs restricted to their shard; state shared
+between processes lives in PostgreSQL (assignments, recurrences and, in
+sharded mode, the messages tracked for cleanup). Each worker caches the
+task catalog in memory and reloads it when ``catalog_state.version`` moves,
+so an import handled by one worker reaches the others within
+CATALOG_REFRESH_INTERVAL seconds.
+
+    TELEGRAM_TOKEN=... DATABASE_URL=... python sharding.py --workers 4
+
+Without a token the workers talk to fake_telegram.FakeBotAPI, which makes
+the whole pipeline runnable offline:
+
+    python sharding.py --workers 4 --local-updates 20000
+"""
+
+import os
+import sys
+import time
+import asyncio
+import logging
+import argparse
+import multiprocessing
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+# Messaggi da cancellare scritti su tracked_messages a blocchi, non uno per invio
+TRACKED_FLUSH_INTERVAL = 60
+
+# Chiavi degli update che portano una chat, nell'ordine in cui cercarla
+_CHAT_KEYS = ("message", "edited_message", "channel_post", "edited_channel_post", "my_chat_member", "chat_member",
+              "chat_join_request")
+
+
+def shard_for(chat_id, shards):
+    """Index of the shard owning ``chat_id``"""
+    return abs(chat_id) % shards
+
+
+class Shard(namedtuple("Shard", "index count")):
+    """One worker's slice of the chats"""
+
+    __slots__ = ()
+
+    def owns(self, chat_id):
+        return shard_for(chat_id, self.count) == self.index
+
+
+def update_chat_id(data):
+    """Chat id of a raw update dict, or None (e.g. inline queries)"""
+    for key in _CHAT_KEYS:
+        if key in data:
+            return data[key].get("chat", {}).get("id")
+    query = data.get("callback_query")
+    if query:
+        message = query.get("message")
+        if message:
+            return message["chat"]["id"]
+        # Senza messaggio (inline) l'unico riferimento stabile è l'utente
+        return query["from"]["id"]
+    return None
+
+
+class Dispatcher:
+    """Routes raw updates to one queue per shard"""
+
+    def __init__(self, queues):
+        self.queues = list(queues)
+        self.routed = [0] * len(self.queues)
+        self.offset = None
+
+    def route(self, data):
+        chat_id = update_chat_id(data)
+        # Update senza chat: sempre allo shard 0, così l'ordine resta stabile
+        index = 0 if chat_id is None else shard_for(chat_id, len(self.queues))
+        self.queues[index].put(data)
+        self.routed[index] += 1
+        return index
+
+    async def poll(self, bot, timeout=30):
+        """Fetch one batch from getUpdates and route it; returns the number of updates"""
+        updates = await bot.get_updates(offset=self.offset, timeout=timeout)
+        for update in updates:
+            self.route(update.to_dict())
+            self.offset = update.update_id + 1
+        return len(updates)
+
+    def close(self):
+        """Tell every worker to stop once its queue is drained"""
+        for queue in self.queues:
+            queue.put(None)
+
+
+async def _serve(shard, queue, token, results):
+    # Import qui: il processo worker (spawn) parte da un interprete pulito
+    from telegram import Update
+    from telegram.ext import Application
+    from bot_handlers import FamilyTaskBot
+    from main import register_handlers, start_background_jobs
+    from ratelimit import UpdateThrottle
+    from utils import use_message_store, flush_tracked_messages
+
+    family_bot = FamilyTaskBot()
+    db = family_bot.get_db()
+    api = None
+    if token:
+        application = Application.builder().token(token).updater(None).build()
+        register_handlers(application, family_bot, throttle=UpdateThrottle(ignore=family_bot.is_group_chatter))
+    else:
+        from fake_telegram import FakeBotAPI, build_application
+        application, api = build_application(family_bot, FakeBotAPI(record=False))
+    if not db.fallback_mode:
+        use_message_store(db, shard)
+
+    chats = set()
+    processed = 0
+    loop = asyncio.get_running_loop()
+    async with application:
+        if token:
+            start_background_jobs(application, family_bot, shard)
+            if not db.fallback_mode:
+                application.job_queue.run_repeating(flush_tracked_messages, interval=TRACKED_FLUSH_INTERVAL,
+                                                    first=TRACKED_FLUSH_INTERVAL, name="tracked_messages_flush")
+            await application.start()
+        logger.info(f"Worker {shard.index}/{shard.count} pronto")
+        if results is not None:
+            results.put({"shard": shard.index, "ready": True})
+        while True:
+            data = await loop.run_in_executor(None, queue.get)
+            if data is None:
+                break
+            update = Update.de_json(data, application.bot)
+            if update.effective_chat:
+                chats.add(update.effective_chat.id)
+            await application.process_update(update)
+            processed += 1
+        if token:
+            await application.stop()
+    # Gli id ancora in memoria sopravvivono al riavvio del worker
+    db.flush_tracked_messages()
+
+    if results is not None:
+        results.put({
+            "shard": shard.index,
+            "processed": processed,
+            "chats": sorted(chats),
+            "api_calls": sum(api.calls.values()) if api else None,
+        })
+
+
+def run_worker(shard, queue, token=None, results=None, quiet=False):
+    """Process entry point: handle the updates of ``shard`` until a None sentinel"""
+    from utils import setup_enhanced_logging
+    setup_enhanced_logging()
+    if quiet:
+        logging.disable(logging.INFO)
+    asyncio.run(_serve(shard, queue, token, results))
+
+
+def start_workers(count, token=None, results=None, quiet=False):
+    """Spawn ``count`` workers; returns (processes, queues)"""
+    ctx = multiprocessing.get_context("spawn")
+    queues = [ctx.Queue() for _ in range(count)]
+    processes = [
+        ctx.Process(target=run_worker, args=(Shard(i, count), queues[i], token, results, quiet), name=f"shard-{i}")
+        for i in range(count)
+    ]
+    for process in processes:
+        process.start()
+    return processes, queues
+
+
+def run_local(workers=2, families=20, members=4, updates=2000, seed=1):
+    """Push a benchmark workload through ``workers`` offline workers; returns a summary dict"""
+    os.environ.pop("DATABASE_URL", None)
+    from benchmark import LoadGenerator
+    from bot_handlers import FamilyTaskBot
+    from db import FamilyTaskDB
+    from fake_telegram import make_bot
+
+    bot, _ = make_bot()
+    generator = LoadGenerator(
+        bot, families, members,
+        task_ids=[t['short_id'] for t in FamilyTaskDB().get_all_tasks()],
+        categories=[cat.lower() for cat, _, _ in FamilyTaskBot.CATEGORIES],
+        seed=seed,
+    )
+    batch = [u.to_dict() for u in generator.registration_updates()]
+    batch += [generator.next_update()[1].to_dict() for _ in range(updates)]
+
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Queue()
+    processes, queues = start_workers(workers, results=results, quiet=True)
+    dispatcher = Dispatcher(queues)
+    # Il tempo di avvio dei processi non conta nel throughput
+    for _ in processes:
+        results.get()
+    started = time.perf_counter()
+    for data in batch:
+        dispatcher.route(data)
+    dispatcher.close()
+    reports = sorted((results.get() for _ in processes), key=lambda r: r["shard"])
+    elapsed = time.perf_counter() - started
+    for process in processes:
+        process.join()
+    return {
+        "workers": workers,
+        "updates": len(batch),
+        "elapsed": elapsed,
+        "routed": dispatcher.routed,
+        "shards": reports,
+    }
+
+
+async def _dispatch_forever(token, dispatcher):
+    from telegram import Bot
+    async with Bot(token) as bot:
+        while True:
+            try:
+                await dispatcher.poll(bot)
+            except Exception as e:
+                logger.error(f"Errore in getUpdates: {e}")
+                await asyncio.sleep(5)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="FamilyTaskBot su più processi, partizionato per chat")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--local-updates", type=int,
+                        help="Esegue offline (Bot API simulata) questo numero di update e stampa il throughput")
+    parser.add_argument("--families", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    if args.local_updates is not None:
+        logging.disable(logging.INFO)
+        result = run_local(args.workers, families=args.families, updates=args.local_updates)
+        rate = result["updates"] / result["elapsed"] if result["elapsed"] else 0.0
+        print(f"{result['updates']} update su {result['workers']} worker in {result['elapsed']:.2f}s "
+              f"({rate:.0f} update/s)")
+        for report in result["shards"]:
+            print(f"  shard {report['shard']}: {report['processed']} update, {len(report['chats'])} chat")
+        return 0
+
+    token = os.environ.get("TELEGRAM_TOKEN")
+    if not token:
+        print("❌ TELEGRAM_TOKEN non impostato (usa --local-updates per una prova offline)")
+        return 1
+    if not os.environ.get("DATABASE_URL"):
+        # In modalità demo ogni worker avrebbe dati propri: va bene, ma va detto
+        logger.warning("DATABASE_URL non configurato: ogni worker userà dati in memoria separati")
+
+    processes, queues = start_workers(args.workers, token=token)
+    dispatcher = Dispatcher(queues)
+    logger.info(f"Dispatcher avviato con {args.workers} worker")
+    try:
+        asyncio.run(_dispatch_forever(token, dispatcher))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        dispatcher.close()
+        for process in processes:
+            process.join()
+    return 0
+
+
+if __name__ == "__main__":
+    from utils import setup_enhanced_logging
+    setup_enhanced_logging()
+    sys.exit(main())
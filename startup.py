@@ -0,0 +1,72 @@
+"""
+Cold-start timing and catalog warm-up for main.py.
+
+The catalog load (one connection, default tasks seeded in one statement,
+one SELECT) is network-bound, so ``warm_up`` runs it in a background thread
+while main.py imports the Telegram stack, builds the Application and waits
+for getMe. post_init awaits the returned future before polling starts, so no
+update is ever handled against an empty catalog.
+
+``StartupTimer`` records the phases and logs a single report once the bot
+is ready; the same numbers are exported as ``familybot_startup_seconds``.
+"""
+
+import time
+import logging
+import threading
+from concurrent.futures import Future
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class StartupTimer:
+    """Sequential phases (``mark``) plus phases that ran alongside them (``record``)"""
+
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self.started = self._last = clock()
+        # (phase, seconds, parallel)
+        self.phases = []
+
+    def mark(self, phase):
+        """Close ``phase``: the time since the previous mark (or the start)"""
+        now = self.clock()
+        self.phases.append((phase, now - self._last, False))
+        self._last = now
+
+    def record(self, phase, seconds):
+        """Add a phase that overlapped the sequential ones"""
+        self.phases.append((phase, seconds, True))
+
+    def total(self):
+        return self._last - self.started
+
+    def report(self):
+        """One-line summary; also sets the startup gauge for every phase"""
+        parts = []
+        for phase, seconds, parallel in self.phases:
+            metrics.STARTUP_SECONDS.set(seconds, phase=phase)
+            parts.append(f"{phase} {seconds:.2f}s" + (" (in parallelo)" if parallel else ""))
+        metrics.STARTUP_SECONDS.set(self.total(), phase="total")
+        return f"Avvio completato in {self.total():.2f}s: " + ", ".join(parts)
+
+
+def warm_up(db, timer=None, phase="catalog"):
+    """Load ``db``'s catalog in a daemon thread; returns a Future resolved when done"""
+    future = Future()
+
+    def run():
+        started = time.perf_counter()
+        try:
+            db.load_catalog()
+        except BaseException as e:
+            future.set_exception(e)
+            return
+        if timer is not None:
+            timer.record(phase, time.perf_counter() - started)
+        future.set_result(db)
+
+    threading.Thread(target=run, name="catalog-warmup", daemon=True).start()
+    return future
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Test per il motore dei badge (valutazione incrementale sul completamento)
+"""
+
+import os
+import asyncio
+import unittest
+from unittest.mock import patch
+
+import badges
+
+
+class TestBadgeRules(unittest.TestCase):
+
+    def test_only_crossed_thresholds_fire(self):
+        before = {'tasks_completed': 4, 'total_points': 95, 'current_streak': 2}
+        after = {'tasks_completed': 5, 'total_points': 103, 'current_streak': 3}
+        keys = [rule.key for rule in badges.evaluate(before, after)]
+        self.assertEqual(sorted(keys), ["centurion", "streak_3", "task_runner"])
+
+    def test_no_delta_no_badges(self):
+        stats = {'tasks_completed': 60, 'total_points': 900, 'current_streak': 40}
+        self.assertEqual(badges.evaluate(stats, stats), [])
+
+    def test_tier_is_highest_earned(self):
+        self.assertEqual(badges.tier([]), badges.DEFAULT_TIER)
+        self.assertEqual(badges.tier(["task_expert", "first_task", "task_runner"]), "🌟 Task Expert")
+
+    def test_unknown_keys_are_skipped(self):
+        self.assertEqual(badges.labels(["retired_badge", "centurion"]), ["💯 Centurione"])
+
+
+@patch.dict(os.environ, {}, clear=True)
+class TestBadgesOnCompletion(unittest.TestCase):
+
+    def setUp(self):
+        from db import FamilyTaskDB
+        self.db = FamilyTaskDB()
+        self.db.add_family_member(-9, 4, "marco", "Marco")
+        self.tasks = self.db.get_all_tasks()
+
+    def _complete(self, task):
+        awarded = []
+        self.db.assign_task(-9, task['id'], 4, 4)
+        self.assertTrue(self.db.complete_task(-9, task['id'], 4, awarded=awarded))
+        return awarded
+
+    def test_badges_awarded_once_and_persisted(self):
+        self.assertIn("first_task", self._complete(self.tasks[0]))
+        self.assertNotIn("first_task", self._complete(self.tasks[1]))
+        for task in self.tasks[2:5]:
+            self._complete(task)
+        self.assertEqual(self.db.get_user_badges(4, -9)[:2], ["first_task", "task_runner"])
+        self.assertEqual(self.db.get_user_badges(4, -10), [])
+
+        stats = self.db.get_user_stats(4, -9)
+        self.assertEqual(stats['tier'], "🏃 Task Runner")
+        self.assertIn("task_runner", stats['badges'])
+
+    def test_start_keeps_runner_label_below_first_tier(self):
+        from bot_handlers import FamilyTaskBot
+        from fake_telegram import build_application, command_update
+
+        self._complete(self.tasks[0])
+        family_bot = FamilyTaskBot(db=self.db)
+        application, api = build_application(family_bot)
+
+        async def run():
+            await application.initialize()
+            await application.process_update(command_update(application.bot, -9, 4, "Marco", "start"))
+            await application.process_update(command_update(application.bot, -9, 4, "Marco", "stats"))
+            await application.shutdown()
+
+        asyncio.run(run())
+        start_text, stats_text = [params["text"] for _, params in api.requests[-2:]]
+        self.assertIn("🏃 Task Runner", start_text)
+        self.assertIn(badges.DEFAULT_TIER, stats_text)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""
+Test del benchmark offline: handler reali, Bot API finta, nessuna rete
+"""
+
+import asyncio
+import unittest
+
+import benchmark
+
+
+class TestBenchmark(unittest.TestCase):
+
+    def test_small_run_without_errors(self):
+        result = asyncio.run(benchmark.run_benchmark(families=2, members=3, updates=150, seed=7))
+        self.assertEqual(result["errors"], 0)
+        self.assertEqual(sum(len(v) for v in result["latencies"].values()), 150)
+        # Every update answers through the fake Bot API at least once, except group chatter
+        api_calls = dict(result["api_calls"])
+        self.assertTrue(all(calls == 0 for calls in api_calls.pop("chatter", [])))
+        self.assertTrue(all(calls >= 1 for values in api_calls.values() for calls in values))
+
+        report = benchmark.format_report(result)
+        self.assertIn("p95", report)
+        self.assertIn("DB round trip/update", report)
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(benchmark.percentile(values, 50), 50)
+        self.assertEqual(benchmark.percentile(values, 99), 99)
+        self.assertEqual(benchmark.percentile([], 95), 0.0)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
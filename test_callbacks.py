@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Test per la codifica compatta di callback_data e la compatibilità con il formato legacy
+"""
+
+import os
+import json
+import asyncio
+import unittest
+from unittest.mock import patch
+
+import callbacks
+
+
+class TestCallbackEncoding(unittest.TestCase):
+
+    def test_round_trip_and_size(self):
+        data = callbacks.encode("doassign", 9999999999, 41)
+        self.assertTrue(data.startswith(callbacks.VERSION))
+        self.assertLess(len(data.encode()), 16)
+        self.assertEqual(callbacks.decode(data), ("doassign", (9999999999, 41)))
+        self.assertEqual(callbacks.decode(callbacks.encode("category", "pulizie")), ("category", ("pulizie",)))
+        self.assertEqual(callbacks.encode("tasks_menu"), "tasks_menu")
+
+    def test_legacy_payloads(self):
+        self.assertEqual(callbacks.decode("doassign_42_pulire_frigorifero"), ("doassign", (42, "pulire_frigorifero")))
+        self.assertEqual(callbacks.decode("confirm_complete_fare_letti"), ("confirm_complete", ("fare_letti",)))
+        self.assertEqual(callbacks.decode("complete_fare_letti"), ("complete", ("fare_letti",)))
+        self.assertEqual(callbacks.decode("assign_menu"), ("assign_menu", ()))
+        self.assertEqual(callbacks.decode("hist_1700000000000000_7"), ("history", (1700000000000000, 7)))
+        self.assertEqual(callbacks.decode("hist_top"), ("history_top", ()))
+
+    def test_invalid_payloads(self):
+        for data in ("", "qualcosa", "doassign_x_bucato", "1d.zz", "1d.-1.2", "2a.1", "1?.1", "complete_"):
+            with self.assertRaises(ValueError, msg=data):
+                callbacks.decode(data)
+        with self.assertRaises(ValueError):
+            callbacks.encode("assign", "bucato")
+
+
+@patch.dict(os.environ, {}, clear=True)
+class TestCompactButtons(unittest.TestCase):
+
+    def test_assign_flow_uses_short_ids(self):
+        from bot_handlers import FamilyTaskBot
+        from fake_telegram import build_application, callback_update
+
+        family_bot = FamilyTaskBot()
+        db = family_bot.get_db()
+        chat_id, user_id = -610, 1234567890
+        db.add_family_member(chat_id, user_id, "eva", "Eva")
+        task = max(db.get_all_tasks(), key=lambda t: len(t['id']))
+        self.assertIs(db.get_task_by_short_id(task['short_id']), task)
+        application, api = build_application(family_bot)
+
+        async def press(data):
+            await application.process_update(callback_update(application.bot, chat_id, user_id, "Eva", data))
+            markup = api.requests[-1][1].get("reply_markup")
+            markup = json.loads(markup) if isinstance(markup, str) else markup
+            return [b["callback_data"] for row in markup["inline_keyboard"] for b in row] if markup else []
+
+        async def run():
+            await application.initialize()
+            targets = await press(callbacks.encode("assign", task['short_id']))
+            await press(targets[0])
+            buttons = await press("show_my_tasks")
+            await application.shutdown()
+            return targets, buttons
+
+        targets, buttons = asyncio.run(run())
+        self.assertEqual(callbacks.decode(targets[0]), ("doassign", (user_id, task['short_id'])))
+        self.assertIn(callbacks.encode("complete", task['short_id']), buttons)
+        self.assertTrue(all(len(data.encode()) <= 16 for data in targets + buttons))
+        self.assertEqual(db.get_user_assigned_tasks(chat_id, user_id)[0]['task_id'], task['id'])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Test per l'import del catalogo task da file CSV/JSON (validazione, diff e merge)
+"""
+
+import os
+import json
+import asyncio
+import unittest
+from contextlib import contextmanager
+from unittest.mock import patch
+
+import catalog_import
+
+
+CSV = (
+    "id,name,points,time_minutes\n"
+    "bucato,Fare il bucato,9,15\n"
+    "spazzatura,Portare fuori la spazzatura,5,5\n"
+    "potare_siepe,Potare la siepe,14,45\n"
+).encode("utf-8")
+
+
+class TestParseCatalog(unittest.TestCase):
+
+    def test_csv_and_json(self):
+        tasks = catalog_import.parse_catalog(CSV, "catalogo.csv")
+        self.assertEqual(tasks[2], {"id": "potare_siepe", "name": "Potare la siepe", "points": 14, "time_minutes": 45})
+        data = json.dumps([{"id": "bucato", "name": "Fare il bucato", "points": 9, "time_minutes": "15"}]).encode()
+        self.assertEqual(catalog_import.parse_catalog(data, "catalogo.JSON")[0]["time_minutes"], 15)
+
+    def test_every_bad_row_is_reported(self):
+        data = (
+            "id,name,points,time_minutes\n"
+            "Bucato!,Fare il bucato,9,15\n"
+            "bucato,Fare il *bucato*,0,15\n"
+            "bucato,Fare il bucato,9,15\n"
+            "bucato,Di nuovo,9,15\n"
+        ).encode()
+        with self.assertRaises(catalog_import.CatalogError) as ctx:
+            catalog_import.parse_catalog(data, "catalogo.csv")
+        self.assertEqual([e.split(":")[0] for e in ctx.exception.errors], ["Riga 2", "Riga 3", "Riga 5"])
+        self.assertIn("points", ctx.exception.errors[1])
+        self.assertIn("duplicato", ctx.exception.errors[2])
+
+    def test_rejected_files(self):
+        for data, name in ((b"id,name\nx,y\n", "a.csv"), (b'{"id": "x"}', "a.json"), (b"\xff\xfe", "a.csv"),
+                           (b"id,name,points,time_minutes\n", "a.csv")):
+            with self.assertRaises(catalog_import.CatalogError, msg=data):
+                catalog_import.parse_catalog(data, name)
+
+    def test_diff(self):
+        current = [{"id": "bucato", "name": "Fare il bucato", "points": 8, "time_minutes": 15, "short_id": 1},
+                   {"id": "spazzatura", "name": "Portare fuori la spazzatura", "points": 5, "time_minutes": 5, "short_id": 2},
+                   {"id": "spesa", "name": "Fare la spesa", "points": 7, "time_minutes": 20, "short_id": 3}]
+        diff = catalog_import.diff_catalog(current, catalog_import.parse_catalog(CSV, "c.csv"))
+        self.assertEqual(diff, catalog_import.CatalogDiff(["potare_siepe"], ["bucato"], ["spazzatura"], ["spesa"]))
+
+
+@patch.dict(os.environ, {"ADMIN_USER_IDS": "9"}, clear=True)
+class TestImportUpload(unittest.TestCase):
+
+    def _upload(self, user_id, caption, data=CSV, file_name="catalogo.csv"):
+        from bot_handlers import FamilyTaskBot
+        from fake_telegram import build_application, document_update
+
+        family_bot = FamilyTaskBot()
+        db = family_bot.get_db()
+        application, api = build_application(family_bot)
+        api.files["file-1"] = data
+        version = db.catalog_version
+
+        async def run():
+            await application.initialize()
+            api.reset()
+            await application.process_update(
+                document_update(application.bot, 9, user_id, "Ada", file_name, "file-1", caption=caption))
+            await application.shutdown()
+
+        asyncio.run(run())
+        return db, version, api.requests[-1][1]["text"]
+
+    def test_admin_import_merges_changed_rows(self):
+        db, version, text = self._upload(9, "/import")
+        self.assertIn("Nuove: 1", text)
+        self.assertIn("Modificate: 1", text)
+        self.assertEqual(db.get_task_by_id("bucato")["points"], 9)
+        new = db.get_task_by_id("potare_siepe")
+        self.assertIs(db.get_task_by_short_id(new["short_id"]), new)
+        self.assertEqual(new["short_id"], max(t["short_id"] for t in db.get_all_tasks()))
+        self.assertEqual(db.catalog_version, version + 1)
+
+    def test_dry_run_and_permissions(self):
+        db, version, text = self._upload(9, "/import prova")
+        self.assertIn("Anteprima", text)
+        self.assertIsNone(db.get_task_by_id("potare_siepe"))
+        self.assertEqual(db.catalog_version, version)
+        _, _, text = self._upload(10, "/import")
+        self.assertIn("riservato", text)
+
+    def test_invalid_file_changes_nothing(self):
+        db, version, text = self._upload(9, "/import", data=b"id,name,points,time_minutes\nx,Prova,999,5\n")
+        self.assertIn("File rifiutato", text)
+        self.assertEqual(db.catalog_version, version)
+
+
+class CatalogStore:
+    """catalog_state and the global tasks shared by several processes, behind a minimal cursor"""
+
+    def __init__(self, tasks):
+        self.version = 0
+        self.tasks = tasks
+        self.selects = 0
+
+    @contextmanager
+    def connection(self):
+        store = self
+
+        class Cursor:
+            def execute(self, query, params=None):
+                self.query = query
+                store.selects += 1
+
+            def fetchone(self):
+                return (store.version,)
+
+            def fetchall(self):
+                return [(t["id"], t["name"], t["points"], t["time_minutes"], t["short_id"]) for t in store.tasks]
+
+        class Connection:
+            def cursor(self):
+                return Cursor()
+
+        yield Connection()
+
+
+@patch.dict(os.environ, {"DATABASE_URL": "postgresql://worker"}, clear=True)
+class TestRefreshCatalog(unittest.TestCase):
+
+    def test_other_processes_reload_after_an_import(self):
+        from db import FamilyTaskDB
+        store = CatalogStore([{"id": "bucato", "name": "Fare il bucato", "points": 8, "time_minutes": 15, "short_id": 1}])
+        worker = FamilyTaskDB(load_catalog=False)
+        with patch.object(worker, "get_db_connection", store.connection), \
+                patch.object(worker, "_load_custom_tasks", return_value=[]):
+            self.assertTrue(worker.refresh_catalog())
+            key = worker.catalog_key(-5)
+            # Nessun cambiamento: una sola SELECT, nessun ricaricamento
+            store.selects = 0
+            self.assertFalse(worker.refresh_catalog())
+            self.assertEqual(store.selects, 1)
+
+            # Un altro worker importa una task nuova
+            store.tasks = store.tasks + [{"id": "potare_siepe", "name": "Potare la siepe", "points": 14,
+                                          "time_minutes": 45, "short_id": 2}]
+            store.version += 1
+            self.assertTrue(worker.refresh_catalog())
+            self.assertNotEqual(worker.catalog_key(-5), key)
+        self.assertEqual(worker.get_task_by_short_id(2)["id"], "potare_siepe")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Test per le statistiche separate per famiglia (chat_id, user_id)
+"""
+
+import os
+import unittest
+from unittest.mock import patch
+
+
+@patch.dict(os.environ, {}, clear=True)
+class TestChatScopedStats(unittest.TestCase):
+
+    def setUp(self):
+        from db import FamilyTaskDB
+        self.db = FamilyTaskDB()
+        self.tasks = self.db.get_all_tasks()[:3]
+        # Lo stesso utente in due famiglie diverse
+        for chat_id in (-1, -2):
+            self.db.add_family_member(chat_id, 7, "giulia", "Giulia")
+        self._complete(-1, self.tasks[0])
+        self._complete(-1, self.tasks[1])
+        self._complete(-2, self.tasks[2])
+
+    def _complete(self, chat_id, task):
+        self.db.assign_task(chat_id, task['id'], 7, 7)
+        self.assertTrue(self.db.complete_task(chat_id, task['id'], 7))
+
+    def test_stats_are_per_family(self):
+        first = self.db.get_user_stats(7, -1)
+        second = self.db.get_user_stats(7, -2)
+        self.assertEqual(first['tasks_completed'], 2)
+        self.assertEqual(first['total_points'], self.tasks[0]['points'] + self.tasks[1]['points'])
+        self.assertEqual(second['tasks_completed'], 1)
+        self.assertEqual(second['total_points'], self.tasks[2]['points'])
+
+    def test_global_stats_still_available(self):
+        stats = self.db.get_user_stats(7)
+        self.assertEqual(stats['tasks_completed'], 3)
+        self.assertEqual(stats['total_points'], sum(t['points'] for t in self.tasks))
+
+    def test_unknown_family_is_empty(self):
+        stats = self.db.get_user_stats(7, -3)
+        self.assertEqual(stats['tasks_completed'], 0)
+        self.assertEqual(stats['level'], 1)
+
+    def test_leaderboards_do_not_merge_families(self):
+        board = self.db.get_leaderboard(-2)
+        self.assertEqual(board[0]['total_points'], self.tasks[2]['points'])
+
+    def test_task_completion_stats_per_family(self):
+        names = {row['task_name'] for row in self.db.get_user_task_completion_stats(7, -2)}
+        self.assertEqual(names, {self.tasks[2]['name']})
+        self.assertEqual(len(self.db.get_user_task_completion_stats(7)), 3)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
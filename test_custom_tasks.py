@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Test per le task personalizzate per famiglia e la cache del catalogo per chat
+"""
+
+import os
+import json
+import asyncio
+import unittest
+from unittest.mock import patch
+
+import callbacks
+from db import custom_task_chat, custom_task_prefix
+
+
+class TestCustomTaskIds(unittest.TestCase):
+
+    def test_prefix_round_trip(self):
+        self.assertEqual(custom_task_prefix(-1001234), "cn1001234_")
+        self.assertEqual(custom_task_chat("cn1001234_portare_fido"), -1001234)
+        self.assertEqual(custom_task_chat("c42_annaffiare_orto"), 42)
+        for task_id in ("cucina_pulizia", "cena", "cambiare_filtri", None):
+            self.assertIsNone(custom_task_chat(task_id))
+
+
+@patch.dict(os.environ, {}, clear=True)
+class TestChatCatalog(unittest.TestCase):
+
+    def setUp(self):
+        from bot_handlers import FamilyTaskBot
+        self.bot = FamilyTaskBot()
+        self.db = self.bot.get_db()
+        self.chat_id, self.other = -800, -801
+        self.globals = len(self.db.get_all_tasks())
+
+    def test_custom_tasks_are_scoped_to_their_family(self):
+        task = self.db.add_custom_task(self.chat_id, "Portare a spasso Fido", 6, 15)
+        self.assertEqual(task['id'], "cn800_portare_a_spasso_fido")
+        self.assertEqual(len(self.db.get_all_tasks(self.chat_id)), self.globals + 1)
+        self.assertEqual(len(self.db.get_all_tasks(self.other)), self.globals)
+        self.assertEqual(len(self.db.get_all_tasks()), self.globals)
+
+        self.assertEqual(self.db.get_task_by_id(task['id'])['name'], "Portare a spasso Fido")
+        self.assertIsNone(self.db.get_task_by_id(task['id'], self.other))
+        self.assertEqual(self.db.get_task_by_short_id(task['short_id'], self.chat_id)['id'], task['id'])
+        self.assertIsNone(self.db.get_task_by_short_id(task['short_id'], self.other))
+        self.assertEqual(self.db.task_short_id(task['id']), task['short_id'])
+        with self.assertRaises(ValueError):
+            self.db.add_custom_task(self.chat_id, "portare a spasso fido", 3, 5)
+
+    def test_catalog_key_is_shared_until_a_family_customizes(self):
+        self.assertEqual(self.db.catalog_key(self.chat_id), self.db.catalog_key(self.other))
+        shared = self.bot._categorized_catalog(self.other)
+        self.db.add_custom_task(self.chat_id, "Annaffiare l'orto", 4, 10)
+        self.assertNotEqual(self.db.catalog_key(self.chat_id), self.db.catalog_key(self.other))
+        # The other family's cached pages survive the edit
+        self.assertIs(self.bot._categorized_catalog(self.other), shared)
+        names = [t['name'] for tasks in self.bot._categorized_catalog(self.chat_id).values() for t in tasks]
+        self.assertIn("Annaffiare l'orto", names)
+
+    def test_delete_cascades_to_assignments(self):
+        task = self.db.add_custom_task(self.chat_id, "Lavare la cuccia", 5, 20)
+        self.db.add_family_member(self.chat_id, 1, "ada", "Ada")
+        self.db.assign_task(self.chat_id, task['id'], 1, 1)
+        self.assertEqual([a['task_id'] for a in self.db.get_user_assigned_tasks(self.chat_id, 1)], [task['id']])
+        self.assertFalse(self.db.delete_custom_task(self.other, task['id']))
+        self.assertTrue(self.db.delete_custom_task(self.chat_id, task['id']))
+        self.assertEqual(self.db.get_user_assigned_tasks(self.chat_id, 1), [])
+        self.assertIsNone(self.db.get_task_by_id(task['id']))
+        self.assertEqual(len(self.db.get_all_tasks(self.chat_id)), self.globals)
+
+    def test_short_ids_stay_unique_after_import(self):
+        custom = self.db.add_custom_task(self.chat_id, "Pulire l'acquario", 7, 30)
+        self.db.import_tasks([{"id": "potare_siepe", "name": "Potare la siepe", "points": 14, "time_minutes": 45}])
+        self.assertNotEqual(self.db.get_task_by_id("potare_siepe")['short_id'], custom['short_id'])
+        self.assertEqual(self.db.get_task_by_short_id(custom['short_id'], self.chat_id)['id'], custom['id'])
+
+
+@patch.dict(os.environ, {}, clear=True)
+class TestCustomTaskCommand(unittest.TestCase):
+
+    def test_create_list_and_delete(self):
+        from bot_handlers import FamilyTaskBot
+        from fake_telegram import build_application, command_update, callback_update
+
+        family_bot = FamilyTaskBot()
+        application, api = build_application(family_bot)
+
+        async def run():
+            await application.initialize()
+            await application.process_update(command_update(application.bot, -810, 3, "Ada", "customtask", "6", "15", "Portare", "a", "spasso", "Fido"))
+            await application.process_update(command_update(application.bot, -810, 3, "Ada", "customtask", "999", "15", "Troppi", "punti"))
+            await application.process_update(command_update(application.bot, -810, 3, "Ada", "customtask"))
+            markup = api.requests[-1][1]["reply_markup"]
+            markup = json.loads(markup) if isinstance(markup, str) else markup
+            data = markup["inline_keyboard"][0][0]["callback_data"]
+            await application.process_update(callback_update(application.bot, -810, 3, "Ada", data))
+            await application.shutdown()
+            return data
+
+        data = asyncio.run(run())
+        texts = [params.get("text", "") for _, params in api.requests]
+        self.assertTrue(any("aggiunta alle task della famiglia" in t for t in texts))
+        self.assertTrue(any("Task non valida" in t for t in texts))
+        self.assertEqual(callbacks.decode(data)[0], "customdel")
+        self.assertIn("eliminata", texts[-1])
+        self.assertEqual(family_bot.get_db().get_custom_tasks(-810), [])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Test per il salto delle modifiche identiche ai messaggi (nessuna chiamata API superflua)
+"""
+
+import os
+import asyncio
+import unittest
+from unittest.mock import patch
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import BadRequest
+
+import metrics
+import utils
+
+
+class FakeMessage:
+    def __init__(self, chat_id, message_id):
+        self.chat = type("Chat", (), {"id": chat_id})()
+        self.message_id = message_id
+
+
+class FakeQuery:
+    def __init__(self, chat_id=1, message_id=1, error=None):
+        self.message = FakeMessage(chat_id, message_id)
+        self.edits = []
+        self.error = error
+
+    async def edit_message_text(self, text, **kwargs):
+        if self.error:
+            raise self.error
+        self.edits.append(text)
+        return True
+
+
+class TestEditMessage(unittest.TestCase):
+
+    def setUp(self):
+        utils._last_rendered.clear()
+
+    def test_identical_edit_skipped(self):
+        markup = InlineKeyboardMarkup([[InlineKeyboardButton("A", callback_data="a")]])
+        query = FakeQuery()
+        asyncio.run(utils.edit_message(query, "ciao", reply_markup=markup))
+        asyncio.run(utils.edit_message(query, "ciao", reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("A", callback_data="a")]])))
+        self.assertEqual(query.edits, ["ciao"])
+
+        asyncio.run(utils.edit_message(query, "ciao", reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("B", callback_data="b")]])))
+        self.assertEqual(len(query.edits), 2)
+
+    def test_hash_is_per_message(self):
+        first, second = FakeQuery(message_id=1), FakeQuery(message_id=2)
+        asyncio.run(utils.edit_message(first, "uguale"))
+        asyncio.run(utils.edit_message(second, "uguale"))
+        self.assertEqual((len(first.edits), len(second.edits)), (1, 1))
+
+    def test_not_modified_error_swallowed(self):
+        before = metrics.MESSAGE_EDITS.value(result="not_modified")
+        query = FakeQuery(error=BadRequest("Message is not modified: specified new message content is the same"))
+        self.assertIsNone(asyncio.run(utils.edit_message(query, "testo")))
+        self.assertEqual(metrics.MESSAGE_EDITS.value(result="not_modified"), before + 1)
+
+        with self.assertRaises(BadRequest):
+            asyncio.run(utils.edit_message(FakeQuery(message_id=9, error=BadRequest("Message to edit not found")), "x"))
+
+
+@patch.dict(os.environ, {}, clear=True)
+class TestRepeatedTaps(unittest.TestCase):
+
+    def test_reopening_category_costs_one_edit(self):
+        from bot_handlers import FamilyTaskBot
+        from fake_telegram import build_application, callback_update
+        utils._last_rendered.clear()
+        application, api = build_application(FamilyTaskBot())
+
+        async def run():
+            await application.initialize()
+            for _ in range(3):
+                await application.process_update(
+                    callback_update(application.bot, -7, 1, "Lia", "cat_cucina", message_id=555))
+            await application.shutdown()
+
+        asyncio.run(run())
+        self.assertEqual(api.calls["editMessageText"], 1)
+        self.assertEqual(api.calls["answerCallbackQuery"], 3)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Test per /export: file gzip CSV/JSONL scritto in streaming e inviato come documento
+"""
+
+import os
+import csv
+import gzip
+import json
+import asyncio
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+import export
+
+
+class StreamingDB:
+    """Yields ``count`` completions lazily, like the server-side cursor"""
+
+    def __init__(self, count):
+        self.count = count
+        self.consumed = 0
+
+    def iter_chat_export(self, chat_id):
+        yield "member", {'user_id': 1, 'username': "ada", 'first_name': "Ada", 'joined_date': datetime(2024, 1, 1)}
+        start = datetime(2024, 1, 1, 8, 0)
+        for i in range(self.count):
+            self.consumed += 1
+            yield "completion", {
+                'id': i, 'task_id': "bucato", 'task_name': "Fare il bucato", 'assigned_to': 1, 'assigned_by': 1,
+                'assigned_date': start, 'completed_date': start + timedelta(hours=i), 'points_earned': 8,
+            }
+
+
+class TestWriteExport(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def test_csv(self):
+        db = StreamingDB(5000)
+        path, records = export.write_export(db, -5, "csv", directory=self.tmp.name)
+        self.assertEqual(records, 5001)
+        self.assertTrue(path.endswith(".csv.gz"))
+        with gzip.open(path, "rt", encoding="utf-8", newline="") as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual(len(rows), 5001)
+        self.assertEqual((rows[0]['type'], rows[0]['first_name'], rows[0]['task_id']), ("member", "Ada", ""))
+        self.assertEqual(rows[-1]['completed_date'], (datetime(2024, 1, 1, 8, 0) + timedelta(hours=4999)).isoformat())
+
+    def test_jsonl(self):
+        path, records = export.write_export(StreamingDB(3), -5, "jsonl", directory=self.tmp.name)
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            lines = [json.loads(line) for line in f]
+        self.assertEqual(records, 4)
+        self.assertEqual([line['type'] for line in lines], ["member", "completion", "completion", "completion"])
+        self.assertEqual(lines[1]['points_earned'], 8)
+
+    def test_failed_export_leaves_no_file(self):
+        class BrokenDB:
+            def iter_chat_export(self, chat_id):
+                yield "member", {'user_id': 1}
+                raise RuntimeError("connessione persa")
+
+        with self.assertRaises(RuntimeError):
+            export.write_export(BrokenDB(), -5, "csv", directory=self.tmp.name)
+        self.assertEqual(os.listdir(self.tmp.name), [])
+        with self.assertRaises(ValueError):
+            export.write_export(StreamingDB(1), -5, "xml", directory=self.tmp.name)
+
+
+@patch.dict(os.environ, {}, clear=True)
+class TestExportCommand(unittest.TestCase):
+
+    def test_export_is_sent_as_document(self):
+        from bot_handlers import FamilyTaskBot
+        from fake_telegram import build_application, command_update
+
+        family_bot = FamilyTaskBot()
+        db = family_bot.get_db()
+        db.add_family_member(-40, 9, "ada", "Ada")
+        task = db.get_all_tasks()[0]
+        db.assign_task(-40, task['id'], 9, 9)
+        db.complete_task(-40, task['id'], 9)
+        db.add_family_member(-41, 10, "bea", "Bea")
+        application, api = build_application(family_bot)
+        written = []
+        write_export = export.write_export
+
+        def spy(*args, **kwargs):
+            path, records = write_export(*args, **kwargs)
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                written.append([json.loads(line) for line in f])
+            return path, records
+
+        async def run():
+            await application.initialize()
+            api.reset()
+            with patch.object(export, "write_export", spy):
+                await application.process_update(command_update(application.bot, -40, 9, "Ada", "export", "json"))
+            await application.process_update(command_update(application.bot, -40, 9, "Ada", "export", "xml"))
+            await application.shutdown()
+
+        asyncio.run(run())
+        self.assertEqual([method for method, _ in api.requests], ["sendDocument", "sendMessage"])
+        self.assertIn("Formato non valido", api.requests[1][1]["text"])
+        self.assertEqual([r['type'] for r in written[0]], ["member", "completion"])
+        self.assertEqual(written[0][1]['task_id'], task['id'])
+        self.assertFalse(family_bot._exports)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
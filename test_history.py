@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Test per lo storico completamenti con paginazione keyset
+"""
+
+import os
+import json
+import asyncio
+import unittest
+from unittest.mock import patch
+
+
+@patch.dict(os.environ, {}, clear=True)
+class TestCompletionHistory(unittest.TestCase):
+
+    def setUp(self):
+        from db import FamilyTaskDB
+        from bot_handlers import FamilyTaskBot
+        self.db = FamilyTaskDB()
+        self.bot = FamilyTaskBot()
+        self.bot.db = self.db
+        self.chat_id = -42
+        self.db.add_family_member(self.chat_id, 8, "ugo", "Ugo")
+        self.tasks = self.db.get_all_tasks()[:25]
+        for task in self.tasks:
+            self.db.assign_task(self.chat_id, task['id'], 8, 8)
+            self.db.complete_task(self.chat_id, task['id'], 8)
+        # Un'altra famiglia non deve comparire nello storico
+        self.db.assign_task(-43, self.tasks[0]['id'], 9, 9)
+        self.db.complete_task(-43, self.tasks[0]['id'], 9)
+
+    def test_keyset_pages_cover_history_once(self):
+        seen = []
+        before = None
+        while True:
+            page = self.db.get_completion_history(self.chat_id, limit=10, before=before)
+            if not page:
+                break
+            seen.extend(row['id'] for row in page)
+            before = (page[-1]['completed_date'], page[-1]['id'])
+        self.assertEqual(len(seen), 25)
+        self.assertEqual(len(set(seen)), 25)
+        self.assertEqual(seen, sorted(seen, reverse=True))
+
+    def test_cursor_round_trip_fits_callback_data(self):
+        row = self.db.get_completion_history(self.chat_id, limit=1)[0]
+        data = self.bot._encode_history_cursor(row)
+        self.assertLessEqual(len(data.encode()), 64)
+        self.assertEqual(self.bot._decode_history_cursor(data), (row['completed_date'], row['id']))
+        self.assertIsNone(self.bot._decode_history_cursor("hist_top"))
+
+    def test_navigation_through_callbacks(self):
+        from fake_telegram import build_application, callback_update, command_update
+        application, api = build_application(self.bot)
+
+        def last_markup():
+            method, params = api.requests[-1]
+            return params.get("reply_markup")
+
+        async def run():
+            await application.initialize()
+            await application.process_update(command_update(application.bot, self.chat_id, 8, "Ugo", "history"))
+            pages = 1
+            markup = last_markup()
+            while markup:
+                if isinstance(markup, str):
+                    markup = json.loads(markup)
+                older = [b for b in markup["inline_keyboard"][0] if b["callback_data"] != "hist_top"]
+                if not older:
+                    break
+                await application.process_update(
+                    callback_update(application.bot, self.chat_id, 8, "Ugo", older[0]["callback_data"]))
+                pages += 1
+                markup = last_markup()
+            await application.shutdown()
+            return pages
+
+        self.assertEqual(asyncio.run(run()), 3)
+        self.assertTrue(all(len(params["text"]) <= 4096 for _, params in api.requests if "text" in params))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Test per le tastiere inline paginate (catalogo, categorie, membri, le mie task)
+"""
+
+import os
+import json
+import asyncio
+import unittest
+from unittest.mock import patch
+
+import callbacks
+import keyboards
+
+
+class TestPagination(unittest.TestCase):
+
+    def test_paginate_clamps(self):
+        items = list(range(20))
+        self.assertEqual(keyboards.paginate(items, 0, 8), (items[:8], 0, 3))
+        self.assertEqual(keyboards.paginate(items, 9, 8), (items[16:], 2, 3))
+        self.assertEqual(keyboards.paginate([], 3, 8), ([], 0, 1))
+
+    def test_page_callback_round_trip(self):
+        data = keyboards.page_callback("doassign_123456789_cucina_pulizia", 12)
+        self.assertLessEqual(len(data.encode()), 64)
+        self.assertEqual(keyboards.parse_page_callback(data), (12, "doassign_123456789_cucina_pulizia"))
+        self.assertEqual(keyboards.parse_page_callback("cat_casa"), (0, "cat_casa"))
+        with self.assertRaises(ValueError):
+            keyboards.parse_page_callback("pg_x_cat_casa")
+
+    def test_page_cache_is_lru(self):
+        cache = keyboards.PageCache("test", maxsize=2)
+        cache.get_or_build("a", lambda: 1)
+        cache.get_or_build("b", lambda: 2)
+        cache.get_or_build("a", lambda: 99)
+        cache.get_or_build("c", lambda: 3)
+        self.assertEqual(cache.get_or_build("a", lambda: 99), 1)
+        self.assertEqual(cache.get_or_build("b", lambda: 42), 42)
+
+
+@patch.dict(os.environ, {}, clear=True)
+class TestPaginatedViews(unittest.TestCase):
+
+    def setUp(self):
+        from bot_handlers import FamilyTaskBot
+        from fake_telegram import build_application
+        self.family_bot = FamilyTaskBot()
+        self.db = self.family_bot.get_db()
+        self.chat_id = -300
+        for user_id in range(1, 21):
+            self.db.add_family_member(self.chat_id, user_id, f"m{user_id}", f"Membro{user_id}")
+        self.application, self.api = build_application(self.family_bot)
+
+    def _press(self, *datas):
+        from fake_telegram import callback_update
+
+        async def run():
+            await self.application.initialize()
+            for data in datas:
+                await self.application.process_update(
+                    callback_update(self.application.bot, self.chat_id, 1, "Membro1", data))
+            await self.application.shutdown()
+
+        self.api.reset()
+        asyncio.run(run())
+        markups = []
+        for method, params in self.api.requests:
+            if method == "editMessageText":
+                markup = params.get("reply_markup")
+                markups.append(json.loads(markup) if isinstance(markup, str) else markup)
+        return markups
+
+    def _callbacks(self, markup):
+        return [button["callback_data"] for row in markup["inline_keyboard"] for button in row]
+
+    def _actions(self, markup, action):
+        decoded = [callbacks.decode(c) for c in self._callbacks(markup) if not c.startswith(keyboards.PAGE_PREFIX)]
+        return [args for name, args in decoded if name == action]
+
+    def test_assign_menu_pages_cover_catalog(self):
+        short_ids = {t['short_id'] for t in self.db.get_all_tasks()}
+        pages = -(-len(short_ids) // keyboards.PAGE_SIZE)
+        datas = ["assign_menu"] + [f"pg_{p}_assign_menu" for p in range(1, pages)]
+        seen = set()
+        for markup in self._press(*datas):
+            buttons = self._actions(markup, "assign")
+            self.assertLessEqual(len(buttons), keyboards.PAGE_SIZE)
+            seen.update(short_id for short_id, in buttons)
+        self.assertEqual(seen, short_ids)
+
+    def test_member_picker_is_paginated(self):
+        task = self.db.get_all_tasks()[0]
+        first, second = self._press(f"assign_{task['id']}", f"pg_1_assign_{task['id']}")
+        first_targets = self._actions(first, "doassign")
+        second_targets = self._actions(second, "doassign")
+        # "Assegna a me" in ogni pagina + una pagina di altri membri
+        self.assertEqual(len(first_targets), 1 + keyboards.PAGE_SIZE)
+        self.assertEqual(len(set(first_targets[1:]) & set(second_targets[1:])), 0)
+        self.assertIn(keyboards.page_callback(callbacks.encode("assign", task['short_id']), 2), self._callbacks(second))
+
+    def test_my_tasks_from_callback_is_paginated(self):
+        for task in self.db.get_all_tasks()[:10]:
+            self.db.assign_task(self.chat_id, task['id'], 1, 1)
+        first, second = self._press("show_my_tasks", "pg_1_show_my_tasks")
+        self.assertEqual(len(self._actions(first, "complete")), keyboards.PAGE_SIZE)
+        self.assertEqual(len(self._actions(second, "complete")), 2)
+
+    def test_catalog_pages_cached(self):
+        first = self.family_bot._build_assign_menu(1)
+        self.assertIs(self.family_bot._build_assign_menu(1), first)
+        self.db.catalog_version += 1
+        self.assertIsNot(self.family_bot._build_assign_menu(1), first)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
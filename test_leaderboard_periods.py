@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Test per le classifiche settimanali / mensili / di sempre (rollup giornalieri)
+"""
+
+import os
+import asyncio
+import unittest
+from datetime import date, datetime, timedelta, timezone
+from unittest.mock import patch
+
+import callbacks
+
+
+class TestPeriodStart(unittest.TestCase):
+
+    def test_boundaries(self):
+        from db import period_start
+        today = date(2026, 10, 15)  # giovedì
+        self.assertEqual(period_start("week", today), date(2026, 10, 12))
+        self.assertEqual(period_start("month", today), date(2026, 10, 1))
+        self.assertIsNone(period_start("all", today))
+        with self.assertRaises(ValueError):
+            period_start("year", today)
+
+
+class FrozenDatetime(datetime):
+    """db.datetime fixed at Sunday 18/10/2026 11:30 UTC (Monday 00:30 in Auckland)"""
+    MOMENT = datetime(2026, 10, 18, 11, 30, tzinfo=timezone.utc)
+
+    @classmethod
+    def now(cls, tz=None):
+        return cls.MOMENT.astimezone(tz) if tz else cls.MOMENT.replace(tzinfo=None)
+
+
+@patch.dict(os.environ, {}, clear=True)
+class TestFamilyLocalPeriods(unittest.TestCase):
+
+    def test_rollup_day_and_week_follow_the_family_timezone(self):
+        from db import FamilyTaskDB
+        db = FamilyTaskDB()
+        chat_id = -110
+        db.set_family_timezone(chat_id, "Pacific/Auckland")
+        db.add_family_member(chat_id, 1, "anna", "Anna")
+        task = db.get_all_tasks()[0]
+        db.assign_task(chat_id, task['id'], 1, 1)
+        with patch("db.datetime", FrozenDatetime):
+            db.complete_task(chat_id, task['id'], 1)
+            week = db.get_leaderboard(chat_id, "week")
+        # Lunedì ad Auckland, domenica sul server: vale il giorno della famiglia
+        self.assertEqual(list(db._daily_rollups), [(chat_id, date(2026, 10, 19))])
+        self.assertEqual(week[0]['tasks_completed'], 1)
+
+
+@patch.dict(os.environ, {}, clear=True)
+class TestLeaderboardPeriods(unittest.TestCase):
+
+    def setUp(self):
+        from db import FamilyTaskDB
+        self.db = FamilyTaskDB()
+        self.chat_id = -100
+        self.db.add_family_member(self.chat_id, 1, "anna", "Anna")
+        self.db.add_family_member(self.chat_id, 2, "luca", "Luca")
+        task = self.db.get_all_tasks()[0]
+        self.points = task['points']
+        self.db.assign_task(self.chat_id, task['id'], 1, 2)
+        self.db.complete_task(self.chat_id, task['id'], 1)
+        # Completamento vecchio di Luca: conta solo nella classifica di sempre
+        old_day = date.today() - timedelta(days=400)
+        self.db._daily_rollups[(self.chat_id, old_day)] = {2: [100, 5]}
+        self.db._chat_user_stats[(self.chat_id, 2)] = {
+            'total_points': 100, 'tasks_completed': 5,
+            'current_streak': 1, 'best_streak': 3, 'last_task_day': old_day,
+        }
+
+    def test_all_time_includes_history(self):
+        board = self.db.get_leaderboard(self.chat_id)
+        self.assertEqual([e['first_name'] for e in board], ["Luca", "Anna"])
+        self.assertEqual(board[0]['total_points'], 100)
+        self.assertEqual(board[0]['level'], 3)
+
+    def test_week_only_counts_recent_completions(self):
+        board = self.db.get_leaderboard(self.chat_id, "week")
+        self.assertEqual([e['first_name'] for e in board], ["Anna", "Luca"])
+        self.assertEqual(board[0]['total_points'], self.points)
+        self.assertEqual(board[0]['tasks_completed'], 1)
+        self.assertEqual(board[1]['total_points'], 0)
+
+    def test_period_buttons(self):
+        from bot_handlers import FamilyTaskBot
+        bot = FamilyTaskBot()
+        bot.db = self.db
+        text, markup = bot._build_leaderboard(self.chat_id, "month")
+        self.assertIn("di questo mese", text)
+        self.assertNotIn("Livello", text)
+        buttons = markup.inline_keyboard[0]
+        self.assertEqual(
+            [callbacks.decode(b.callback_data) for b in buttons],
+            [("leaderboard", ("week",)), ("leaderboard", ("month",)), ("leaderboard", ("all",))]
+        )
+        self.assertTrue(buttons[1].text.startswith("•"))
+
+    def test_period_callback_edits_message(self):
+        from bot_handlers import FamilyTaskBot
+        from fake_telegram import build_application, callback_update
+        bot = FamilyTaskBot()
+        bot.db = self.db
+        application, api = build_application(bot)
+
+        async def run():
+            await application.initialize()
+            await application.process_update(
+                callback_update(application.bot, self.chat_id, 1, "Anna", "lb_week"))
+            await application.shutdown()
+
+        asyncio.run(run())
+        edits = [params for method, params in api.requests if method == "editMessageText"]
+        self.assertEqual(len(edits), 1)
+        self.assertIn("di questa settimana", edits[0]["text"])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Test per le metriche Prometheus (istogrammi, contatori ed endpoint HTTP)
+"""
+
+import os
+import asyncio
+import unittest
+import urllib.request
+from unittest.mock import patch
+
+import metrics
+
+
+class TestMetrics(unittest.TestCase):
+
+    def test_histogram_exposition(self):
+        registry = metrics.Registry()
+        hist = registry.register(metrics.Histogram("test_latency_seconds", "Test", ("name",), buckets=(0.1, 1.0)))
+        hist.observe(0.05, name="a")
+        hist.observe(0.5, name="a")
+        hist.observe(5, name="a")
+        text = registry.render()
+        self.assertIn("# TYPE test_latency_seconds histogram", text)
+        self.assertIn('test_latency_seconds_bucket{name="a",le="0.1"} 1', text)
+        self.assertIn('test_latency_seconds_bucket{name="a",le="1"} 2', text)
+        self.assertIn('test_latency_seconds_bucket{name="a",le="+Inf"} 3', text)
+        self.assertIn('test_latency_seconds_count{name="a"} 3', text)
+
+    def test_counter_rejects_unknown_labels(self):
+        counter = metrics.Counter("test_total", "Test", ("kind",))
+        with self.assertRaises(ValueError):
+            counter.inc(other="x")
+
+    @patch.dict(os.environ, {}, clear=True)
+    def test_db_methods_are_timed(self):
+        from db import FamilyTaskDB
+        db = FamilyTaskDB()
+        before = metrics.DB_QUERY_LATENCY.count(method="get_task_by_id")
+        hits = metrics.CACHE_REQUESTS.value(cache="task_catalog", result="hit")
+        self.assertIsNotNone(db.get_task_by_id("bucato"))
+        self.assertEqual(metrics.DB_QUERY_LATENCY.count(method="get_task_by_id"), before + 1)
+        self.assertEqual(metrics.CACHE_REQUESTS.value(cache="task_catalog", result="hit"), hits + 1)
+
+    @patch.dict(os.environ, {}, clear=True)
+    def test_delegating_callbacks_are_counted_once(self):
+        from bot_handlers import FamilyTaskBot
+        from fake_telegram import build_application, callback_update
+
+        application, _ = build_application(FamilyTaskBot())
+        observed = metrics.HANDLER_LATENCY.total_count()
+        db_calls = metrics.HANDLER_DB_CALLS.total_count()
+
+        async def run():
+            await application.initialize()
+            for data in ("show_stats", "show_leaderboard"):
+                await application.process_update(callback_update(application.bot, -70, 7, "Ada", data))
+            await application.shutdown()
+
+        asyncio.run(run())
+        # Un campione per update, sotto l'etichetta della route
+        self.assertEqual(metrics.HANDLER_LATENCY.total_count(), observed + 2)
+        self.assertEqual(metrics.HANDLER_DB_CALLS.total_count(), db_calls + 2)
+
+    def test_http_endpoint(self):
+        server = metrics.start_metrics_server(0)
+        try:
+            port = server.server_address[1]
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics") as resp:
+                body = resp.read().decode("utf-8")
+                self.assertEqual(resp.status, 200)
+            self.assertIn("familybot_handler_latency_seconds", body)
+            self.assertIn("familybot_db_query_latency_seconds", body)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
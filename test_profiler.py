@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Test per il profiler a campionamento (stack collassati e funzioni più calde)
+"""
+
+import os
+import asyncio
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import profiler
+
+
+class TestSamplingProfiler(unittest.TestCase):
+
+    @patch.dict(os.environ, {}, clear=True)
+    def test_profile_reports_db_functions(self):
+        from db import FamilyTaskDB
+        db = FamilyTaskDB()
+        db.add_family_member(1, 10, "mario", "Mario")
+
+        async def busy():
+            loop = asyncio.get_running_loop()
+            end = loop.time() + 1.2
+            while loop.time() < end:
+                for _ in range(2000):
+                    db.get_leaderboard(1)
+                await asyncio.sleep(0)
+
+        async def run():
+            worker = asyncio.create_task(busy())
+            result = await profiler.profile_for(1, interval=0.002)
+            await worker
+            return result
+
+        result = asyncio.run(run())
+        self.assertGreater(result.samples, 0)
+
+        hot = [entry["function"] for entry in result.hot_functions()]
+        self.assertTrue(any("db.py" in name for name in hot), hot)
+
+        collapsed = result.collapsed()
+        self.assertTrue(collapsed.splitlines()[0].rsplit(" ", 1)[1].isdigit())
+        self.assertIn("task;", collapsed)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = result.write(tmp)
+            self.assertTrue(path.endswith(".collapsed"))
+            self.assertTrue(os.path.getsize(path) > 0)
+
+    def test_shares_never_exceed_the_ticks(self):
+        async def waiter(event):
+            await event.wait()
+
+        async def run():
+            event = asyncio.Event()
+            tasks = [asyncio.create_task(waiter(event)) for _ in range(5)]
+            await asyncio.sleep(0)
+            sampler = profiler.SamplingProfiler(asyncio.get_running_loop(), interval=60)
+            sampler.start()
+            for _ in range(3):
+                sampler.sample()
+            result = sampler.stop()
+            event.set()
+            await asyncio.gather(*tasks)
+            return result
+
+        result = asyncio.run(run())
+        files = ("test_profiler.py",)
+        waiting = {e["function"].split(" ")[0]: e for e in result.hot_functions(files, kind="task")}
+        # Cinque task sospese nella stessa funzione contano una volta per tick
+        self.assertEqual(waiting["waiter"]["samples"], 3)
+        for entry in result.hot_functions(files) + result.hot_functions(files, kind="task"):
+            self.assertLessEqual(entry["samples"], result.samples)
+
+    def test_non_admin_is_rejected(self):
+        from bot_handlers import FamilyTaskBot
+        with patch.dict(os.environ, {"ADMIN_USER_IDS": "1, 2"}):
+            bot = FamilyTaskBot()
+        self.assertTrue(bot.is_admin(2))
+        self.assertFalse(bot.is_admin(3))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Test per i promemoria di scadenza (query unica, un messaggio per chat, rate limit)
+"""
+
+import os
+import asyncio
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from ratelimit import SendLimiter, TokenBucket
+
+
+class TestTokenBucket(unittest.TestCase):
+
+    def test_send_limiter_evicts_idle_chats(self):
+        limiter = SendLimiter(global_rate=1000, maxsize=3)
+
+        async def noop():
+            return None
+
+        async def run():
+            for chat_id in range(10):
+                await limiter.send(chat_id, noop)
+
+        asyncio.run(run())
+        self.assertEqual(len(limiter._chats), 3)
+
+    def test_refill(self):
+        now = [0.0]
+        bucket = TokenBucket(rate=2, capacity=2, clock=lambda: now[0])
+        self.assertTrue(bucket.try_acquire())
+        self.assertTrue(bucket.try_acquire())
+        self.assertFalse(bucket.try_acquire())
+        self.assertAlmostEqual(bucket.delay(), 0.5)
+        now[0] = 0.5
+        self.assertTrue(bucket.try_acquire())
+
+
+@patch.dict(os.environ, {}, clear=True)
+class TestDueDateNotifier(unittest.TestCase):
+
+    def setUp(self):
+        from db import FamilyTaskDB, track_queries
+        from fake_telegram import make_bot
+        from reminders import DueDateNotifier
+        self.track_queries = track_queries
+        self.db = FamilyTaskDB()
+        self.bot, self.api = make_bot()
+        self.notifier = DueDateNotifier(self.db, lead=timedelta(hours=2))
+        self.now = datetime(2026, 6, 1, 12, 0)
+        tasks = self.db.get_all_tasks()
+        for chat_id in (-1, -2):
+            self.db.add_family_member(chat_id, 5, "eva", "Eva")
+        self.db.assign_task(-1, tasks[0]['id'], 5, 5, due_date=self.now - timedelta(hours=1))
+        self.db.assign_task(-1, tasks[1]['id'], 5, 5, due_date=self.now + timedelta(hours=1))
+        self.db.assign_task(-1, tasks[2]['id'], 5, 5, due_date=self.now + timedelta(days=3))
+        self.db.assign_task(-2, tasks[3]['id'], 5, 5, due_date=self.now + timedelta(minutes=30))
+        self.db.assign_task(-2, tasks[4]['id'], 5, 5)
+
+    def _tick(self, now):
+        async def run():
+            await self.bot.initialize()
+            with self.track_queries() as queries:
+                sent = await self.notifier.tick(self.bot, now)
+            await self.bot.shutdown()
+            return sent, queries
+        return asyncio.run(run())
+
+    def _messages(self):
+        return [params for method, params in self.api.requests if method == "sendMessage"]
+
+    def test_one_message_per_chat_single_query(self):
+        sent, queries = self._tick(self.now)
+        self.assertEqual(sent, 2)
+        self.assertEqual(queries.methods["get_due_assignments"], 1)
+        texts = {int(m["chat_id"]): m["text"] for m in self._messages()}
+        self.assertIn("In ritardo", texts[-1])
+        self.assertIn("In scadenza", texts[-1])
+        self.assertIn("tg://user?id=5", texts[-2])
+
+    def test_each_stage_sent_once(self):
+        self._tick(self.now)
+        self.api.reset()
+        self.assertEqual(self._tick(self.now + timedelta(minutes=5))[0], 0)
+
+        # La task in scadenza diventa in ritardo: arriva solo l'avviso di ritardo
+        sent, _ = self._tick(self.now + timedelta(hours=1, minutes=1))
+        self.assertEqual(sent, 2)
+        self.assertNotIn("In scadenza", self._messages()[0]["text"])
+
+    def test_markdown_in_names_is_escaped(self):
+        from reminders import build_message
+        item = {'id': 1, 'name': "Pulire *tutto*", 'first_name': "Eva_B", 'assigned_to': 5,
+                'due_date': self.now - timedelta(hours=1), 'reminder_stage': 0}
+        text, _ = build_message([item], self.now)
+        self.assertIn("Pulire \\*tutto\\*", text)
+        self.assertIn("[Eva\\_B](tg://user?id=5)", text)
+
+    def test_rejected_message_is_not_retried_forever(self):
+        from telegram.error import BadRequest
+
+        class RejectingBot:
+            async def send_message(self, **kwargs):
+                raise BadRequest("Can't parse entities")
+
+        self.assertEqual(asyncio.run(self.notifier.tick(RejectingBot(), self.now)), 0)
+        self.assertEqual(self._tick(self.now + timedelta(minutes=5))[0], 0)
+        self.assertEqual(self._messages(), [])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
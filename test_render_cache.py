@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Test per la cache dei messaggi renderizzati (chiave: vista, chat, versioni dei dati)
+"""
+
+import os
+import unittest
+from unittest.mock import patch
+
+
+@patch.dict(os.environ, {}, clear=True)
+class TestRenderCache(unittest.TestCase):
+
+    def setUp(self):
+        from db import track_queries
+        from bot_handlers import FamilyTaskBot
+        self.track_queries = track_queries
+        self.bot = FamilyTaskBot()
+        self.db = self.bot.get_db()
+        self.chat_id = -500
+        self.db.add_family_member(self.chat_id, 1, "ada", "Ada")
+        self.task = self.bot._categorized_catalog(self.chat_id)["cucina"][0]
+
+    def _view(self, view, build, *extra):
+        with self.track_queries() as queries:
+            result = self.bot._cached_view(view, self.chat_id, build, *extra)
+        return result, queries.calls
+
+    def _categories(self):
+        return self._view("categories", lambda: self.bot._build_categories_menu(self.chat_id))
+
+    def _category(self, page=0):
+        return self._view("category", lambda: self.bot._build_category_view(self.chat_id, "cucina", page), "cucina", page)
+
+    def test_hit_skips_database(self):
+        first, calls = self._categories()
+        self.assertGreater(calls, 0)
+        second, calls = self._categories()
+        self.assertIs(second, first)
+        self.assertEqual(calls, 0)
+
+    def test_assignment_bumps_version(self):
+        before, _ = self._category()
+        self.db.assign_task(self.chat_id, self.task['id'], 1, 1)
+        after, calls = self._category()
+        self.assertGreater(calls, 0)
+        self.assertNotEqual(before[0], after[0])
+        self.assertIn("Assegnazioni attive: 1", after[0])
+
+        self.db.complete_task(self.chat_id, self.task['id'], 1)
+        done, _ = self._category()
+        self.assertIn("Assegnazioni attive: 0", done[0])
+
+    def test_other_chats_unaffected(self):
+        first, _ = self._categories()
+        self.db.assign_task(-501, self.task['id'], 2, 2)
+        second, calls = self._categories()
+        self.assertIs(second, first)
+        self.assertEqual(calls, 0)
+
+    def test_out_of_range_pages_share_one_entry(self):
+        import asyncio
+        import callbacks
+        import keyboards
+        from fake_telegram import build_application, callback_update
+
+        application, api = build_application(self.bot)
+        category = callbacks.encode("category", "cucina")
+        pages = -(-len(self.bot._categorized_catalog(self.chat_id)["cucina"]) // keyboards.PAGE_SIZE)
+
+        async def run():
+            await application.initialize()
+            for page in (pages - 1, pages, 99):
+                data = keyboards.page_callback(category, page)
+                await application.process_update(callback_update(application.bot, self.chat_id, 1, "Ada", data))
+            await application.shutdown()
+
+        before = len(self.bot._render_cache)
+        asyncio.run(run())
+        self.assertEqual(len(self.bot._render_cache), before + 1)
+        edits = [params["text"] for method, params in api.requests if method == "editMessageText"]
+        self.assertEqual(len(set(edits)), 1)
+
+    def test_cache_is_bounded(self):
+        cache = self.bot._render_cache
+        for chat_id in range(cache.maxsize + 50):
+            self.bot._cached_view("categories", chat_id, lambda: ("", None))
+        self.assertEqual(len(cache), cache.maxsize)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
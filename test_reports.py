@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Test per il rendering dei report: funzioni pure e tempi di rendering
+"""
+
+import os
+import asyncio
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+
+import metrics
+import reports
+
+
+def _history_rows(count):
+    return [
+        {'task_name': f"Task numero {i}", 'completed_date': datetime(2024, 5, 1, 8, 30),
+         'first_name': "Ada", 'points_earned': 3}
+        for i in range(count)
+    ]
+
+
+class TestRenderFunctions(unittest.TestCase):
+
+    def test_history_is_cut_at_the_message_limit(self):
+        text = reports.history_text(_history_rows(500), 4096)
+        self.assertEqual(len(text), 4096)
+        self.assertTrue(text.startswith("📜 **Storico Completamenti**"))
+        self.assertIn("Nessuna task", reports.history_text([], 4096))
+
+    def test_leaderboard_levels_only_for_all_time(self):
+        board = [{'first_name': "Ada", 'total_points': 60, 'level': 2, 'tasks_completed': 4}]
+        self.assertIn("📈 10/50 punti", reports.leaderboard_text(board, "all", "di sempre"))
+        self.assertNotIn("Livello", reports.leaderboard_text(board, "week", "della settimana"))
+
+
+class TestRender(unittest.TestCase):
+
+    def test_render_is_timed_per_report(self):
+        rows = _history_rows(3)
+        before = metrics.REPORT_RENDER_LATENCY.count(report="history_text")
+        self.assertEqual(reports.render(reports.history_text, rows, 4096), reports.history_text(rows, 4096))
+        self.assertEqual(metrics.REPORT_RENDER_LATENCY.count(report="history_text"), before + 1)
+
+
+@patch.dict(os.environ, {}, clear=True)
+class TestStatsCommand(unittest.TestCase):
+
+    def test_stats_reply(self):
+        from bot_handlers import FamilyTaskBot
+        from fake_telegram import build_application, command_update
+
+        family_bot = FamilyTaskBot()
+        db = family_bot.get_db()
+        db.add_family_member(-30, 9, "ada", "Ada")
+        task = db.get_all_tasks()[0]
+        db.assign_task(-30, task['id'], 9, 9)
+        db.complete_task(-30, task['id'], 9)
+        application, api = build_application(family_bot)
+
+        async def run():
+            await application.initialize()
+            await application.process_update(command_update(application.bot, -30, 9, "Ada", "stats"))
+            await application.shutdown()
+
+        asyncio.run(run())
+        text = api.requests[-1][1]["text"]
+        self.assertIn("Statistiche di Ada", text)
+        self.assertIn(f"**{task['name']}**: completata 1 volta", text)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
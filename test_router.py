@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Test per il router delle callback: dispatch a tabella e middleware per rotta
+"""
+
+import os
+import asyncio
+import unittest
+from unittest.mock import patch
+
+import callbacks
+import router
+import utils
+
+
+class FakeQuery:
+    def __init__(self, user_id=1, message_id=1):
+        self.from_user = type("User", (), {"id": user_id})()
+        self.message = type("Message", (), {
+            "chat": type("Chat", (), {"id": -1})(), "message_id": message_id
+        })()
+        self.answers = []
+        self.edits = []
+
+    async def answer(self, text=None):
+        self.answers.append(text)
+
+    async def edit_message_text(self, text, **kwargs):
+        self.edits.append(text)
+
+
+class TestRouter(unittest.TestCase):
+
+    def setUp(self):
+        utils._last_rendered.clear()
+        self.calls = []
+
+    def _handler(self, name):
+        async def handler(query, *args):
+            self.calls.append((name,) + args)
+        return handler
+
+    def test_dispatch_ignores_registration_order(self):
+        routes = router.Router(callbacks.decode, middleware=(router.answer_first,))
+        # "assign" registered before the longer legacy prefix "assign_menu" must not shadow it
+        routes.add("assign", self._handler("assign"))
+        routes.add("assign_menu", self._handler("assign_menu"))
+        routes.add("confirm_complete", self._handler("confirm"))
+        routes.add("complete", self._handler("complete"))
+        query = FakeQuery()
+        for data in ("assign_menu", "assign_bucato", callbacks.encode("complete", 4), "confirm_complete_bucato", "boh"):
+            asyncio.run(routes.dispatch(query, data))
+        self.assertEqual(self.calls, [("assign_menu",), ("assign", "bucato"), ("complete", 4), ("confirm", "bucato")])
+        # Every tap is acknowledged, unknown data included
+        self.assertEqual(len(query.answers), 5)
+        with self.assertRaises(ValueError):
+            routes.add("assign", self._handler("di nuovo"))
+
+    def test_middleware_order(self):
+        order = []
+
+        def tag(name):
+            def middleware(call, route):
+                async def wrapper(query, *args):
+                    order.append(name)
+                    return await call(query, *args)
+                return wrapper
+            return middleware
+
+        routes = router.Router(callbacks.decode, middleware=(tag("globale"),))
+        routes.add("main_menu", self._handler("main_menu"), middleware=(tag("rotta"),))
+        asyncio.run(routes.dispatch(FakeQuery(), "main_menu"))
+        self.assertEqual(order, ["rotta", "globale"])
+
+    def test_errors_are_contained_per_route(self):
+        async def broken(query):
+            raise RuntimeError("boom")
+
+        routes = router.Router(callbacks.decode, middleware=(router.answer_first, router.catch_errors("❌ errore")))
+        routes.add("main_menu", broken)
+        routes.add("tasks_menu", self._handler("tasks_menu"))
+        query = FakeQuery()
+        with self.assertLogs("router", level="ERROR"):
+            asyncio.run(routes.dispatch(query, "main_menu"))
+        asyncio.run(routes.dispatch(query, "tasks_menu"))
+        self.assertEqual(query.edits, ["❌ errore"])
+        self.assertEqual(self.calls, [("tasks_menu",)])
+
+    def test_rate_limited_route(self):
+        routes = router.Router(callbacks.decode, middleware=(router.answer_first,))
+        routes.add("recdel", self._handler("recdel"), middleware=(router.rate_limited(0.001, 2, "piano"),))
+        routes.add("none", self._handler("none"))
+        spammer, other = FakeQuery(user_id=1), FakeQuery(user_id=2)
+        for _ in range(5):
+            asyncio.run(routes.dispatch(spammer, "recdel_7"))
+            asyncio.run(routes.dispatch(spammer, "none"))
+        asyncio.run(routes.dispatch(other, "recdel_8"))
+        self.assertEqual([c for c in self.calls if c[0] == "recdel"], [("recdel", 7), ("recdel", 7), ("recdel", 8)])
+        self.assertEqual(spammer.answers.count("piano"), 3)
+        # Unlimited routes are unaffected
+        self.assertEqual(self.calls.count(("none",)), 5)
+
+
+@patch.dict(os.environ, {}, clear=True)
+class TestBotRoutes(unittest.TestCase):
+
+    def test_every_action_has_a_route(self):
+        from bot_handlers import FamilyTaskBot
+        bot = FamilyTaskBot()
+        self.assertEqual({name for name in callbacks.ACTIONS_BY_NAME if name in bot.router}, set(callbacks.ACTIONS_BY_NAME))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
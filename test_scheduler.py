@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Test per lo scheduler delle task ricorrenti (heap + una sola sveglia)
+"""
+
+import os
+import asyncio
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from scheduler import RecurringScheduler, next_occurrence, parse_rule
+
+
+class FakeJob:
+    def __init__(self, when):
+        self.when = when
+        self.removed = False
+
+    def schedule_removal(self):
+        self.removed = True
+
+
+class FakeJobQueue:
+    """Registra le sveglie richieste dallo scheduler"""
+
+    def __init__(self):
+        self.jobs = []
+
+    def run_once(self, callback, when, name=None):
+        job = FakeJob(when)
+        self.jobs.append(job)
+        return job
+
+
+class TestRules(unittest.TestCase):
+
+    def test_parse_rule(self):
+        self.assertEqual(parse_rule("giornaliera"), 1)
+        self.assertEqual(parse_rule("Settimanale"), 7)
+        self.assertEqual(parse_rule("ogni 3 giorni"), 3)
+        self.assertEqual(parse_rule("10d"), 10)
+        for bad in ("mai", "0", "ogni 999 giorni"):
+            with self.assertRaises(ValueError):
+                parse_rule(bad)
+
+    def test_next_occurrence_skips_missed(self):
+        due = datetime(2026, 1, 1, 9, 0)
+        self.assertEqual(next_occurrence(due, 7, datetime(2025, 12, 31)), due)
+        self.assertEqual(next_occurrence(due, 7, due), due + timedelta(days=7))
+        self.assertEqual(next_occurrence(due, 1, datetime(2026, 1, 4, 10, 0)), datetime(2026, 1, 5, 9, 0))
+
+
+@patch.dict(os.environ, {}, clear=True)
+class TestRecurringScheduler(unittest.TestCase):
+
+    def setUp(self):
+        from db import FamilyTaskDB
+        self.db = FamilyTaskDB()
+        self.now = datetime(2026, 5, 4, 8, 0)
+        self.chat_id = -77
+        self.db.add_family_member(self.chat_id, 1, "papa", "Papà")
+        self.tasks = self.db.get_all_tasks()
+
+    def _add(self, task, interval, due):
+        return self.db.add_recurring_task(self.chat_id, task['id'], 1, 1, interval, due)
+
+    def test_due_recurrences_assigned_with_due_date(self):
+        daily = self._add(self.tasks[0], 1, self.now - timedelta(minutes=5))
+        self._add(self.tasks[1], 7, self.now + timedelta(days=2))
+        sched = RecurringScheduler(self.db)
+        sched.load()
+
+        fired = asyncio.run(sched.run_due(self.now))
+        self.assertEqual([rec['id'] for rec in fired], [daily['id']])
+        assigned = [a for a in self.db._assigned if a['task_id'] == self.tasks[0]['id']]
+        self.assertEqual(assigned[0]['due_date'], daily['next_due'] + timedelta(days=1))
+        self.assertEqual(sched.next_due(), self.now - timedelta(minutes=5) + timedelta(days=1))
+        self.assertEqual(self.db.get_recurring_tasks()[0]['next_due'], sched.next_due())
+
+    def test_open_assignment_is_not_duplicated(self):
+        self.db.assign_task(self.chat_id, self.tasks[0]['id'], 1, 1)
+        self._add(self.tasks[0], 1, self.now)
+        sched = RecurringScheduler(self.db)
+        sched.load()
+        self.assertEqual(asyncio.run(sched.run_due(self.now)), [])
+        self.assertEqual(len(self.db._assigned), 1)
+
+    def test_removed_recurrence_never_fires(self):
+        rec = self._add(self.tasks[0], 1, self.now)
+        sched = RecurringScheduler(self.db)
+        sched.load()
+        sched.remove(rec['id'])
+        self.assertIsNone(sched.next_due())
+        self.assertEqual(asyncio.run(sched.run_due(self.now)), [])
+
+    def test_single_wakeup_for_many_recurrences(self):
+        queue = FakeJobQueue()
+        for i, task in enumerate(self.tasks[:20]):
+            self._add(task, 1 + i % 7, datetime.now() + timedelta(hours=1 + i))
+        sched = RecurringScheduler(self.db, queue)
+        sched.load()
+        self.assertEqual(len(queue.jobs), 1)
+        self.assertAlmostEqual(queue.jobs[0].when, 3600, delta=5)
+
+        # Una ricorrenza più vicina sostituisce la sveglia corrente
+        sched.add(self._add(self.tasks[20], 1, datetime.now() + timedelta(minutes=10)))
+        self.assertEqual(len(queue.jobs), 2)
+        self.assertTrue(queue.jobs[0].removed)
+        self.assertAlmostEqual(queue.jobs[1].when, 600, delta=5)
+
+    def test_notice_escapes_markdown(self):
+        from fake_telegram import make_bot
+        self.db.add_family_member(self.chat_id, 2, "anna", "Anna_Maria")
+        self.db.add_recurring_task(self.chat_id, self.tasks[0]['id'], 2, 2, 1, self.now)
+        bot, api = make_bot()
+        sched = RecurringScheduler(self.db, bot=bot)
+        sched.load()
+
+        async def run():
+            await bot.initialize()
+            await sched.run_due(self.now)
+            await bot.shutdown()
+
+        asyncio.run(run())
+        texts = [params["text"] for method, params in api.requests if method == "sendMessage"]
+        self.assertEqual(len(texts), 1)
+        self.assertIn("Anna\\_Maria", texts[0])
+
+    def test_listing_shows_task_ids(self):
+        from bot_handlers import FamilyTaskBot
+        from fake_telegram import build_application, command_update
+
+        family_bot = FamilyTaskBot(db=self.db)
+        self.db.assign_task(self.chat_id, self.tasks[2]['id'], 1, 1)
+        self._add(self.tasks[0], 7, self.now + timedelta(days=1))
+        application, api = build_application(family_bot)
+
+        async def run():
+            await application.initialize()
+            await application.process_update(command_update(application.bot, self.chat_id, 1, "Papà", "recurring"))
+            await application.shutdown()
+
+        asyncio.run(run())
+        text = [params["text"] for method, params in api.requests if method == "sendMessage"][-1]
+        self.assertIn(f"`{self.tasks[0]['id']}`", text)
+        self.assertIn(f"`{self.tasks[2]['id']}`", text)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Test per la modalità a più processi: partizionamento per chat, dispatcher e stato condiviso
+"""
+
+import os
+import queue
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+import sharding
+
+
+class TestShardRouting(unittest.TestCase):
+
+    def test_shard_for_is_stable_and_covers_every_shard(self):
+        self.assertEqual(sharding.shard_for(-1000003, 4), sharding.shard_for(1000003, 4))
+        self.assertEqual({sharding.shard_for(-1000000 - f, 4) for f in range(8)}, {0, 1, 2, 3})
+        self.assertTrue(sharding.Shard(3, 4).owns(-1000003))
+        self.assertFalse(sharding.Shard(2, 4).owns(-1000003))
+
+    def test_update_chat_id(self):
+        message = {"message_id": 1, "chat": {"id": -42}}
+        self.assertEqual(sharding.update_chat_id({"update_id": 1, "message": message}), -42)
+        self.assertEqual(sharding.update_chat_id({"update_id": 2, "callback_query": {"from": {"id": 7}, "message": message}}), -42)
+        self.assertEqual(sharding.update_chat_id({"update_id": 3, "callback_query": {"from": {"id": 7}}}), 7)
+        self.assertIsNone(sharding.update_chat_id({"update_id": 4, "inline_query": {"from": {"id": 7}}}))
+
+    def test_dispatcher_keeps_chat_order_per_queue(self):
+        queues = [queue.Queue(), queue.Queue()]
+        dispatcher = sharding.Dispatcher(queues)
+        for update_id, chat_id in enumerate([-10, -11, -10, -13, -10]):
+            dispatcher.route({"update_id": update_id, "message": {"chat": {"id": chat_id}}})
+        dispatcher.route({"update_id": 99, "inline_query": {"from": {"id": 3}}})
+        dispatcher.close()
+        self.assertEqual(dispatcher.routed, [4, 2])
+
+        def drain(q):
+            items = []
+            while (item := q.get()) is not None:
+                items.append(item["update_id"])
+            return items
+
+        self.assertEqual(drain(queues[0]), [0, 2, 4, 99])
+        self.assertEqual(drain(queues[1]), [1, 3])
+
+
+@patch.dict(os.environ, {}, clear=True)
+class TestShardedState(unittest.TestCase):
+
+    def setUp(self):
+        from db import FamilyTaskDB
+        self.db = FamilyTaskDB()
+
+    def test_tracked_messages_are_taken_per_shard(self):
+        for chat_id, message_id in ((-10, 1), (-11, 2), (-10, 3)):
+            self.db.track_message(chat_id, message_id)
+        self.assertEqual(self.db.take_tracked_messages(sharding.Shard(1, 2)), {-11: [2]})
+        self.assertEqual(self.db.take_tracked_messages(sharding.Shard(1, 2)), {})
+        self.assertEqual(self.db.take_tracked_messages(), {-10: [1, 3]})
+
+    def test_tracking_is_batched_with_a_database(self):
+        from db import FamilyTaskDB
+        with patch.dict(os.environ, {"DATABASE_URL": "postgresql://worker"}):
+            db = FamilyTaskDB(load_catalog=False)
+        with patch.object(db, "get_db_connection", side_effect=AssertionError("connessione per invio")):
+            for message_id in range(1, 51):
+                db.track_message(-10, message_id)
+        with patch("psycopg2.extras.execute_values") as insert, patch.object(db, "get_db_connection"):
+            self.assertEqual(db.flush_tracked_messages(), 50)
+        self.assertEqual(insert.call_count, 1)
+        self.assertEqual(len(insert.call_args[0][2]), 50)
+        self.assertEqual(db.flush_tracked_messages(), 0)
+
+    def test_jobs_only_see_their_chats(self):
+        due = datetime.now() - timedelta(hours=1)
+        task_id = self.db.get_all_tasks()[0]['id']
+        for chat_id in (-10, -11):
+            self.db.add_family_member(chat_id, 5, "ada", "Ada")
+            self.db.assign_task(chat_id, task_id, 5, 5, due_date=due)
+            self.db.add_recurring_task(chat_id, task_id, 5, 5, 1, due.date())
+        shard = sharding.Shard(0, 2)
+        self.assertEqual([a['chat_id'] for a in self.db.get_due_assignments(datetime.now(), shard=shard)], [-10])
+        self.assertEqual([r['chat_id'] for r in self.db.get_recurring_tasks(shard=shard)], [-10])
+        self.assertEqual(len(self.db.get_recurring_tasks()), 2)
+
+
+class TestLocalWorkers(unittest.TestCase):
+
+    def test_each_chat_is_served_by_one_worker(self):
+        result = sharding.run_local(workers=2, families=6, members=2, updates=200)
+        self.assertEqual(sum(r["processed"] for r in result["shards"]), result["updates"])
+        self.assertEqual([r["processed"] for r in result["shards"]], result["routed"])
+        chats = [set(r["chats"]) for r in result["shards"]]
+        self.assertFalse(chats[0] & chats[1])
+        self.assertEqual(len(chats[0] | chats[1]), 6)
+        for report in result["shards"]:
+            self.assertTrue(all(sharding.Shard(report["shard"], 2).owns(c) for c in report["chats"]))
+            self.assertGreater(report["api_calls"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Test per l'avvio a freddo: import differiti, istanza DB condivisa e report dei tempi
+"""
+
+import os
+import sys
+import subprocess
+import unittest
+from unittest.mock import patch
+
+import metrics
+import startup
+from db import FamilyTaskDB
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestStartupTimer(unittest.TestCase):
+
+    def test_report_lists_sequential_and_parallel_phases(self):
+        clock = FakeClock()
+        timer = startup.StartupTimer(clock=clock)
+        clock.now += 0.25
+        timer.mark("imports")
+        timer.record("catalog", 0.8)
+        clock.now += 0.5
+        timer.mark("telegram_init")
+        report = timer.report()
+        self.assertEqual(report, "Avvio completato in 0.75s: imports 0.25s, catalog 0.80s (in parallelo), "
+                                 "telegram_init 0.50s")
+        self.assertEqual(metrics.STARTUP_SECONDS.value(phase="catalog"), 0.8)
+        self.assertEqual(metrics.STARTUP_SECONDS.value(phase="total"), 0.75)
+
+
+@patch.dict(os.environ, {}, clear=True)
+class TestWarmUp(unittest.TestCase):
+
+    def test_deferred_catalog_is_loaded_in_background(self):
+        db = FamilyTaskDB(load_catalog=False)
+        self.assertTrue(db.fallback_mode)
+        self.assertEqual(db.get_all_tasks(), [])
+        timer = startup.StartupTimer()
+        self.assertIs(startup.warm_up(db, timer).result(timeout=5), db)
+        self.assertEqual(len(db.get_all_tasks()), len(FamilyTaskDB().get_all_tasks()))
+        self.assertEqual(db.catalog_version, 1)
+        self.assertEqual([(phase, parallel) for phase, _, parallel in timer.phases], [("catalog", True)])
+
+    def test_failure_reaches_the_waiter(self):
+        class BrokenDB:
+            def load_catalog(self):
+                raise RuntimeError("database irraggiungibile")
+
+        with self.assertRaises(RuntimeError):
+            startup.warm_up(BrokenDB()).result(timeout=5)
+
+    def test_bot_uses_the_shared_instance(self):
+        from bot_handlers import FamilyTaskBot
+        db = FamilyTaskDB()
+        self.assertIs(FamilyTaskBot(db=db).get_db(), db)
+
+
+class TestDeferredImports(unittest.TestCase):
+
+    def test_importing_main_does_not_load_heavy_modules(self):
+        code = "import sys, main; print('telegram' in sys.modules, 'bot_handlers' in sys.modules, 'psycopg2' in sys.modules)"
+        out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, timeout=60,
+                             cwd=os.path.dirname(os.path.abspath(__file__)))
+        self.assertEqual(out.stdout.split(), ["False", "False", "False"], out.stderr)
+
+    def test_main_still_exposes_family_task_db(self):
+        from main import FamilyTaskDB as exported
+        self.assertIs(exported, FamilyTaskDB)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
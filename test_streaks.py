@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Test per le streak giornaliere (calcolo incrementale e fuso orario della famiglia)
+"""
+
+import os
+import unittest
+from datetime import date, datetime, timedelta
+from unittest.mock import patch
+from zoneinfo import ZoneInfo
+
+from db import advance_streak, visible_streak, local_today
+
+
+class TestStreakRules(unittest.TestCase):
+
+    def test_advance(self):
+        today = date(2026, 3, 10)
+        self.assertEqual(advance_streak(0, None, today), 1)
+        self.assertEqual(advance_streak(4, today, today), 4)
+        self.assertEqual(advance_streak(4, today - timedelta(days=1), today), 5)
+        self.assertEqual(advance_streak(4, today - timedelta(days=2), today), 1)
+
+    def test_visible_streak_resets_after_missed_day(self):
+        today = date(2026, 3, 10)
+        self.assertEqual(visible_streak(3, today - timedelta(days=1), today), 3)
+        self.assertEqual(visible_streak(3, today - timedelta(days=2), today), 0)
+        self.assertEqual(visible_streak(0, None, today), 0)
+
+    def test_local_today_uses_family_timezone(self):
+        # 23:30 UTC è già il giorno dopo a Roma, ma non a New York
+        now = datetime(2026, 7, 1, 23, 30, tzinfo=ZoneInfo("UTC"))
+        self.assertEqual(local_today("Europe/Rome", now), date(2026, 7, 2))
+        self.assertEqual(local_today("America/New_York", now), date(2026, 7, 1))
+
+
+@patch.dict(os.environ, {}, clear=True)
+class TestIncrementalStreaks(unittest.TestCase):
+
+    def setUp(self):
+        from db import FamilyTaskDB
+        self.db = FamilyTaskDB()
+        self.chat_id = -5
+        self.db.add_family_member(self.chat_id, 3, "sara", "Sara")
+        self.tasks = self.db.get_all_tasks()
+
+    def _complete_on(self, day, task):
+        self.db.assign_task(self.chat_id, task['id'], 3, 3)
+        with patch("db.local_today", return_value=day):
+            self.assertTrue(self.db.complete_task(self.chat_id, task['id'], 3))
+
+    def test_consecutive_days(self):
+        today = local_today()
+        for offset, task in zip((3, 2, 2, 1, 0), self.tasks):
+            self._complete_on(today - timedelta(days=offset), task)
+        stats = self.db.get_user_stats(3, self.chat_id)
+        self.assertEqual(stats['streak'], 4)
+        self.assertEqual(stats['best_streak'], 4)
+
+    def test_gap_breaks_current_but_keeps_best(self):
+        today = local_today()
+        for offset, task in zip((6, 5, 4, 1), self.tasks):
+            self._complete_on(today - timedelta(days=offset), task)
+        stats = self.db.get_user_stats(3, self.chat_id)
+        self.assertEqual(stats['streak'], 1)
+        self.assertEqual(stats['best_streak'], 3)
+
+    def test_stale_streak_shows_zero(self):
+        self._complete_on(local_today() - timedelta(days=3), self.tasks[0])
+        stats = self.db.get_user_stats(3, self.chat_id)
+        self.assertEqual(stats['streak'], 0)
+        self.assertEqual(stats['best_streak'], 1)
+
+    def test_invalid_timezone_rejected(self):
+        with self.assertRaises(ValueError):
+            self.db.set_family_timezone(self.chat_id, "Marte/Olympus")
+        self.db.set_family_timezone(self.chat_id, "Asia/Tokyo")
+        self.assertEqual(self.db._timezones[self.chat_id], "Asia/Tokyo")
+
+
+class Clock(datetime):
+    """db.datetime stand-in whose now() is ``Clock.moment`` (aware, UTC)"""
+    moment = None
+
+    @classmethod
+    def now(cls, tz=None):
+        return cls.moment.astimezone(tz) if tz else cls.moment.replace(tzinfo=None)
+
+
+@patch.dict(os.environ, {}, clear=True)
+class TestLocalMidnight(unittest.TestCase):
+
+    def test_streak_and_weekly_board_share_the_family_day(self):
+        from db import FamilyTaskDB
+        db = FamilyTaskDB()
+        chat_id = -6
+        db.set_family_timezone(chat_id, "America/New_York")
+        db.add_family_member(chat_id, 3, "sara", "Sara")
+        tasks = db.get_all_tasks()
+        utc = ZoneInfo("UTC")
+        # Domenica 23:50 e lunedì 00:10 a New York: lo stesso giorno (19/10) in UTC
+        moments = (datetime(2026, 10, 19, 3, 50, tzinfo=utc), datetime(2026, 10, 19, 4, 10, tzinfo=utc))
+        with patch("db.datetime", Clock):
+            for moment, task in zip(moments, tasks):
+                Clock.moment = moment
+                db.assign_task(chat_id, task['id'], 3, 3)
+                self.assertTrue(db.complete_task(chat_id, task['id'], 3))
+            stats = db.get_user_stats(3, chat_id)
+            week = db.get_leaderboard(chat_id, "week")
+
+        self.assertEqual(stats['streak'], 2)
+        self.assertEqual(db._chat_user_stats[(chat_id, 3)]['last_task_day'], date(2026, 10, 19))
+        self.assertEqual(sorted(day for _, day in db._daily_rollups), [date(2026, 10, 18), date(2026, 10, 19)])
+        # La settimana locale inizia lunedì: conta solo il completamento dopo mezzanotte
+        self.assertEqual(week[0]['tasks_completed'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Test per il riconoscimento dei messaggi di testo e lo scarto delle chiacchiere di gruppo
+"""
+
+import os
+import asyncio
+import unittest
+from unittest.mock import patch
+
+from db import track_queries
+
+
+class TestTextMatcher(unittest.TestCase):
+
+    def setUp(self):
+        from bot_handlers import FamilyTaskBot
+        self.match = FamilyTaskBot.match_text_command
+
+    def test_exact_commands(self):
+        self.assertEqual(self.match("📝 le mie task"), "my_tasks")
+        self.assertEqual(self.match("🏆 classifica"), "leaderboard")
+        self.assertEqual(self.match("❓ aiuto"), "help_command")
+        self.assertEqual(self.match("⚙️ gestione"), "management_menu")
+
+    def test_fallbacks_keep_priority(self):
+        # "task" wins over "classifica" wherever it appears, as in the old elif chain
+        self.assertEqual(self.match("classifica delle task"), "show_tasks")
+        self.assertEqual(self.match("chi è primo in classifica?"), "leaderboard")
+        self.assertEqual(self.match("le mie\nstatistiche"), "stats")
+        self.assertIsNone(self.match("stasera pizza"))
+
+
+@patch.dict(os.environ, {}, clear=True)
+class TestGroupChatter(unittest.TestCase):
+
+    def _send(self, chat_id, text):
+        from bot_handlers import FamilyTaskBot
+        from fake_telegram import build_application, text_update
+        family_bot = FamilyTaskBot()
+        application, api = build_application(family_bot)
+
+        async def run():
+            await application.initialize()
+            api.reset()
+            with track_queries() as queries:
+                await application.process_update(text_update(application.bot, chat_id, 5, "Ada", text))
+            await application.shutdown()
+            return queries
+
+        queries = asyncio.run(run())
+        return family_bot, api, queries
+
+    def test_group_chatter_is_ignored_without_db(self):
+        family_bot, api, queries = self._send(-700, "ci vediamo alle 8 👍")
+        self.assertEqual(queries.calls, 0)
+        self.assertEqual(api.requests, [])
+        self.assertEqual(family_bot.get_db().get_family_members(-700), [])
+
+    def test_group_command_registers_member(self):
+        family_bot, api, _ = self._send(-701, "🏆 Classifica")
+        self.assertEqual([m['user_id'] for m in family_bot.get_db().get_family_members(-701)], [5])
+        self.assertEqual([method for method, _ in api.requests], ["sendMessage"])
+
+    def test_private_chatter_gets_suggestions(self):
+        _, api, _ = self._send(5, "come funziona?")
+        self.assertEqual(len(api.requests), 1)
+        self.assertIn("Non ho capito", api.requests[0][1]["text"])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
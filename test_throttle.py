@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Test per il throttling degli update in ingresso (per utente, per chat, tap ripetuti)
+"""
+
+import os
+import asyncio
+import unittest
+from unittest.mock import patch
+
+from ratelimit import UpdateThrottle
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestUpdateThrottle(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.throttle = UpdateThrottle(user_rate=1, user_burst=3, chat_rate=2, chat_burst=5, clock=self.clock)
+
+    def test_spammer_does_not_drain_family(self):
+        results = [self.throttle.allow(-1, 10) for _ in range(20)]
+        self.assertEqual(results.count(True), 3)
+        # The spammer used 3 chat tokens out of 5: two other members still get through
+        self.assertTrue(self.throttle.allow(-1, 11))
+        self.assertTrue(self.throttle.allow(-1, 12))
+        self.assertFalse(self.throttle.allow(-2, 10))
+        self.clock.now += 1
+        self.assertTrue(self.throttle.allow(-2, 10))
+
+    def test_repeated_taps_coalesced(self):
+        key = (10, 99, "tasks_menu")
+        self.assertFalse(self.throttle.is_repeat(key))
+        self.assertTrue(self.throttle.is_repeat(key))
+        self.assertFalse(self.throttle.is_repeat((10, 100, "tasks_menu")))
+        self.clock.now += self.throttle.coalesce_window
+        self.assertFalse(self.throttle.is_repeat(key))
+
+
+@patch.dict(os.environ, {}, clear=True)
+class TestThrottledApplication(unittest.TestCase):
+
+    def test_throttle_runs_before_handlers(self):
+        from bot_handlers import FamilyTaskBot
+        from db import track_queries
+        from fake_telegram import build_application, callback_update
+
+        clock = FakeClock()
+        throttle = UpdateThrottle(user_rate=1, user_burst=3, chat_rate=10, chat_burst=10, clock=clock)
+        application, api = build_application(FamilyTaskBot(), throttle=throttle)
+        bot = application.bot
+
+        async def run():
+            await application.initialize()
+            api.reset()
+            with track_queries() as queries:
+                for message_id in range(1, 11):
+                    await application.process_update(callback_update(bot, -800, 1, "Spam", "show_my_tasks", message_id=message_id))
+                # Same button pressed again on the same message: dropped
+                await application.process_update(callback_update(bot, -800, 2, "Bea", "show_my_tasks", message_id=50))
+                await application.process_update(callback_update(bot, -800, 2, "Bea", "show_my_tasks", message_id=50))
+            await application.shutdown()
+            return queries
+
+        queries = asyncio.run(run())
+        edits = [params for method, params in api.requests if method == "editMessageText"]
+        answers = [params for method, params in api.requests if method == "answerCallbackQuery"]
+        self.assertEqual(len(edits), 4)
+        self.assertEqual(queries.calls, 4)
+        # Every tap is still acknowledged, throttled ones with a notice
+        self.assertEqual(len(answers), 12)
+        self.assertEqual(sum(1 for a in answers if a.get("text") == UpdateThrottle.NOTICE), 7)
+
+    def test_group_chatter_does_not_spend_tokens(self):
+        from bot_handlers import FamilyTaskBot
+        from fake_telegram import build_application, callback_update, text_update
+
+        family_bot = FamilyTaskBot()
+        throttle = UpdateThrottle(user_rate=1, user_burst=3, chat_rate=1, chat_burst=3, clock=FakeClock(),
+                                  ignore=family_bot.is_group_chatter)
+        application, api = build_application(family_bot, throttle=throttle)
+        bot = application.bot
+
+        async def run():
+            await application.initialize()
+            for i in range(20):
+                await application.process_update(text_update(bot, -801, 1 + i % 3, "Zio", f"ciao a tutti {i}"))
+            api.reset()
+            await application.process_update(callback_update(bot, -801, 4, "Bea", "show_my_tasks"))
+            await application.shutdown()
+
+        asyncio.run(run())
+        answers = [params for method, params in api.requests if method == "answerCallbackQuery"]
+        self.assertEqual(len(answers), 1)
+        self.assertNotEqual(answers[0].get("text"), UpdateThrottle.NOTICE)
+        # Menu words in a group still reach a handler, so they still count
+        self.assertFalse(family_bot.is_group_chatter(text_update(bot, -801, 1, "Zio", "classifica")))
+        self.assertFalse(family_bot.is_group_chatter(text_update(bot, -801, 1, "Zio", "/stats")))
+        self.assertFalse(family_bot.is_group_chatter(text_update(bot, 801, 1, "Zio", "ciao")))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
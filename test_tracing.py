@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Test per il tracing leggero (span annidati e log delle update lente)
+"""
+
+import os
+import json
+import asyncio
+import unittest
+from unittest.mock import patch
+
+import tracing
+
+
+class TestTracing(unittest.TestCase):
+
+    def tearDown(self):
+        tracing.configure(enabled=False, slow_threshold_ms=500)
+
+    def test_disabled_is_noop(self):
+        tracing.configure(enabled=False)
+        with tracing.span("root") as span:
+            self.assertIsNone(span)
+
+    @patch.dict(os.environ, {}, clear=True)
+    def test_db_spans_nested_under_handler(self):
+        from db import FamilyTaskDB
+        tracing.configure(enabled=True, slow_threshold_ms=0)
+        db = FamilyTaskDB()
+        db.add_family_member(1, 10, "mario", "Mario")
+
+        with self.assertLogs("tracing", level="WARNING") as logs:
+            with tracing.span("command.stats"):
+                db.get_user_stats(10)
+                db.get_leaderboard(1)
+
+        trace = json.loads(logs.output[-1].split(":", 2)[2])["trace"]
+        self.assertEqual(trace["name"], "command.stats")
+        names = [child["name"] for child in trace["children"]]
+        self.assertEqual(names, ["db.get_user_stats", "db.get_leaderboard"])
+        self.assertTrue(all(0 <= child["pct"] <= 100 for child in trace["children"]))
+
+    def test_async_context_propagation(self):
+        tracing.configure(enabled=True, slow_threshold_ms=10_000)
+
+        async def inner():
+            with tracing.span("inner"):
+                await asyncio.sleep(0)
+
+        async def run():
+            with tracing.span("outer") as root:
+                await asyncio.gather(inner(), inner())
+            return root
+
+        root = asyncio.run(run())
+        self.assertEqual([child.name for child in root.children], ["inner", "inner"])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,111 @@
+import os
+import json
+import time
+import logging
+import contextvars
+
+logger = logging.getLogger(__name__)
+
+# Span currently open in this task/thread (None outside of a trace)
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+_enabled = os.environ.get("TRACING_ENABLED", "").lower() in ("1", "true", "yes")
+_slow_threshold_ms = float(os.environ.get("TRACE_SLOW_MS", "500"))
+
+
+def configure(enabled=None, slow_threshold_ms=None):
+    """Enable/disable tracing and set the threshold for logging slow traces"""
+    global _enabled, _slow_threshold_ms
+    if enabled is not None:
+        _enabled = enabled
+    if slow_threshold_ms is not None:
+        _slow_threshold_ms = slow_threshold_ms
+
+
+def is_enabled():
+    return _enabled
+
+
+class Span:
+    __slots__ = ("name", "attributes", "start", "end", "children", "error")
+
+    def __init__(self, name, attributes):
+        self.name = name
+        self.attributes = attributes
+        self.start = time.perf_counter()
+        self.end = None
+        self.children = []
+        self.error = None
+
+    @property
+    def duration_ms(self):
+        end = self.end if self.end is not None else time.perf_counter()
+        return (end - self.start) * 1000
+
+    def to_dict(self, root_ms=None):
+        duration = self.duration_ms
+        root_ms = root_ms or duration or 1
+        data = {
+            "name": self.name,
+            "ms": round(duration, 2),
+            "pct": round(100 * duration / root_ms, 1),
+        }
+        if self.attributes:
+            data["attributes"] = self.attributes
+        if self.error:
+            data["error"] = self.error
+        if self.children:
+            data["children"] = [child.to_dict(root_ms) for child in self.children]
+        return data
+
+
+class _SpanContext:
+    __slots__ = ("_span", "_token")
+
+    def __init__(self, name, attributes):
+        self._span = Span(name, attributes)
+        self._token = None
+
+    def __enter__(self):
+        parent = _current_span.get()
+        if parent is not None:
+            parent.children.append(self._span)
+        self._token = _current_span.set(self._span)
+        return self._span
+
+    def __exit__(self, exc_type, exc, tb):
+        span = self._span
+        span.end = time.perf_counter()
+        if exc is not None:
+            span.error = f"{exc_type.__name__}: {exc}"
+        _current_span.reset(self._token)
+        if _current_span.get() is None:
+            _report(span)
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+def span(name, **attributes):
+    """Context manager opening a child of the current span (no-op when disabled)"""
+    if not _enabled:
+        return _NOOP
+    return _SpanContext(name, attributes)
+
+
+def _report(root):
+    """Log the whole span tree of a finished root span if it was slow"""
+    if root.duration_ms < _slow_threshold_ms:
+        return
+    logger.warning(json.dumps({"event": "slow_trace", "trace": root.to_dict()}, ensure_ascii=False, default=str))
@@ -1,5 +1,11 @@
+import json
 import logging
-from collections import defaultdict
+import hashlib
+import time
+import asyncio
+from collections import OrderedDict, defaultdict
+import metrics
+import tracing
 
 # Enhanced logging configuration
 def setup_enhanced_logging():
@@ -20,27 +26,107 @@ logger = logging.getLogger(__name__)
 # More efficient message tracking with chat-specific lists
 sent_messages = defaultdict(list)
 
+# Sharded workers track messages in the database instead (see use_message_store)
+_message_store = None
+_message_shard = None
+
+
+def use_message_store(db, shard=None):
+    """Track sent messages in ``db`` (tracked_messages); cleanup only takes ``shard``'s chats"""
+    global _message_store, _message_shard
+    _message_store = db
+    _message_shard = shard
+
+
 async def send_and_track_message(message_func, *args, **kwargs):
     """Send a message and track it for later deletion"""
     try:
-        msg = await message_func(*args, **kwargs)
-        sent_messages[msg.chat_id].append(msg.message_id)
+        with tracing.span(f"telegram.{getattr(message_func, '__name__', 'send')}"):
+            msg = await message_func(*args, **kwargs)
+        if _message_store is not None:
+            _message_store.track_message(msg.chat_id, msg.message_id)
+        else:
+            sent_messages[msg.chat_id].append(msg.message_id)
+        metrics.TRACKED_MESSAGES.inc()
         return msg
     except Exception as e:
         logger.error(f"Errore nell'invio del messaggio: {e}")
         return None
 
+# Hash of the last content rendered into each (chat_id, message_id), bounded LRU
+MAX_RENDERED_MESSAGES = 10000
+_last_rendered = OrderedDict()
+
+
+def _content_hash(text, kwargs):
+    markup = kwargs.get("reply_markup")
+    payload = (
+        text,
+        kwargs.get("parse_mode"),
+        json.dumps(markup.to_dict(), sort_keys=True) if markup is not None else None,
+    )
+    return hashlib.blake2b(repr(payload).encode("utf-8"), digest_size=16).digest()
+
+
+def _remember_rendered(key, digest):
+    _last_rendered[key] = digest
+    _last_rendered.move_to_end(key)
+    if len(_last_rendered) > MAX_RENDERED_MESSAGES:
+        _last_rendered.popitem(last=False)
+
+
+async def edit_message(query, text, **kwargs):
+    """Edit the message attached to a callback query, skipping no-op edits.
+
+    If the message already shows the same text, parse mode and keyboard the
+    Bot API call is not made at all (Telegram would answer "message is not
+    modified" anyway).
+    """
+    # Import locale: main.py importa utils prima di avviare il caricamento del catalogo
+    from telegram.error import BadRequest
+
+    message = query.message
+    key = (message.chat.id, message.message_id) if message else None
+    digest = _content_hash(text, kwargs)
+    if key is not None and _last_rendered.get(key) == digest:
+        metrics.MESSAGE_EDITS.inc(result="skipped")
+        return None
+    try:
+        with tracing.span("telegram.edit_message_text"):
+            result = await query.edit_message_text(text, **kwargs)
+        metrics.MESSAGE_EDITS.inc(result="sent")
+    except BadRequest as e:
+        if "not modified" not in str(e).lower():
+            raise
+        metrics.MESSAGE_EDITS.inc(result="not_modified")
+        result = None
+    if key is not None:
+        _remember_rendered(key, digest)
+    return result
+
+async def flush_tracked_messages(context):
+    """Persist the message ids tracked since the last flush (sharded workers)"""
+    if _message_store is not None:
+        await asyncio.to_thread(_message_store.flush_tracked_messages)
+
+
 async def delete_old_messages(context):
     """Delete old messages and clean up tracking data"""
     global sent_messages
     deleted_count = 0
+    failed_count = 0
+    start = time.perf_counter()
     
-    for chat_id, message_ids in list(sent_messages.items()):
+    pending = sent_messages
+    if _message_store is not None:
+        pending = await asyncio.to_thread(_message_store.take_tracked_messages, _message_shard)
+    for chat_id, message_ids in list(pending.items()):
         for message_id in message_ids[:]:  # Create a copy to iterate safely
             try:
                 await context.bot.delete_message(chat_id=chat_id, message_id=message_id)
                 deleted_count += 1
             except Exception as e:
+                failed_count += 1
                 logger.warning(f"Impossibile cancellare messaggio {message_id} in chat {chat_id}: {e}")
             finally:
                 # Remove from tracking regardless of success
@@ -48,7 +134,13 @@ async def delete_old_messages(context):
         
         # Clean up empty lists
         if not message_ids:
-            del sent_messages[chat_id]
+            del pending[chat_id]
+    
+    metrics.CLEANUP_RUNS.inc()
+    metrics.CLEANUP_MESSAGES.inc(deleted_count, result="deleted")
+    metrics.CLEANUP_MESSAGES.inc(failed_count, result="failed")
+    metrics.CLEANUP_DURATION.observe(time.perf_counter() - start)
+    metrics.TRACKED_MESSAGES.set(sum(len(ids) for ids in pending.values()))
     
     if deleted_count > 0:
         logger.info(f"Cancellati {deleted_count} messaggi automaticamente")
\ No newline at end of file